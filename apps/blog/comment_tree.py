@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import COMMENT_PATH_END, Comment, ModerationStatus
+
+# Thread pages show this many replies per comment, this many levels deep;
+# the rest is behind each comment's `replies_next` link.
+REPLIES_PER_LEVEL = 5
+THREAD_DEPTH = 3
+
+
+def comment_visibility(user):
+    """
+    Approved comments, plus the user's own pending or rejected ones.
+    Staff see everything; without a user only approved comments are shown.
+    """
+    approved = Q(moderation_status=ModerationStatus.APPROVED)
+    if user is None:
+        return approved
+    if user.is_staff or user.is_superuser:
+        return Q()
+    if user.is_authenticated:
+        return approved | Q(author=user)
+    return approved
+
+
+def attach_comment_trees(posts, visible=Q(moderation_status=ModerationStatus.APPROVED)):
+    """
+    Load the comments of `posts` matching `visible` in one query and link the
+    threads in memory. Replies of hidden comments are left out.
+
+    Each post gets a `comment_tree` list of its root comments, and each comment
+    gets its children cached as `replies`, so `CommentSerializer` can walk the
+    whole tree without querying again.
+    """
+    posts = [post for post in posts if not hasattr(post, "comment_tree")]
+    if not posts:
+        return
+
+    comments = list(
+        Comment.objects.filter(post_id__in=[post.id for post in posts])
+        .filter(visible)
+        .select_related("author")
+        .order_by("created_at", "id")
+    )
+
+    children = defaultdict(list)
+    roots = defaultdict(list)
+    for comment in comments:
+        if comment.parent_id is None:
+            roots[comment.post_id].append(comment)
+        else:
+            children[comment.parent_id].append(comment)
+
+    for comment in comments:
+        _cache_replies(comment, children[comment.id])
+
+    for post in posts:
+        post.comment_tree = roots[post.id]
+
+
+def attach_thread_replies(comments, per_level=REPLIES_PER_LEVEL, depth=THREAD_DEPTH, visible=Q()):
+    """
+    Load a bounded reply tree under a page of sibling `comments` (consecutive
+    in path order) with one range query over their subtrees. Only replies
+    matching `visible` are loaded; replies of hidden comments are left out.
+
+    Each comment gets at most `per_level` replies cached as `replies`, down to
+    `depth` levels, and a `replies_cursor`: None when every reply was loaded,
+    otherwise the path after which the remaining replies start ("" when none
+    were loaded).
+    """
+    if not comments:
+        return
+
+    first, last = comments[0], comments[-1]
+    # One level past `depth` is loaded too, only to tell whether the deepest
+    # comments have replies.
+    descendants = (
+        Comment.objects.filter(
+            post_id=first.post_id,
+            path__gt=first.path,
+            path__lt=last.path + COMMENT_PATH_END,
+            depth__gt=first.depth,
+            depth__lte=first.depth + depth + 1,
+        )
+        .filter(visible)
+        .annotate(sibling_rank=Window(RowNumber(), partition_by=[F("parent_id")], order_by=F("path").asc()))
+        .filter(sibling_rank__lte=per_level + 1)
+        .select_related("author")
+        .order_by("path")
+    )
+
+    children = defaultdict(list)
+    for comment in descendants:
+        children[comment.parent_id].append(comment)
+
+    pending = [(comment, 1) for comment in comments]
+    while pending:
+        comment, level = pending.pop()
+        replies = children[comment.id]
+        shown = replies[:per_level] if level <= depth else []
+        comment.replies_cursor = None
+        if len(replies) > len(shown):
+            comment.replies_cursor = shown[-1].path if shown else ""
+        _cache_replies(comment, shown)
+        pending.extend((reply, level + 1) for reply in shown)
+
+
+def _cache_replies(comment, replies):
+    # Same shape prefetch_related() leaves behind, so `comment.replies.all()`
+    # returns these objects instead of hitting the database.
+    queryset = Comment.objects.filter(parent_id=comment.id)
+    queryset._result_cache = replies
+    queryset._prefetch_done = True
+    if not hasattr(comment, "_prefetched_objects_cache"):
+        comment._prefetched_objects_cache = {}
+    comment._prefetched_objects_cache["replies"] = queryset
@@ -18,3 +18,6 @@ class CommentConsumer(AsyncWebsocketConsumer):
 
     async def comment_event(self, event):
         await self.send(text_data=json.dumps(event["data"]))
+
+    async def post_event(self, event):
+        await self.send(text_data=json.dumps(event["data"]))
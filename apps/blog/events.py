@@ -0,0 +1,149 @@
+"""
+Side effects of post and comment changes, written to the notifications
+outbox by the signal handlers and moderate() and performed by its drain.
+Payloads carry ids, and whatever the drain cannot read back once the row is
+gone.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from apps.core.utils import invalidate_namespace
+from apps.notifications.aggregation import notify_aggregated
+from apps.notifications.digest import send_or_digest
+from apps.notifications.outbox import handles
+from .models import Comment, Post
+
+POST_CREATED = "post_created"
+POST_MODERATED = "post_moderated"
+COMMENT_SAVED = "comment_saved"
+COMMENT_APPROVED = "comment_approved"
+COMMENT_REMOVED = "comment_removed"
+
+
+@handles(POST_CREATED)
+def email_post_created(payload):
+    post = Post.objects.select_related("author").filter(pk=payload["post_id"]).first()
+    if post is None:
+        return
+    send_or_digest(
+        settings.ADMIN_EMAIL,
+        settings.ADMIN_EMAIL_DIGEST,
+        subject=f"New Post Created: {post.title}",
+        message=f"Author: {post.author.username}\n\n{post.content}",
+        summary=f"{post.author.username} posted '{post.title}'",
+    )
+
+
+@handles(POST_MODERATED)
+def announce_post_verdict(payload):
+    invalidate_namespace("posts")
+    _send_to_post_viewers(payload["post_id"], "post_event", {
+        "action": payload["action"],
+        "post_id": payload["post_id"],
+    })
+
+
+@handles(COMMENT_SAVED)
+def announce_comment_saved(payload):
+    comment = _get_comment(payload["comment_id"])
+    if comment is None:
+        # Deleted before the drain; COMMENT_REMOVED follows.
+        return
+    # Decided at save time: pending comments are announced, and emailed,
+    # through COMMENT_APPROVED once moderation approves them.
+    if payload["approved"]:
+        announce_comment(comment, "created" if payload["created"] else "updated")
+
+
+@handles(COMMENT_APPROVED)
+def announce_comment_approved(payload):
+    comment = _get_comment(payload["comment_id"])
+    if comment is not None:
+        announce_comment(comment, payload["action"])
+
+
+@handles(COMMENT_REMOVED)
+def announce_comment_removed(payload):
+    _send_to_post_viewers(payload["post_id"], "comment_event", {
+        "action": payload["action"],
+        "comment_id": payload["comment_id"],
+    })
+
+
+def announce_comment(comment, action):
+    broadcast_comment(comment, action)
+    if action == "created":
+        email_post_author(comment)
+        notify_comment_recipients(comment)
+
+
+def email_post_author(comment):
+    post_author = comment.post.author
+    send_or_digest(
+        post_author.email,
+        post_author.email_digest,
+        subject=f"New Comment on Your Post '{comment.post.title}'",
+        message=f"{comment.author.username} commented: {comment.content}",
+        summary=f"{comment.author.username} commented on '{comment.post.title}': {comment.content}",
+    )
+
+
+def broadcast_comment(comment, action):
+    # Send comment information to people viewing the article
+    _send_to_post_viewers(comment.post_id, "comment_event", {
+        "action": action,
+        "comment": {
+            "id": comment.id,
+            "author": comment.author.username,
+            "content": comment.content,
+            "created_at": comment.created_at.isoformat(),
+        },
+    })
+
+
+def notify_comment_recipients(comment):
+    # Events on the same parent comment, or on the same post, collapse into
+    # one notification per window ("Alice and 41 others commented ...").
+    notified_user_ids = set()
+
+    # 1. Prioritize sending notifications to parent comment author (if different from commenter)
+    if comment.parent and comment.parent.author.id != comment.author.id:
+        notify_aggregated(
+            recipient=comment.parent.author,
+            group_key=f"replies:{comment.parent_id}",
+            actor=comment.author.username,
+            action=f"replied to your comment on: {comment.post.title}",
+            target=comment,
+        )
+        notified_user_ids.add(comment.parent.author.id)
+
+    # 2. Send notification to post author if:
+    # - the commenter is not the post author
+    # - and has not received notification in the above step
+    if (
+        comment.post.author.id != comment.author.id and
+        comment.post.author.id not in notified_user_ids
+    ):
+        notify_aggregated(
+            recipient=comment.post.author,
+            group_key=f"comments:{comment.post_id}",
+            actor=comment.author.username,
+            action=f"commented on your post: {comment.post.title}",
+            target=comment,
+        )
+
+
+def _get_comment(comment_id):
+    return (
+        Comment.objects.select_related("author", "post__author", "parent__author")
+        .filter(pk=comment_id)
+        .first()
+    )
+
+
+def _send_to_post_viewers(post_id, event_type, data):
+    async_to_sync(get_channel_layer().group_send)(
+        f"post_{post_id}",
+        {"type": event_type, "data": data},
+    )
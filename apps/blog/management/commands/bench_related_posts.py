@@ -0,0 +1,109 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.blog.models import Post
+from apps.blog.related import rank_sql
+from apps.blog.similarity import TfidfIndex
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare related-post latency and quality of the Postgres SearchRank query "
+        "and the TF-IDF engine on a synthetic topic corpus. SQL rows are inserted "
+        "in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100_000, help="Synthetic corpus size")
+        parser.add_argument("--topics", type=int, default=200, help="Number of synthetic topics")
+        parser.add_argument("--sources", type=int, default=50, help="Posts to query")
+        parser.add_argument("--k", type=int, default=5, help="Neighbours scored for precision@k")
+        parser.add_argument("--skip-sql", action="store_true", help="Only run the TF-IDF engine")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        corpus = self._corpus(rng, options["posts"], options["topics"])
+        sources = rng.sample(range(len(corpus)), options["sources"])
+        k = options["k"]
+
+        self.stdout.write(f"{'engine':>8} {'setup (s)':>10} {'ms/query':>10} {'precision@' + str(k):>13}")
+
+        started = time.perf_counter()
+        index = TfidfIndex.build((i, title, content) for i, (_, title, content) in enumerate(corpus))
+        setup = time.perf_counter() - started
+        started = time.perf_counter()
+        results = index.top_k(sources, k=k)
+        per_query = (time.perf_counter() - started) * 1000 / len(sources)
+        precision = self._precision(corpus, {s: [t for t, _ in r] for s, r in results.items()}, k)
+        self.stdout.write(f"{'tfidf':>8} {setup:>10.2f} {per_query:>10.2f} {precision:>13.3f}")
+
+        if not options["skip_sql"]:
+            self._bench_sql(corpus, sources, k)
+
+    def _bench_sql(self, corpus, sources, k):
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                author = get_user_model().objects.create(username=f"bench-related-{time.time_ns()}")
+                posts = Post.objects.bulk_create(
+                    [Post(author=author, title=title, content=content) for _, title, content in corpus],
+                    batch_size=5000,
+                )
+                ids = [post.id for post in posts]
+                setup = time.perf_counter() - started
+
+                by_id = {post_id: i for i, post_id in enumerate(ids)}
+                neighbours = {}
+                started = time.perf_counter()
+                for source in sources:
+                    post = Post(id=ids[source], title=corpus[source][1], content=corpus[source][2])
+                    ranked = rank_sql(post)[:k]
+                    neighbours[source] = [by_id[target] for target, _ in ranked if target in by_id]
+                per_query = (time.perf_counter() - started) * 1000 / len(sources)
+                precision = self._precision(corpus, neighbours, k)
+                self.stdout.write(f"{'sql':>8} {setup:>10.2f} {per_query:>10.2f} {precision:>13.3f}")
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _corpus(self, rng, size, topics):
+        # Letters only, as the tokenizer drops digits. The prefixes keep the
+        # two vocabularies apart and start no stopword.
+        width = len(self._letters(topics - 1)) if topics > 1 else 1
+        general = [f"g{self._letters(i, 3)}" for i in range(5000)]
+        topic_words = [
+            [f"k{self._letters(t, width)}{self._letters(i, 2)}" for i in range(200)] for t in range(topics)
+        ]
+        corpus = []
+        for i in range(size):
+            topic = i % topics
+            words = topic_words[topic]
+            title = " ".join(rng.choice(words) for _ in range(4))
+            content = " ".join(
+                rng.choice(words) if rng.random() < 0.4 else rng.choice(general) for _ in range(80)
+            )
+            corpus.append((topic, title, content))
+        return corpus
+
+    def _letters(self, n, width=1):
+        letters = ""
+        while n or len(letters) < width:
+            n, r = divmod(n, 26)
+            letters = chr(ord("a") + r) + letters
+        return letters
+
+    def _precision(self, corpus, neighbours, k):
+        hits = total = 0
+        for source, targets in neighbours.items():
+            hits += sum(1 for target in targets[:k] if corpus[target][0] == corpus[source][0])
+            total += k
+        return hits / total if total else 0.0
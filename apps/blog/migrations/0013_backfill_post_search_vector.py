@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2025-08-13 09:20
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def backfill_search_vector(apps, schema_editor):
+    # Non-atomic migration: every batch commits on its own, so only
+    # BATCH_SIZE rows are locked at a time.
+    Post = apps.get_model('blog', 'Post')
+    vector = (
+        SearchVector('title', weight='A', config='english') +
+        SearchVector('content', weight='B', config='english')
+    )
+    last_id = 0
+    while True:
+        ids = list(
+            Post.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        Post.objects.filter(id__gte=ids[0], id__lte=ids[-1], search_vector__isnull=True).update(
+            search_vector=vector
+        )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('blog', '0012_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='blog_post_search_vector_gin'),
+        ),
+    ]
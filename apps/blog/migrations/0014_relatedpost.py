@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2025-08-14 08:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_backfill_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_targets', to='blog.post')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_sources', to='blog.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', '-score'], name='blog_relatedpost_source_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'target'), name='blog_relatedpost_unique_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2025-08-15 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+INSERT INTO blog_categorydailystats (category_id, date, views, comments, new_posts)
+SELECT category_id, day, SUM(views), SUM(comments), SUM(new_posts)
+FROM (
+    SELECT pc.category_id, (p.created_at AT TIME ZONE 'UTC')::date AS day,
+           p.views AS views, 0 AS comments, 1 AS new_posts
+    FROM blog_post_categories pc JOIN blog_post p ON p.id = pc.post_id
+    UNION ALL
+    SELECT pc.category_id, (c.created_at AT TIME ZONE 'UTC')::date,
+           0, 1, 0
+    FROM blog_comment c JOIN blog_post_categories pc ON pc.post_id = c.post_id
+) AS events
+GROUP BY category_id, day
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_relatedpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.BigIntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('new_posts', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='blog.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'date'), name='blog_categorydailystats_unique_day')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
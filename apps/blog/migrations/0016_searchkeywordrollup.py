@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2025-08-18 09:10
+
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+INSERT INTO blog_searchkeywordrollup (period, bucket, keyword, searches, clicks, results_total)
+SELECT period, bucket, keyword, COUNT(*), COUNT(*) FILTER (WHERE clicked), SUM(results_count)
+FROM (
+    SELECT p.period, date_trunc(p.period, l.timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket,
+           lower(regexp_replace(btrim(l.keyword), '\\s+', ' ', 'g')) AS keyword,
+           l.clicked, l.results_count
+    FROM blog_searchquerylog l CROSS JOIN (VALUES ('hour'), ('day')) AS p(period)
+) AS events
+GROUP BY period, bucket, keyword
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_categorydailystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchKeywordRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('keyword', models.CharField(max_length=255)),
+                ('searches', models.IntegerField(default=0)),
+                ('clicks', models.IntegerField(default=0)),
+                ('results_total', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket'], name='blog_keywordrollup_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'keyword'), name='blog_keywordrollup_unique_bucket')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
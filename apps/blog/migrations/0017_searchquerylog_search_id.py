@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2025-08-19 08:45
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('blog', '0016_searchkeywordrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchquerylog',
+            name='search_id',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='searchquerylog',
+            index=models.Index(fields=['search_id'], name='blog_searchlog_search_id_idx'),
+        ),
+    ]
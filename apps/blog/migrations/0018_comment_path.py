@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2025-08-20 10:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Same encoding as apps.blog.models.comment_path_segment: 8 hex digits per level.
+BACKFILL_PATHS = """
+WITH RECURSIVE tree (id, path, depth) AS (
+    SELECT id, lpad(to_hex(id), 8, '0')::varchar COLLATE "C", 0
+    FROM blog_comment
+    WHERE parent_id IS NULL
+    UNION ALL
+    SELECT c.id, (tree.path || lpad(to_hex(c.id), 8, '0'))::varchar COLLATE "C", tree.depth + 1
+    FROM blog_comment c
+    JOIN tree ON c.parent_id = tree.id
+)
+UPDATE blog_comment
+SET path = tree.path, depth = tree.depth
+FROM tree
+WHERE blog_comment.id = tree.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('blog', '0017_searchquerylog_search_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(db_collation='C', default='', editable=False, max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_PATHS, migrations.RunSQL.noop),
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='blog_comment_post_path_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('depth', 0)), fields=['post', 'path'], name='blog_comment_root_path_idx'),
+        ),
+    ]
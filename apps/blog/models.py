@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Concat, Substr
 from django.conf import settings
-from django.db.models.signals import post_save, pre_delete
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from apps.notifications.tasks import send_notification_email
 from cloudinary.uploader import destroy
 from urllib.parse import urlparse
 
@@ -16,6 +19,13 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class ModerationStatus(models.TextChoices):
+    # PENDING only exists with CONTENT_MODERATION_ASYNC: the content is saved
+    # first and scored by apps.blog.tasks.moderate_content.
+    PENDING = "pending", "Pending"
+    APPROVED = "approved", "Approved"
+    REJECTED = "rejected", "Rejected"
+
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
     categories = models.ManyToManyField("Category", related_name="posts")
@@ -26,24 +36,77 @@ class Post(models.Model):
     views = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by the blog_post_search_vector_trigger database trigger:
+    # title weighted A, content weighted B (see migration 0012).
+    search_vector = SearchVectorField(null=True, editable=False)
+    moderation_status = models.CharField(
+        max_length=10, choices=ModerationStatus.choices, default=ModerationStatus.APPROVED
+    )
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination on (created_at, id).
+            models.Index(fields=["-created_at", "-id"], name="blog_post_created_id_idx"),
+            GinIndex(fields=["search_vector"], name="blog_post_search_vector_gin"),
+        ]
 
     def __str__(self):
         return self.title
 
+class RelatedPost(models.Model):
+    """
+    Precomputed related-post ranking, refreshed by apps.blog.tasks.
+    """
+    source = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="related_targets")
+    target = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="related_sources")
+    score = models.FloatField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "target"], name="blog_relatedpost_unique_pair"),
+        ]
+        indexes = [
+            models.Index(fields=["source", "-score"], name="blog_relatedpost_source_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.source_id} -> {self.target_id} ({self.score:.3f})"
+
 @receiver(pre_delete, sender=Post)
 def delete_post_media(sender, instance, **kwargs):
     for media in instance.medias.all():
         media.delete()
 
-# Connect signal to send email when a post is created
-@receiver(post_save, sender=Post)
-def send_email_on_post_created(sender, instance, created, **kwargs):
-    if created:
-        send_notification_email.delay(
-            subject=f"New Post Created: {instance.title}",
-            message=f"Author: {instance.author.username}\n\n{instance.content}",
-            recipient_email="admin@example.com"
-        )
+# Materialized comment paths: a comment's path is its parent's path followed
+# by its own id as a fixed-width hex segment. Paths sort depth-first with
+# siblings in id order, and a subtree is the contiguous range
+# [path, path + COMMENT_PATH_END).
+COMMENT_PATH_SEGMENT = 8
+COMMENT_PATH_END = "~"
+COMMENT_PATH_MAX_LENGTH = 1024
+# Deepest reply whose path still fits (the root is depth 0).
+MAX_COMMENT_DEPTH = COMMENT_PATH_MAX_LENGTH // COMMENT_PATH_SEGMENT - 1
+
+
+def comment_path_segment(comment_id):
+    return format(comment_id, f"0{COMMENT_PATH_SEGMENT}x")
+
+
+class CommentQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Insert the comments, then fill in the paths that save() would have
+        written. Parents must already be saved.
+        """
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            for comment in objs:
+                comment.path = (comment.parent.path if comment.parent_id else "") + comment_path_segment(comment.id)
+                comment.depth = len(comment.path) // COMMENT_PATH_SEGMENT - 1
+            self.bulk_update(objs, ["path", "depth"])
+        return objs
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
@@ -57,24 +120,68 @@ class Comment(models.Model):
         related_name='replies'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by save() (and bulk_create). "C" collation so range comparisons
+    # follow byte order. Bounds replies to MAX_COMMENT_DEPTH levels.
+    path = models.CharField(max_length=COMMENT_PATH_MAX_LENGTH, db_collation="C", editable=False, default="")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    moderation_status = models.CharField(
+        max_length=10, choices=ModerationStatus.choices, default=ModerationStatus.APPROVED
+    )
+
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Subtree range scans and reply pages.
+            models.Index(fields=["post", "path"], name="blog_comment_post_path_idx"),
+            # Root thread pages.
+            models.Index(fields=["post", "path"], condition=Q(depth=0), name="blog_comment_root_path_idx"),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author} on {self.post}"
 
+    def save(self, *args, **kwargs):
+        # The path ends with the comment's own id, so it is written after the
+        # INSERT, and rewritten (with the whole subtree) when the parent changes.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.path and self._path_parent_id() == self.parent_id:
+                return
+
+            path = (self.parent.path if self.parent_id else "") + comment_path_segment(self.id)
+            depth = len(path) // COMMENT_PATH_SEGMENT - 1
+            if self.path:
+                self.descendants().update(
+                    path=Concat(models.Value(path), Substr("path", len(self.path) + 1)),
+                    depth=models.F("depth") + (depth - self.depth),
+                )
+            Comment.objects.filter(pk=self.pk).update(path=path, depth=depth)
+            self.path, self.depth = path, depth
+
+    def subtree(self):
+        """
+        This comment and all of its replies, at any depth: one range scan on
+        (post, path).
+        """
+        return Comment.objects.filter(
+            post_id=self.post_id, path__gte=self.path, path__lt=self.path + COMMENT_PATH_END
+        )
+
+    def descendants(self):
+        return Comment.objects.filter(
+            post_id=self.post_id, path__gt=self.path, path__lt=self.path + COMMENT_PATH_END
+        )
+
+    def _path_parent_id(self):
+        if len(self.path) <= COMMENT_PATH_SEGMENT:
+            return None
+        return int(self.path[-2 * COMMENT_PATH_SEGMENT:-COMMENT_PATH_SEGMENT], 16)
+
     @property
     def is_parent(self):
         return self.parent is None
 
-# Connect signal to send email when a comment is created
-@receiver(post_save, sender=Comment)
-def send_email_on_comment_created(sender, instance, created, **kwargs):
-    if created:
-        post_author_email = instance.post.author.email
-        subject = f"New Comment on Your Post '{instance.post.title}'"
-        message = f"{instance.author.username} commented: {instance.content}"
-        
-        send_notification_email.delay(subject, message, post_author_email)
-
 class Media(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="medias")
     file = models.URLField() 
@@ -94,11 +201,66 @@ class Media(models.Model):
 
         super().delete(*args, **kwargs)
 
+class CategoryDailyStats(models.Model):
+    """
+    Per-category, per-day counters behind CategoryReportAPIView, kept current
+    by apps.blog.rollups. Views and comments are added on the day they are
+    recorded; new_posts on the day the post was created.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()
+    views = models.BigIntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    new_posts = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["category", "date"], name="blog_categorydailystats_unique_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} {self.date}: {self.views} views, {self.comments} comments, {self.new_posts} posts"
+
 class SearchQueryLog(models.Model):
     keyword = models.CharField(max_length=255, db_index=True)
     timestamp = models.DateTimeField(default=timezone.now)
     results_count = models.PositiveIntegerField(default=0)  # số kết quả trả về
     clicked = models.BooleanField(default=False)  # người dùng có click vào kết quả không
+    # Opaque id returned with the search results; clicks are attributed by it.
+    search_id = models.UUIDField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["search_id"], name="blog_searchlog_search_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.keyword} at {self.timestamp} - results: {self.results_count}, clicked: {self.clicked}"
+
+class SearchKeywordRollup(models.Model):
+    """
+    Hourly and daily search counters per normalized keyword, behind
+    SearchAnalyticsAPIView. Maintained by apps.blog.rollups.
+    """
+    HOUR = "hour"
+    DAY = "day"
+    PERIOD_CHOICES = ((HOUR, "Hour"), (DAY, "Day"))
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()  # start of the hour or day (UTC)
+    keyword = models.CharField(max_length=255)
+    searches = models.IntegerField(default=0)
+    clicks = models.IntegerField(default=0)
+    results_total = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "bucket", "keyword"], name="blog_keywordrollup_unique_bucket"),
+        ]
+        indexes = [
+            models.Index(fields=["period", "bucket"], name="blog_keywordrollup_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.keyword} ({self.period} {self.bucket}): {self.searches} searches"
+
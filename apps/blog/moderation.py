@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.services.content_moderation import check_toxicity
+from apps.notifications.outbox import enqueue
+from .events import COMMENT_APPROVED, COMMENT_REMOVED, POST_MODERATED
+from .models import Comment, ModerationStatus, Post
+
+MODERATED_MODELS = {
+    "post": Post,
+    "comment": Comment,
+}
+
+
+def moderation_fields(serializer):
+    """
+    Extra `serializer.save()` arguments: new or changed content is saved as
+    pending with CONTENT_MODERATION_ASYNC, or when `validate_content` could
+    not reach the analyzer (the "pending" failure policy).
+    """
+    if getattr(serializer, "moderation_deferred", False):
+        return {"moderation_status": ModerationStatus.PENDING}
+    if not settings.CONTENT_MODERATION_ASYNC:
+        return {}
+    instance = serializer.instance
+    if instance is not None and serializer.validated_data.get("content", instance.content) == instance.content:
+        return {}
+    return {"moderation_status": ModerationStatus.PENDING}
+
+
+def moderate(model_name, object_id, action="created"):
+    """
+    Score a pending post or comment, store the verdict and queue its
+    announcement in the outbox, in one transaction. Returns the new status, or
+    None when the object is gone or was not pending. Raises
+    ModerationUnavailable when the analyzer cannot answer and the failure
+    policy is "pending".
+    """
+    model = MODERATED_MODELS[model_name]
+    obj = model.objects.filter(pk=object_id, moderation_status=ModerationStatus.PENDING).first()
+    if obj is None:
+        return None
+
+    result = check_toxicity(obj.content)
+    status = ModerationStatus.APPROVED if result["allowed"] else ModerationStatus.REJECTED
+    with transaction.atomic():
+        # A save() here would re-run the post_save handlers; the content check
+        # skips the verdict when the text was edited again while it was scored.
+        updated = model.objects.filter(
+            pk=obj.pk, moderation_status=ModerationStatus.PENDING, content=obj.content
+        ).update(moderation_status=status)
+        if not updated:
+            return None
+
+        if model is Post:
+            enqueue(
+                POST_MODERATED,
+                post_id=obj.id,
+                action="approved" if status == ModerationStatus.APPROVED else "rejected",
+            )
+        elif status == ModerationStatus.APPROVED:
+            enqueue(COMMENT_APPROVED, comment_id=obj.id, action=action)
+        else:
+            enqueue(COMMENT_REMOVED, post_id=obj.post_id, comment_id=obj.id, action="hidden")
+    return status
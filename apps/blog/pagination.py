@@ -0,0 +1,214 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PostKeysetPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    Each page is a `WHERE (created_at, id) < (cursor)` range read, so deep pages
+    cost the same as the first one and no COUNT query is needed.
+    """
+    page_size = 10
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    # Ordering columns, all descending; the cursor holds the edge row's values.
+    keyset = ("created_at", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            position, reverse = None, False
+        else:
+            position, reverse = cursor
+
+        if reverse:
+            queryset = queryset.order_by(*self.keyset)
+        else:
+            queryset = queryset.order_by(*[f"-{field}" for field in self.keyset])
+        if position is not None:
+            queryset = queryset.filter(self.beyond(position, "gt" if reverse else "lt"))
+
+        # Fetch one extra row to know whether there is a page beyond this one.
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def beyond(self, position, lookup):
+        # (a, b, c) < (x, y, z) as a OR of prefixes, which Django can express
+        # on annotations as well as on columns.
+        condition = Q()
+        for n, field in enumerate(self.keyset):
+            equal = {name: value for name, value in zip(self.keyset[:n], position[:n])}
+            condition |= Q(**equal, **{f"{field}__{lookup}": position[n]})
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.position(self.page[0]), reverse=True)
+
+    def position(self, obj):
+        return tuple(getattr(obj, field) for field in self.keyset)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            position = self.decode_position(tokens)
+            reverse = bool(int(tokens.get("r", ["0"])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def decode_position(self, tokens):
+        created_at = parse_datetime(tokens["c"][0])
+        if created_at is None:
+            raise ValueError("Invalid created_at")
+        return created_at, int(tokens["i"][0])
+
+    def encode_position(self, position):
+        created_at, pk = position
+        return {"c": created_at.isoformat(), "i": pk}
+
+    def encode_cursor(self, position, reverse):
+        tokens = self.encode_position(position)
+        if reverse:
+            tokens["r"] = "1"
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode("ascii")).decode("ascii")
+        url = remove_query_param(self.base_url, "page")
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+
+class SearchKeysetPagination(PostKeysetPagination):
+    """
+    Keyset pagination of search results on (rank, created_at, id), best match
+    first. The queryset must be annotated with a double precision `rank`, so
+    the rank carried by the cursor compares equal to the one recomputed.
+    """
+    keyset = ("rank", "created_at", "id")
+
+    def decode_position(self, tokens):
+        return (float(tokens["k"][0]), *super().decode_position(tokens))
+
+    def encode_position(self, position):
+        rank, *rest = position
+        # repr() round-trips the double exactly.
+        return {"k": repr(rank), **super().encode_position(tuple(rest))}
+
+
+class CommentPathPagination(BasePagination):
+    """
+    Keyset pagination on Comment.path, in thread order.
+
+    The cursor is the path of the last comment on the page, so each page is a
+    `WHERE path > (cursor)` range read on the (post, path) index.
+    """
+    page_size = 20
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        path = self.decode_cursor(request)
+
+        queryset = queryset.order_by("path")
+        if path is not None:
+            queryset = queryset.filter(path__gt=path)
+
+        # Fetch one extra row to know whether there is a page beyond this one.
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1].path))
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode("ascii")).decode("ascii")
+            path = parse.parse_qs(querystring, keep_blank_values=True)["p"][0]
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return path
+
+    @staticmethod
+    def encode_cursor(path):
+        return b64encode(parse.urlencode({"p": path}).encode("ascii")).decode("ascii")
+
+
+class CommentSubtreePagination(CommentPathPagination):
+    page_size = 100
@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Post, RelatedPost
+
+# Kept per source post, so the top 5 are still there after visibility filtering.
+STORED_RELATED_POSTS = 20
+MIN_RELATED_SCORE = 0.1
+# Cosine similarity floor for the TF-IDF engine.
+MIN_TFIDF_SCORE = 0.05
+
+
+def refresh_related_posts(post_id):
+    """
+    Rank every post against `post_id` and store the best matches in RelatedPost,
+    using the engine selected by RELATED_POSTS_ENGINE ("sql" or "tfidf").
+    Visibility is not applied here; the endpoint filters targets at read time.
+    """
+    post = Post.objects.only("id", "title", "content").filter(id=post_id).first()
+    if post is None:
+        return 0
+
+    if settings.RELATED_POSTS_ENGINE == "tfidf":
+        ranked = _rank_tfidf(post)
+    else:
+        ranked = rank_sql(post)
+    return _store(post.id, ranked)
+
+
+def refresh_all_related_posts(chunk_size=500):
+    """
+    Recompute the related posts of every post, in id order.
+    """
+    if settings.RELATED_POSTS_ENGINE == "tfidf":
+        return _refresh_all_tfidf(chunk_size)
+
+    last_id = 0
+    refreshed = 0
+    while True:
+        ids = _next_ids(last_id, chunk_size)
+        if not ids:
+            return refreshed
+        for post_id in ids:
+            refresh_related_posts(post_id)
+        refreshed += len(ids)
+        last_id = ids[-1]
+
+
+def _next_ids(last_id, chunk_size):
+    return list(Post.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:chunk_size])
+
+
+def rank_sql(post):
+    query = SearchQuery(post.title, config="english") | SearchQuery(post.content, config="english")
+    return list(
+        Post.objects.annotate(rank=SearchRank(F("search_vector"), query))
+        .filter(rank__gte=MIN_RELATED_SCORE)
+        .exclude(id=post.id)
+        .order_by("-rank")
+        .values_list("id", "rank")[:STORED_RELATED_POSTS]
+    )
+
+
+def _rank_tfidf(post):
+    # Updates from several workers are serialized so none of them is lost,
+    # and each worker keeps its index between saves, catching up on the
+    # changes the others journaled meanwhile.
+    with cache.lock("related_posts:tfidf_index", timeout=120):
+        index = _get_tfidf_index()
+        index.upsert(post.id, post.title, post.content)
+        index.save_changes(settings.RELATED_POSTS_INDEX_DIR)
+        ranked = index.top_k([post.id], k=STORED_RELATED_POSTS, min_score=MIN_TFIDF_SCORE)[post.id]
+
+    # The index may still hold posts deleted since the last rebuild.
+    existing = set(Post.objects.filter(id__in=[target for target, _ in ranked]).values_list("id", flat=True))
+    return [(target, score) for target, score in ranked if target in existing]
+
+
+_tfidf_indexes = {}
+
+
+def _get_tfidf_index():
+    from .similarity import TfidfIndex
+
+    path = settings.RELATED_POSTS_INDEX_DIR
+    index = _tfidf_indexes.get(path)
+    if index is None or not index.sync(path):
+        try:
+            index = TfidfIndex.load(path)
+        except FileNotFoundError:
+            index = _build_tfidf_index()
+            index.save(path)
+        _tfidf_indexes[path] = index
+    return index
+
+
+def _build_tfidf_index():
+    from .similarity import TfidfIndex
+
+    return TfidfIndex.build(Post.objects.order_by("id").values_list("id", "title", "content").iterator())
+
+
+def _refresh_all_tfidf(chunk_size):
+    with cache.lock("related_posts:tfidf_index", timeout=600):
+        index = _build_tfidf_index()
+        index.save(settings.RELATED_POSTS_INDEX_DIR)
+        _tfidf_indexes[settings.RELATED_POSTS_INDEX_DIR] = index
+
+    last_id = 0
+    refreshed = 0
+    while True:
+        ids = _next_ids(last_id, chunk_size)
+        if not ids:
+            return refreshed
+        for post_id, ranked in index.top_k(ids, k=STORED_RELATED_POSTS, min_score=MIN_TFIDF_SCORE).items():
+            _store(post_id, ranked)
+        refreshed += len(ids)
+        last_id = ids[-1]
+
+
+def _store(post_id, ranked):
+    rows = [RelatedPost(source_id=post_id, target_id=target_id, score=score) for target_id, score in ranked]
+    with transaction.atomic():
+        RelatedPost.objects.filter(source_id=post_id).delete()
+        RelatedPost.objects.bulk_create(rows)
+    return len(rows)
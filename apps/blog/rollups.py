@@ -0,0 +1,189 @@
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CategoryDailyStats, Comment, Post, SearchKeywordRollup
+
+# Hourly keyword rows older than this are pruned; daily rows are kept.
+HOURLY_KEYWORD_RETENTION = timedelta(days=7)
+
+UPSERT_SQL = """
+INSERT INTO {table} (category_id, date, views, comments, new_posts)
+VALUES {values}
+ON CONFLICT (category_id, date) DO UPDATE SET
+    views = {table}.views + EXCLUDED.views,
+    comments = {table}.comments + EXCLUDED.comments,
+    new_posts = {table}.new_posts + EXCLUDED.new_posts
+"""
+
+REBUILD_SQL = """
+INSERT INTO {stats} (category_id, date, views, comments, new_posts)
+SELECT category_id, day, SUM(views), SUM(comments), SUM(new_posts)
+FROM (
+    SELECT pc.category_id, (p.created_at AT TIME ZONE 'UTC')::date AS day,
+           p.views AS views, 0 AS comments, 1 AS new_posts
+    FROM {post_categories} pc JOIN {post} p ON p.id = pc.post_id
+    UNION ALL
+    SELECT pc.category_id, (c.created_at AT TIME ZONE 'UTC')::date,
+           0, 1, 0
+    FROM {comment} c JOIN {post_categories} pc ON pc.post_id = c.post_id
+) AS events
+GROUP BY category_id, day
+"""
+
+
+def add_category_stats(deltas):
+    """
+    Atomically add `deltas` ({(category_id, date): (views, comments, new_posts)})
+    to the rollup with one INSERT ... ON CONFLICT DO UPDATE.
+    """
+    deltas = {key: value for key, value in deltas.items() if any(value)}
+    if not deltas:
+        return
+
+    params = []
+    for (category_id, day), (views, comments, new_posts) in sorted(deltas.items()):
+        params.extend([category_id, day, views, comments, new_posts])
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(deltas))
+
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_SQL.format(table=CategoryDailyStats._meta.db_table, values=values), params)
+
+
+def record_post_views(view_deltas):
+    """
+    Add flushed view deltas ({post_id: views}) to today's rollup rows.
+    """
+    if not view_deltas:
+        return
+    today = timezone.now().date()
+    through = Post.categories.through
+    deltas = defaultdict(int)
+    for post_id, category_id in through.objects.filter(post_id__in=view_deltas.keys()).values_list("post_id", "category_id"):
+        deltas[(category_id, today)] += view_deltas[post_id]
+    add_category_stats({key: (views, 0, 0) for key, views in deltas.items()})
+
+
+def record_comment(post_id, delta):
+    today = timezone.now().date()
+    category_ids = Post.categories.through.objects.filter(post_id=post_id).values_list("category_id", flat=True)
+    add_category_stats({(category_id, today): (0, delta, 0) for category_id in category_ids})
+
+
+def record_post_categories(post, category_ids, sign, include_comments=True):
+    """
+    Count `post` in (sign=1) or out of (sign=-1) `category_ids`: its creation
+    day's new_posts, and its current views and comments as of today.
+    """
+    if not category_ids:
+        return
+    today = timezone.now().date()
+    created = post.created_at.astimezone(dt_timezone.utc).date() if post.created_at else today
+    comments = post.comments.count() if include_comments else 0
+
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for category_id in category_ids:
+        deltas[(category_id, created)][2] += sign
+        deltas[(category_id, today)][0] += sign * post.views
+        deltas[(category_id, today)][1] += sign * comments
+    add_category_stats({key: tuple(value) for key, value in deltas.items()})
+
+
+def rebuild_category_stats():
+    """
+    Recompute the whole rollup from the base tables. Post views have no date,
+    so they are attributed to the post's creation day.
+    """
+    post_categories = Post.categories.through._meta.db_table
+    with transaction.atomic():
+        CategoryDailyStats.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(REBUILD_SQL.format(
+                stats=CategoryDailyStats._meta.db_table,
+                post_categories=post_categories,
+                post=Post._meta.db_table,
+                comment=Comment._meta.db_table,
+            ))
+
+
+KEYWORD_UPSERT_SQL = """
+INSERT INTO {table} (period, bucket, keyword, searches, clicks, results_total)
+VALUES {values}
+ON CONFLICT (period, bucket, keyword) DO UPDATE SET
+    searches = {table}.searches + EXCLUDED.searches,
+    clicks = {table}.clicks + EXCLUDED.clicks,
+    results_total = {table}.results_total + EXCLUDED.results_total
+"""
+
+
+def normalize_keyword(keyword):
+    return " ".join(keyword.split()).lower()[:255]
+
+
+def keyword_buckets(timestamp):
+    """
+    Return the (period, bucket start) pairs a search at `timestamp` counts in.
+    """
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    hour = timestamp.replace(minute=0, second=0, microsecond=0)
+    return [
+        (SearchKeywordRollup.HOUR, hour),
+        (SearchKeywordRollup.DAY, hour.replace(hour=0)),
+    ]
+
+
+def add_keyword_stats(events):
+    """
+    Add search events, (timestamp, keyword, results_count, clicked) tuples, to
+    the hourly and daily keyword rollups with one upsert.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for timestamp, keyword, results_count, clicked in events:
+        keyword = normalize_keyword(keyword)
+        for period, bucket in keyword_buckets(timestamp):
+            delta = deltas[(period, bucket, keyword)]
+            delta[0] += 1
+            delta[1] += 1 if clicked else 0
+            delta[2] += results_count
+    _upsert_keyword_stats(deltas)
+
+
+def add_keyword_clicks(clicks):
+    """
+    Count clicks, (search timestamp, keyword) pairs, in the rollup buckets
+    of the searches they belong to.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for timestamp, keyword in clicks:
+        keyword = normalize_keyword(keyword)
+        for period, bucket in keyword_buckets(timestamp):
+            deltas[(period, bucket, keyword)][1] += 1
+    _upsert_keyword_stats(deltas)
+
+
+def record_keyword_click(timestamp, keyword):
+    add_keyword_clicks([(timestamp, keyword)])
+
+
+def prune_keyword_rollups(hourly_retention=HOURLY_KEYWORD_RETENTION):
+    """
+    Delete hourly rows older than `hourly_retention`; daily rows are kept.
+    """
+    cutoff = timezone.now() - hourly_retention
+    deleted, _ = SearchKeywordRollup.objects.filter(period=SearchKeywordRollup.HOUR, bucket__lt=cutoff).delete()
+    return deleted
+
+
+def _upsert_keyword_stats(deltas):
+    if not deltas:
+        return
+    params = []
+    for (period, bucket, keyword), (searches, clicks, results_total) in sorted(deltas.items()):
+        params.extend([period, bucket, keyword, searches, clicks, results_total])
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(deltas))
+
+    with connection.cursor() as cursor:
+        cursor.execute(KEYWORD_UPSERT_SQL.format(table=SearchKeywordRollup._meta.db_table, values=values), params)
+
@@ -0,0 +1,238 @@
+import json
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+from .models import SearchQueryLog
+from .rollups import add_keyword_clicks, add_keyword_stats, normalize_keyword
+
+BUFFER_KEY = "search_log:buffer"
+CLICKS_KEY = "search_log:clicks"
+# Held while a drain writes a batch, which stays in the buffer until then.
+DRAIN_LOCK_KEY = "search_log:drain_lock"
+DRAIN_LOCK_TIMEOUT = 300
+# A click can arrive before its search leaves the buffer; unmatched clicks
+# are retried on the next drains, then dropped.
+CLICK_ATTEMPTS = 3
+
+# "Popular now": one Space-Saving summary per hour, kept for two hours.
+TOPK_KEY = "search_log:topk:{hour}"
+TOPK_CAPACITY = 200
+TOPK_TTL = 2 * 60 * 60
+
+# Space-Saving update on a sorted set: count the keyword if it is tracked or
+# there is room, otherwise replace the smallest counter and inherit its count.
+SPACE_SAVING_LUA = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) or redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZINCRBY', KEYS[1], 1, ARGV[1])
+else
+    local smallest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    redis.call('ZREM', KEYS[1], smallest[1])
+    redis.call('ZADD', KEYS[1], tonumber(smallest[2]) + 1, ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+"""
+
+# Set from the buffer length returned by the last push, so checking for
+# overload costs no extra Redis round trip.
+_overloaded = False
+
+
+def _sample_rate():
+    if _overloaded:
+        return settings.SEARCH_LOG_OVERLOAD_SAMPLE_RATE
+    return settings.SEARCH_LOG_SAMPLE_RATE
+
+
+def record_search(keyword, results_count):
+    """
+    Queue a search event for `flush_search_logs` instead of inserting it, and
+    count it in the current hour's top-k sketch. Returns the search id clicks
+    should be reported with, or None when the event was sampled out.
+
+    Events are sampled at SEARCH_LOG_SAMPLE_RATE, dropping to
+    SEARCH_LOG_OVERLOAD_SAMPLE_RATE while the buffer holds more than
+    SEARCH_LOG_OVERLOAD_THRESHOLD unflushed events.
+    """
+    global _overloaded
+
+    rate = _sample_rate()
+    sampled = rate >= 1.0 or random.random() < rate
+
+    now = timezone.now()
+    search_id = uuid.uuid4()
+    event = json.dumps({
+        "keyword": keyword,
+        "results_count": results_count,
+        "timestamp": now.isoformat(),
+        "search_id": str(search_id),
+    })
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        # The "popular now" sketch counts every search, sampled or not.
+        pipe.eval(SPACE_SAVING_LUA, 1, _topk_key(now), normalize_keyword(keyword), TOPK_CAPACITY, TOPK_TTL)
+        if sampled:
+            pipe.rpush(BUFFER_KEY, event)
+        replies = pipe.execute()
+    except Exception as e:
+        # Redis unavailable: fall back to the synchronous insert.
+        print(f"Error buffering search log: {e}")
+        if not sampled:
+            return None
+        SearchQueryLog.objects.create(
+            keyword=keyword, results_count=results_count, clicked=False, search_id=search_id
+        )
+        return search_id
+    if not sampled:
+        return None
+    _overloaded = replies[-1] > settings.SEARCH_LOG_OVERLOAD_THRESHOLD
+    return search_id
+
+
+def drain_search_logs(batch_size=None, max_batches=None):
+    """
+    Move buffered search events into SearchQueryLog with bulk_create.
+    Returns the number of rows written, or 0 while another drain runs.
+
+    A batch is trimmed from the buffer only once its rows are committed, so
+    a failed write leaves it for the next drain.
+    """
+    batch_size = batch_size or settings.SEARCH_LOG_FLUSH_BATCH_SIZE
+    redis = get_redis_connection("default")
+    lock = redis.lock(DRAIN_LOCK_KEY, timeout=DRAIN_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0
+    try:
+        return _drain_batches(redis, batch_size, max_batches)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Expired during a slow drain; nothing left to release.
+            pass
+
+
+def _drain_batches(redis, batch_size, max_batches):
+    written = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        raw_events = redis.lrange(BUFFER_KEY, 0, batch_size - 1)
+        if not raw_events:
+            break
+
+        logs = []
+        for raw in raw_events:
+            event = json.loads(raw)
+            logs.append(SearchQueryLog(
+                keyword=event["keyword"],
+                results_count=event["results_count"],
+                timestamp=parse_datetime(event["timestamp"]),
+                clicked=False,
+                search_id=event.get("search_id"),
+            ))
+        with transaction.atomic():
+            SearchQueryLog.objects.bulk_create(logs, batch_size=1000)
+            add_keyword_stats((log.timestamp, log.keyword, log.results_count, False) for log in logs)
+        # Only the events read: new ones are pushed to the other end.
+        redis.ltrim(BUFFER_KEY, len(raw_events), -1)
+        written += len(logs)
+        batches += 1
+
+    return written
+
+
+def record_click(search_id):
+    """
+    Queue a click on the results of `search_id` for `drain_search_clicks`.
+    """
+    try:
+        get_redis_connection("default").rpush(CLICKS_KEY, f"{search_id}:0")
+    except Exception as e:
+        # Redis unavailable: mark the log directly. A search still in the
+        # buffer has no row yet and loses the click.
+        print(f"Error buffering search click: {e}")
+        with transaction.atomic():
+            logs = list(
+                SearchQueryLog.objects.select_for_update()
+                .filter(search_id=search_id, clicked=False)
+                .values_list("id", "timestamp", "keyword")
+            )
+            SearchQueryLog.objects.filter(id__in=[log[0] for log in logs]).update(clicked=True)
+            add_keyword_clicks((timestamp, keyword) for _, timestamp, keyword in logs)
+
+
+def drain_search_clicks(batch_size=None):
+    """
+    Mark queued clicks on their SearchQueryLog rows, one indexed UPDATE per
+    batch. Returns the number of rows marked clicked.
+    """
+    batch_size = batch_size or settings.SEARCH_LOG_FLUSH_BATCH_SIZE
+    redis = get_redis_connection("default")
+    marked = 0
+    retry = []
+
+    while True:
+        pipe = redis.pipeline(transaction=True)
+        pipe.lrange(CLICKS_KEY, 0, batch_size - 1)
+        pipe.ltrim(CLICKS_KEY, batch_size, -1)
+        raw_clicks, _ = pipe.execute()
+        if not raw_clicks:
+            break
+
+        attempts = {}
+        for raw in raw_clicks:
+            search_id, attempt = (raw.decode() if isinstance(raw, bytes) else raw).rsplit(":", 1)
+            attempts[search_id] = int(attempt)
+
+        with transaction.atomic():
+            logs = list(
+                SearchQueryLog.objects.filter(search_id__in=attempts.keys())
+                .values_list("id", "search_id", "clicked", "timestamp", "keyword")
+            )
+            unclicked = [log for log in logs if not log[2]]
+            SearchQueryLog.objects.filter(id__in=[log[0] for log in unclicked]).update(clicked=True)
+            add_keyword_clicks((timestamp, keyword) for _, _, _, timestamp, keyword in unclicked)
+        marked += len(unclicked)
+
+        found = {str(log[1]) for log in logs}
+        retry.extend(
+            f"{search_id}:{attempt + 1}"
+            for search_id, attempt in attempts.items()
+            if search_id not in found and attempt + 1 < CLICK_ATTEMPTS
+        )
+
+    if retry:
+        redis.rpush(CLICKS_KEY, *retry)
+    return marked
+
+
+def popular_now(limit=10):
+    """
+    Top keywords of the current and previous hour from the Space-Saving
+    summaries. Counts are upper bounds, exact for keywords never evicted.
+    """
+    now = timezone.now()
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for hour in (now, now - timedelta(hours=1)):
+        pipe.zrevrange(_topk_key(hour), 0, TOPK_CAPACITY - 1, withscores=True)
+
+    counts = {}
+    for entries in pipe.execute():
+        for keyword, score in entries:
+            keyword = keyword.decode() if isinstance(keyword, bytes) else keyword
+            counts[keyword] = counts.get(keyword, 0) + int(score)
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [{"keyword": keyword, "search_count": count} for keyword, count in ranked]
+
+
+def _topk_key(moment):
+    return TOPK_KEY.format(hour=moment.strftime("%Y%m%d%H"))
+
@@ -1,10 +1,19 @@
 import cloudinary
+from django.db import models
+from django.db.models import Max
 from rest_framework import serializers
 from django.utils.text import slugify
 from django.utils import timezone
-from .models import Category, Post, Comment, Media
-from apps.users.serializers import UserSerializer
-from apps.core.services.content_moderation import check_toxicity
+from .models import MAX_COMMENT_DEPTH, Category, Post, Comment, Media
+from .comment_tree import attach_comment_trees, comment_visibility
+from .pagination import CommentPathPagination
+from .view_counts import get_buffered_views
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import replace_query_param
+from apps.users.serializers import UserSerializer, UserSummarySerializer
+from apps.core.services.content_moderation import ModerationUnavailable, check_toxicity
 
 class RecursiveField(serializers.Serializer):
     def to_representation(self, value):
@@ -15,20 +24,72 @@ class RecursiveField(serializers.Serializer):
 class CommentSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     replies = RecursiveField(many=True, read_only=True)
+    # Link to the replies not included in `replies` (see attach_thread_replies).
+    replies_next = serializers.SerializerMethodField()
     parent = serializers.PrimaryKeyRelatedField(queryset=Comment.objects.all(), required=False, allow_null=True)
 
     class Meta:
         model = Comment
-        fields = ["id", "author", "content", "created_at", "parent", "replies"]
+        fields = ["id", "author", "content", "created_at", "parent", "depth", "moderation_status", "replies", "replies_next"]
+        read_only_fields = ["moderation_status"]
+
+    def get_replies_next(self, obj):
+        cursor = getattr(obj, "replies_cursor", None)
+        if cursor is None:
+            return None
+        url = reverse("blog:comment-replies", args=[obj.id], request=self.context.get("request"))
+        if cursor:
+            url = replace_query_param(url, "cursor", CommentPathPagination.encode_cursor(cursor))
+        return url
+
+    def validate_parent(self, value):
+        if value is None:
+            return value
+        # Threads are read per post: a reply under another post's comment
+        # would get a path in that thread and show up in neither.
+        post_id = self.instance.post_id if self.instance is not None else self.context.get("post_id")
+        if value.post_id != post_id:
+            raise serializers.ValidationError("The parent comment belongs to another post.")
+        if self.instance is not None and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A comment cannot be moved under itself or its replies.")
+        # A moved comment takes its replies along: the deepest one must fit.
+        subtree_height = 0
+        if self.instance is not None:
+            deepest = self.instance.subtree().aggregate(deepest=Max("depth"))["deepest"]
+            subtree_height = deepest - self.instance.depth
+        if value.depth + 1 + subtree_height > MAX_COMMENT_DEPTH:
+            raise serializers.ValidationError(f"Replies cannot be nested more than {MAX_COMMENT_DEPTH} levels deep.")
+        return value
 
     def validate_content(self, value):
-        result = check_toxicity(value)
+        # Edits that leave the content as it is need no new verdict; in async
+        # mode the content is saved as pending and scored by a task.
+        if self.instance is not None and value == self.instance.content:
+            return value
+        if settings.CONTENT_MODERATION_ASYNC:
+            return value
+        try:
+            result = check_toxicity(value)
+        except ModerationUnavailable:
+            # Saved as pending and retried by moderate_content (see moderation_fields).
+            self.moderation_deferred = True
+            return value
         if not result["allowed"]:
             raise serializers.ValidationError(
                 f"Comment rejected for toxic content (score={result['score']:.2f})"
             )
         return value
 
+class CommentNodeSerializer(serializers.ModelSerializer):
+    """
+    A comment without its replies, for flat subtree listings in path order.
+    """
+    author = UserSerializer(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ["id", "author", "content", "created_at", "parent", "depth"]
+
 class MediaSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
 
@@ -87,10 +148,62 @@ class CategoryReportSerializer(serializers.Serializer):
     total_comments = serializers.IntegerField()
     new_posts = serializers.IntegerField()
 
+POST_SUMMARY_FIELDS = frozenset([
+    "id", "author", "title", "is_published", "scheduled_publish_time", "created_at", "updated_at", "views", "categories"
+])
+
+
+def get_post_fieldset(request):
+    """
+    Return the post fields requested with `?fields=` or `?view=summary`,
+    or None when the full representation should be used.
+    Only read requests are narrowed; writes always get the full post back.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+
+    fields = request.query_params.get("fields", "")
+    if fields:
+        return frozenset(name.strip() for name in fields.split(",") if name.strip())
+    if request.query_params.get("view") == "summary":
+        return POST_SUMMARY_FIELDS
+    return None
+
+
+def attach_buffered_views(posts):
+    # Live view counts: Post.views plus the increments still buffered in Redis.
+    posts = [post for post in posts if not hasattr(post, "buffered_views")]
+    try:
+        buffered = get_buffered_views(post.id for post in posts)
+    except Exception as e:
+        print("Error reading buffered views:", e)
+        buffered = {}
+    for post in posts:
+        post.buffered_views = buffered.get(post.id, 0)
+
+
+def visible_comments(context):
+    # Same comments as the comment endpoints show the requesting user.
+    request = context.get("request")
+    return comment_visibility(request.user if request is not None else None)
+
+
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        if "comments" in self.child.fields:
+            # Build the comment trees of the whole page with a single query.
+            attach_comment_trees(posts, visible_comments(self.context))
+        if "views" in self.child.fields:
+            attach_buffered_views(posts)
+        return super().to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     comments = serializers.SerializerMethodField()
     medias = MediaSerializer(many=True, read_only=True)
+    views = serializers.SerializerMethodField()
 
     categories = CategorySerializer(many=True, read_only=True)
     category_ids = serializers.PrimaryKeyRelatedField(
@@ -104,13 +217,30 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = [
-            "id", "author", "title", "content", "is_published", "scheduled_publish_time", "created_at", "updated_at", "comments", "views", "medias", "categories", "category_ids"
+            "id", "author", "title", "content", "is_published", "scheduled_publish_time", "created_at", "updated_at", "comments", "views", "medias", "categories", "category_ids", "moderation_status"
         ]
-        read_only_fields = ["id", "author", "created_at", "updated_at", "comments", "views", "medias", "categories"]
+        read_only_fields = ["id", "author", "created_at", "updated_at", "comments", "views", "medias", "categories", "moderation_status"]
+        list_serializer_class = PostListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        fieldset = get_post_fieldset(request)
+        if fieldset is None:
+            return
+
+        for name in set(self.fields) - fieldset:
+            self.fields.pop(name)
+        if request.query_params.get("view") == "summary" and "author" in self.fields:
+            self.fields["author"] = UserSummarySerializer(read_only=True)
 
     def get_comments(self, obj):
-        root_comments = obj.comments.filter(parent=None).order_by("created_at")
-        return CommentSerializer(root_comments, many=True).data
+        attach_comment_trees([obj], visible_comments(self.context))
+        return CommentSerializer(obj.comment_tree, many=True).data
+
+    def get_views(self, obj):
+        attach_buffered_views([obj])
+        return obj.views + obj.buffered_views
 
 
     def create(self, validated_data):
@@ -145,7 +275,18 @@ class PostSerializer(serializers.ModelSerializer):
         return attrs
     
     def validate_content(self, value):
-        result = check_toxicity(value)
+        # Edits that leave the content as it is need no new verdict; in async
+        # mode the content is saved as pending and scored by a task.
+        if self.instance is not None and value == self.instance.content:
+            return value
+        if settings.CONTENT_MODERATION_ASYNC:
+            return value
+        try:
+            result = check_toxicity(value)
+        except ModerationUnavailable:
+            # Saved as pending and retried by moderate_content (see moderation_fields).
+            self.moderation_deferred = True
+            return value
         if not result["allowed"]:
             raise serializers.ValidationError(
                 f"Post rejected for toxic content (score={result['score']:.2f})"
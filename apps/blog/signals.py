@@ -1,76 +1,87 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.dispatch import receiver
-from django.db.models.signals import post_save, pre_delete
-from django.contrib.contenttypes.models import ContentType
-from .models import Comment
-from apps.notifications.models import Notification
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from apps.notifications.outbox import enqueue
+from .events import COMMENT_REMOVED, COMMENT_SAVED, POST_CREATED
+from .models import Comment, ModerationStatus, Post, SearchQueryLog
+from .tasks import recompute_related_posts
+from .rollups import add_keyword_stats, record_comment, record_post_categories
+
+# Emails, notifications and websocket pushes go through the outbox
+# (apps.blog.events): one INSERT in the saving transaction, sent only once it
+# commits.
+
+@receiver(post_save, sender=Post)
+def send_email_on_post_created(sender, instance, created, **kwargs):
+    if created:
+        enqueue(POST_CREATED, post_id=instance.id)
 
 @receiver(post_save, sender=Comment)
 def notify_on_comment_save(sender, instance, created, **kwargs):
     print(f"[Signal] Comment {'created' if created else 'updated'}: {instance.id} - {instance.content}")
 
-    channel_layer = get_channel_layer()
-    comment_data = {
-        "id": instance.id,
-        "author": instance.author.username,
-        "content": instance.content,
-        "created_at": instance.created_at.isoformat(),
-    }
-
-    # Send comment information to people viewing the article
-    async_to_sync(channel_layer.group_send)(
-        f"post_{instance.post.id}",
-        {
-            "type": "comment_event",
-            "data": {
-                "action": "created" if created else "updated",
-                "comment": comment_data,
-            },
-        }
+    # Pending comments are announced by moderate_content once approved.
+    enqueue(
+        COMMENT_SAVED,
+        comment_id=instance.id,
+        created=created,
+        approved=instance.moderation_status == ModerationStatus.APPROVED,
     )
 
-    if not created:
-        return 
-
-    notified_user_ids = set()
-
-    # 1. Prioritize sending notifications to parent comment author (if different from commenter)
-    if instance.parent and instance.parent.author.id != instance.author.id:
-        Notification.objects.create(
-            recipient=instance.parent.author,
-            message=f"{instance.author.username} replied to your comment on: {instance.post.title}",
-            content_type=ContentType.objects.get_for_model(instance),
-            object_id=instance.id,
-        )
-        notified_user_ids.add(instance.parent.author.id)
-
-    # 2. Send notification to post author if:
-    # - the commenter is not the post author
-    # - and has not received notification in the above step
-    if (
-        instance.post.author.id != instance.author.id and
-        instance.post.author.id not in notified_user_ids
-    ):
-        Notification.objects.create(
-            recipient=instance.post.author,
-            message=f"{instance.author.username} commented on your post: {instance.post.title}",
-            content_type=ContentType.objects.get_for_model(instance),
-            object_id=instance.id,
-        )
-
 @receiver(pre_delete, sender=Comment)
 def notify_on_comment_delete(sender, instance, **kwargs):
-    print(f"[SIGNAL] Comment deleted: id={instance.id}, post_id={instance.post.id}")
-
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"post_{instance.post.id}",
-        {
-            "type": "comment_event",
-            "data": {
-                "action": "deleted",
-                "comment_id": instance.id,
-            },
-        }
-    )
+    print(f"[SIGNAL] Comment deleted: id={instance.id}, post_id={instance.post_id}")
+
+    enqueue(COMMENT_REMOVED, post_id=instance.post_id, comment_id=instance.id, action="deleted")
+
+@receiver(post_save, sender=Post)
+def refresh_related_on_post_save(sender, instance, created, update_fields=None, **kwargs):
+    # Only title and content feed the ranking.
+    if update_fields is not None and not {"title", "content"} & set(update_fields):
+        return
+    transaction.on_commit(lambda: recompute_related_posts.delay(instance.id))
+
+# Category report rollups (apps.blog.rollups)
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def update_category_stats_on_categories_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    sign = 1 if action == "post_add" else -1
+
+    if reverse:
+        # category.posts.add(...) / remove(...) / clear()
+        if action == "pre_clear":
+            posts = instance.posts.all()
+        else:
+            posts = Post.objects.filter(pk__in=pk_set)
+        for post in posts:
+            record_post_categories(post, [instance.pk], sign)
+        return
+
+    if action == "pre_clear":
+        pk_set = list(instance.categories.values_list("pk", flat=True))
+    record_post_categories(instance, pk_set, sign)
+
+@receiver(pre_delete, sender=Post)
+def update_category_stats_on_post_delete(sender, instance, **kwargs):
+    # The cascaded comments subtract themselves through their own pre_delete.
+    category_ids = list(instance.categories.values_list("pk", flat=True))
+    record_post_categories(instance, category_ids, -1, include_comments=False)
+
+@receiver(post_save, sender=Comment)
+def update_category_stats_on_comment_save(sender, instance, created, **kwargs):
+    if created:
+        record_comment(instance.post_id, 1)
+
+@receiver(pre_delete, sender=Comment)
+def update_category_stats_on_comment_delete(sender, instance, **kwargs):
+    record_comment(instance.post_id, -1)
+
+@receiver(post_save, sender=SearchQueryLog)
+def update_keyword_stats_on_search_log(sender, instance, created, **kwargs):
+    # Rows written one by one (fallback path, admin); the buffered drain
+    # updates the rollups itself after bulk_create.
+    if created:
+        add_keyword_stats([(instance.timestamp, instance.keyword, instance.results_count, instance.clicked)])
+
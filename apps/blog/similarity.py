@@ -0,0 +1,353 @@
+import json
+import os
+import re
+import uuid
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+TOKEN_RE = re.compile(r"[^\W\d_]{2,}")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers him his how i if in into is it its just me more most my no nor not now of off on once only or
+other our out over own same she should so some such than that the their them then there these they this
+those through to too under until up very was we were what when where which while who whom why will with
+would you your
+""".split())
+
+# Title terms count as much as this many content occurrences (the SQL ranking
+# weights title A and content B).
+TITLE_WEIGHT = 2
+# IDF weights are recomputed once more than this share of the posts changed
+# since they were last computed.
+IDF_REFRESH = 0.01
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def term_counts(title, content):
+    counts = Counter(tokenize(content))
+    for token in tokenize(title):
+        counts[token] += TITLE_WEIGHT
+    return counts
+
+
+class TfidfIndex:
+    """
+    Sparse TF-IDF index over post titles and content.
+
+    Raw term counts are stored as a CSR matrix (one row per post) and document
+    frequencies as a dense array, so single posts can be added, replaced or
+    removed without a rebuild. Replaced and removed rows are masked out until
+    `compact()`. The weighted matrix is kept between queries: new rows are
+    weighted with the current IDF, which is recomputed for every row once
+    IDF_REFRESH of the corpus changed.
+
+    `save()` writes a snapshot of plain .npy files that `load()` memory-maps;
+    `save_changes()` appends only the posts changed since to a journal that
+    `load()` and `sync()` replay.
+    """
+
+    FILES = ("data", "indices", "indptr", "doc_ids", "alive", "doc_freq")
+    JOURNAL = "journal.jsonl"
+    # Journaled changes after which save_changes() writes a new snapshot.
+    JOURNAL_LIMIT = 1000
+
+    def __init__(self, vocabulary=None, doc_freq=None, doc_ids=None, alive=None, tf=None, generation=None):
+        self.vocabulary = vocabulary or {}
+        self.doc_freq = np.asarray(doc_freq if doc_freq is not None else [], dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids if doc_ids is not None else [], dtype=np.int64)
+        self.alive = np.asarray(alive if alive is not None else [], dtype=bool)
+        self.tf = tf if tf is not None else sp.csr_matrix((0, 0), dtype=np.float32)
+        # Identifies the snapshot this index was loaded from or saved as.
+        self.generation = generation
+        self._pending = []
+        self._rows = {int(doc_id): row for row, doc_id in enumerate(self.doc_ids) if self.alive[row]}
+        self._unsaved = []
+        self._journal_offset = 0
+        self._journal_length = 0
+        self._weighted = None
+        self._idf = None
+        self._changes = 0
+
+    @classmethod
+    def build(cls, documents):
+        """
+        Build an index from (post_id, title, content) tuples.
+        """
+        index = cls()
+        for post_id, title, content in documents:
+            index.upsert(post_id, title, content)
+        index.compact()
+        index._unsaved = []
+        return index
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in cls.FILES}
+        with open(os.path.join(path, "vocabulary.json")) as f:
+            vocabulary = json.load(f)
+
+        tf = sp.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=(len(arrays["doc_ids"]), len(vocabulary)),
+        )
+        # doc_freq and alive change on every update, so they live in memory.
+        index = cls(
+            vocabulary, np.array(arrays["doc_freq"]), arrays["doc_ids"], np.array(arrays["alive"]), tf,
+            generation=cls._read_generation(path),
+        )
+        index._replay(path)
+        return index
+
+    def sync(self, path):
+        """
+        Apply the changes journaled under `path` since this index was loaded
+        or last synced. Returns False when the snapshot was replaced since,
+        and the index has to be loaded again.
+        """
+        if self._read_generation(path) != self.generation:
+            return False
+        self._replay(path)
+        return True
+
+    def save_changes(self, path):
+        """
+        Append the posts upserted or removed since the last save to the
+        journal, or write a new snapshot when the journal is long enough.
+        """
+        if self._journal_length + len(self._unsaved) > self.JOURNAL_LIMIT:
+            self.compact()
+            self.save(path)
+            return
+        if not self._unsaved:
+            return
+        with open(os.path.join(path, self.JOURNAL), "a") as f:
+            for change in self._unsaved:
+                f.write(json.dumps(change) + "\n")
+            self._journal_offset = f.tell()
+        self._journal_length += len(self._unsaved)
+        self._unsaved = []
+
+    def save(self, path):
+        self._flush_pending()
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "data": self.tf.data,
+            "indices": self.tf.indices,
+            "indptr": self.tf.indptr,
+            "doc_ids": self.doc_ids,
+            "alive": self.alive,
+            "doc_freq": self.doc_freq,
+        }
+        # Write next to the live files and rename, so readers never see a mix.
+        for name, array in arrays.items():
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, np.asarray(array))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        tmp = os.path.join(path, "vocabulary.tmp.json")
+        with open(tmp, "w") as f:
+            json.dump(self.vocabulary, f)
+        os.replace(tmp, os.path.join(path, "vocabulary.json"))
+
+        # Replaying an old journal over the new snapshot is harmless, as
+        # every change in it is idempotent.
+        self.generation = uuid.uuid4().hex
+        tmp = os.path.join(path, "generation.tmp")
+        with open(tmp, "w") as f:
+            f.write(self.generation)
+        os.replace(tmp, os.path.join(path, "generation"))
+        try:
+            os.remove(os.path.join(path, self.JOURNAL))
+        except FileNotFoundError:
+            pass
+        self._unsaved = []
+        self._journal_offset = 0
+        self._journal_length = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, post_id):
+        return int(post_id) in self._rows
+
+    def upsert(self, post_id, title, content):
+        counts = term_counts(title, content)
+        self._upsert_counts(int(post_id), counts)
+        self._unsaved.append({"id": int(post_id), "counts": counts})
+
+    def remove(self, post_id):
+        self._remove(int(post_id))
+        self._unsaved.append({"id": int(post_id)})
+
+    def _upsert_counts(self, post_id, counts):
+        self._remove(post_id)
+
+        columns = []
+        for term in counts:
+            if term not in self.vocabulary:
+                self.vocabulary[term] = len(self.vocabulary)
+            columns.append(self.vocabulary[term])
+        if len(self.vocabulary) > len(self.doc_freq):
+            self.doc_freq = np.concatenate(
+                [self.doc_freq, np.zeros(len(self.vocabulary) - len(self.doc_freq), dtype=np.int64)]
+            )
+        columns = np.asarray(columns, dtype=np.int64)
+        self.doc_freq[columns] += 1
+
+        row = len(self.doc_ids) + len(self._pending)
+        self._pending.append((post_id, columns, np.fromiter(counts.values(), dtype=np.float32)))
+        self._rows[post_id] = row
+        self._changes += 1
+
+    def _remove(self, post_id):
+        row = self._rows.pop(post_id, None)
+        if row is None:
+            return
+        self._flush_pending()
+        self.alive[row] = False
+        self.doc_freq[self.tf.indices[self.tf.indptr[row]:self.tf.indptr[row + 1]]] -= 1
+        self._changes += 1
+
+    def compact(self):
+        """
+        Drop masked rows and unused terms.
+        """
+        self._flush_pending()
+        keep = np.flatnonzero(self.alive)
+        tf = self.tf[keep]
+        used = np.flatnonzero(self.doc_freq > 0)
+        remap = {term: column for term, column in self.vocabulary.items() if self.doc_freq[column] > 0}
+        new_column = np.full(len(self.doc_freq), -1, dtype=np.int64)
+        new_column[used] = np.arange(len(used))
+
+        self.tf = tf[:, used].tocsr()
+        self.vocabulary = {term: int(new_column[column]) for term, column in remap.items()}
+        self.doc_freq = self.doc_freq[used]
+        self.doc_ids = np.asarray(self.doc_ids)[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self._rows = {int(doc_id): row for row, doc_id in enumerate(self.doc_ids)}
+        self._weighted = None
+
+    def top_k(self, post_ids, k=20, min_score=0.0, batch_size=64):
+        """
+        Return {post_id: [(target_id, cosine), ...]} for each indexed post in
+        `post_ids`, best first. Scores come from one sparse-dense product per
+        batch of sources.
+        """
+        self._flush_pending()
+        matrix = self._weighted_matrix()
+        alive = np.asarray(self.alive)
+        doc_ids = np.asarray(self.doc_ids)
+        sources = [int(post_id) for post_id in post_ids if int(post_id) in self._rows]
+        results = {}
+
+        for start in range(0, len(sources), batch_size):
+            batch = sources[start:start + batch_size]
+            rows = np.asarray([self._rows[post_id] for post_id in batch])
+            # Multiplying by the transposed sources avoids converting the
+            # whole transposed matrix back to CSR.
+            scores = (matrix @ matrix[rows].T).T.toarray()
+            scores[:, ~alive] = -1.0
+            scores[np.arange(len(rows)), rows] = -1.0
+
+            count = min(k, scores.shape[1])
+            if count == 0:
+                results.update({post_id: [] for post_id in batch})
+                continue
+            top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+            for i, post_id in enumerate(batch):
+                order = top[i][np.argsort(-scores[i, top[i]])]
+                results[post_id] = [
+                    (int(doc_ids[column]), float(scores[i, column]))
+                    for column in order
+                    if scores[i, column] > min_score
+                ]
+        return results
+
+    def _weighted_matrix(self):
+        # Rows are L2-normalized so the dot product is the cosine similarity.
+        if self._weighted is None or self._changes > IDF_REFRESH * len(self._rows):
+            self._idf = self._compute_idf(0)
+            self._weighted = self._weight(self.tf)
+            self._changes = 0
+            return self._weighted
+
+        rows, columns = self._weighted.shape
+        if len(self._idf) < self.tf.shape[1]:
+            self._idf = np.concatenate([self._idf, self._compute_idf(len(self._idf))])
+        if rows < self.tf.shape[0] or columns < self.tf.shape[1]:
+            weighted = sp.csr_matrix(
+                (self._weighted.data, self._weighted.indices, self._weighted.indptr),
+                shape=(rows, self.tf.shape[1]),
+            )
+            self._weighted = sp.vstack([weighted, self._weight(self.tf[rows:])], format="csr")
+        return self._weighted
+
+    def _compute_idf(self, start):
+        # Smoothed IDF as in scikit-learn, for the terms from column `start`.
+        alive_docs = max(len(self._rows), 1)
+        return (np.log((1 + alive_docs) / (1 + self.doc_freq[start:])) + 1).astype(np.float32)
+
+    def _weight(self, tf):
+        # Sublinear term frequency: 1 + log(count).
+        weighted = sp.csr_matrix(
+            ((1 + np.log(tf.data)) * self._idf[tf.indices], tf.indices, tf.indptr), shape=tf.shape
+        )
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sp.diags(1.0 / norms).dot(weighted).tocsr().astype(np.float32)
+
+    def _replay(self, path):
+        try:
+            f = open(os.path.join(path, self.JOURNAL))
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self._journal_offset)
+            lines = f.read().splitlines()
+            self._journal_offset = f.tell()
+        for line in lines:
+            change = json.loads(line)
+            if "counts" in change:
+                self._upsert_counts(change["id"], change["counts"])
+            else:
+                self._remove(change["id"])
+        self._journal_length += len(lines)
+
+    @staticmethod
+    def _read_generation(path):
+        try:
+            with open(os.path.join(path, "generation")) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        vocab_size = len(self.vocabulary)
+        indptr = [0]
+        indices = []
+        data = []
+        for _, columns, counts in self._pending:
+            indices.append(columns)
+            data.append(counts)
+            indptr.append(indptr[-1] + len(columns))
+        new_rows = sp.csr_matrix(
+            (np.concatenate(data), np.concatenate(indices), np.asarray(indptr)),
+            shape=(len(self._pending), vocab_size),
+        )
+        tf = self.tf
+        if tf.shape[1] < vocab_size:
+            tf = sp.csr_matrix((tf.data, tf.indices, tf.indptr), shape=(tf.shape[0], vocab_size))
+        self.tf = sp.vstack([tf, new_rows], format="csr")
+        self.doc_ids = np.concatenate([np.asarray(self.doc_ids), [post_id for post_id, _, _ in self._pending]]).astype(np.int64)
+        self.alive = np.concatenate([np.asarray(self.alive), np.ones(len(self._pending), dtype=bool)])
+        self._pending = []
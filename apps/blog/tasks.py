@@ -1,6 +1,14 @@
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 from .models import Post
+from .search_log import drain_search_logs, drain_search_clicks
+from .view_counts import flush_view_counts
+from .related import refresh_related_posts, refresh_all_related_posts
+from .rollups import rebuild_category_stats, prune_keyword_rollups
+from .moderation import moderate
+from apps.core.services.content_moderation import ModerationUnavailable
+from apps.core.utils import invalidate_namespace
 
 @shared_task
 def publish_scheduled_posts():    
@@ -12,3 +20,47 @@ def publish_scheduled_posts():
     )
     updated_count = posts.update(is_published=True)
     return f"{updated_count} posts published."
+
+@shared_task
+def flush_search_logs():
+    written = drain_search_logs()
+    # After the logs, so clicks find the searches they belong to.
+    clicked = drain_search_clicks()
+    return f"{written} search logs written, {clicked} clicks recorded."
+
+@shared_task(bind=True, max_retries=None)
+def moderate_content(self, model_name, object_id, action="created"):
+    try:
+        status = moderate(model_name, object_id, action)
+    except ModerationUnavailable as exc:
+        # Stays pending (hidden) until the analyzer answers again.
+        raise self.retry(exc=exc, countdown=settings.CONTENT_MODERATION_RETRY_DELAY)
+    return f"{model_name} {object_id}: {status or 'not pending'}."
+
+@shared_task
+def flush_post_views():
+    written = flush_view_counts()
+    return f"{written} post views written."
+
+@shared_task
+def recompute_related_posts(post_id):
+    count = refresh_related_posts(post_id)
+    invalidate_namespace("posts")
+    return f"{count} related posts stored for post {post_id}."
+
+@shared_task
+def recompute_all_related_posts():
+    count = refresh_all_related_posts()
+    invalidate_namespace("posts")
+    return f"Related posts refreshed for {count} posts."
+
+@shared_task
+def reconcile_category_stats():
+    rebuild_category_stats()
+    return "Category stats rebuilt."
+
+@shared_task
+def prune_search_keyword_rollups():
+    deleted = prune_keyword_rollups()
+    return f"{deleted} hourly keyword rollups pruned."
+
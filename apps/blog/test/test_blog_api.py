@@ -4,6 +4,9 @@ from django.utils import timezone
 from rest_framework import status
 from apps.users.test.factories import UserFactory
 from apps.blog.test.factories import PostFactory, CategoryFactory
+from apps.blog.models import Post
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.cache import cache
 
@@ -95,6 +98,20 @@ class PostAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(all("FastAPI" in post["title"] for post in response.data["results"]))
 
+    def test_post_search_ranks_title_above_content(self):
+        in_content = PostFactory(
+            title="Weekly notes", content="Notes about kubernetes clusters", author=self.user
+        )
+        in_title = PostFactory(
+            title="Kubernetes in production", content="Lessons learned", author=self.user
+        )
+        PostFactory(title="Cooking", content="Pasta recipes", author=self.user)
+
+        response = self.client.get(f"{self.list_url}?search=kubernetes", **self.auth_header)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [post["id"] for post in response.data["results"]]
+        self.assertEqual(ids, [in_title.id, in_content.id])
+
     def test_post_filter_by_category(self):
         new_category = CategoryFactory()
         post1 = PostFactory(author=self.user, categories=[new_category])
@@ -120,6 +137,89 @@ class PostAPITests(APITestCase):
         self.assertEqual(response_page_2.status_code, status.HTTP_200_OK)
         self.assertTrue(len(response_page_2.data["results"]) > 0)
 
+    def test_post_cursor_pagination(self):
+        PostFactory.create_batch(14, author=self.user, is_published=True, scheduled_publish_time=self.now)
+
+        response = self.client.get(f"{self.list_url}?pagination=cursor")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        self.assertEqual(len(response.data["results"]), 10)
+        first_ids = [post["id"] for post in response.data["results"]]
+
+        response_page_2 = self.client.get(response.data["next"])
+        self.assertEqual(response_page_2.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response_page_2.data["next"])
+        second_ids = [post["id"] for post in response_page_2.data["results"]]
+        self.assertEqual(len(second_ids), 5)
+        self.assertFalse(set(first_ids) & set(second_ids))
+
+        response_back = self.client.get(response_page_2.data["previous"])
+        self.assertEqual([post["id"] for post in response_back.data["results"]], first_ids)
+
+    def test_post_cursor_pagination_respects_visibility(self):
+        hidden = PostFactory(is_published=False)
+
+        response = self.client.get(f"{self.list_url}?pagination=cursor")
+        ids = [post["id"] for post in response.data["results"]]
+        self.assertIn(self.post.id, ids)
+        self.assertNotIn(hidden.id, ids)
+
+    def test_post_cursor_pagination_invalid_cursor(self):
+        response = self.client.get(f"{self.list_url}?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_post_cursor_pagination_keeps_search_rank_order(self):
+        # Three posts per rank, so ties are broken by (created_at, id).
+        for n in range(12):
+            PostFactory(
+                author=self.user, is_published=True, scheduled_publish_time=self.now,
+                title=f"Post {n}", content=" ".join(["django"] * (n % 4 + 1) + ["filler"] * 20),
+            )
+        query = SearchQuery("django", search_type="websearch", config="english")
+        expected = list(
+            Post.objects.filter(search_vector=query, title__startswith="Post ")
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+
+        response = self.client.get(f"{self.list_url}?pagination=cursor&search=django")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("search_id", response.data)
+        first_ids = [post["id"] for post in response.data["results"]]
+        self.assertEqual(len(first_ids), 10)
+
+        response_page_2 = self.client.get(response.data["next"])
+        self.assertIsNone(response_page_2.data["next"])
+        second_ids = [post["id"] for post in response_page_2.data["results"]]
+        self.assertEqual([i for i in first_ids + second_ids if i in expected], expected)
+        self.assertEqual(len(first_ids + second_ids), len(set(first_ids + second_ids)))
+
+        response_back = self.client.get(response_page_2.data["previous"])
+        self.assertEqual([post["id"] for post in response_back.data["results"]], first_ids)
+
+    def test_post_list_summary_view(self):
+        response = self.client.get(f"{self.list_url}?view=summary")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        post = response.data["results"][0]
+        self.assertEqual(post["title"], self.post.title)
+        for name in ("content", "comments", "medias"):
+            self.assertNotIn(name, post)
+        self.assertEqual(set(post["author"]), {"id", "username"})
+
+    def test_post_list_sparse_fields(self):
+        # Page COUNT + the page itself: no comment, category or media queries.
+        with self.assertNumQueries(2):
+            response = self.client.get(f"{self.list_url}?fields=id,title")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["results"][0]), {"id", "title"})
+
+    def test_post_detail_sparse_fields(self):
+        response = self.client.get(f"{self.detail_url}?fields=id,views")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"id", "views"})
+
     def test_unpublished_post_view_by_author(self):
         post = PostFactory(is_published=False, author=self.user)
         url = reverse("blog:post-detail", args=[post.id])
@@ -6,6 +6,7 @@ from apps.users.test.factories import UserFactory
 from apps.blog.test.factories import PostFactory, CategoryFactory, CommentFactory
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.cache import cache
+from apps.blog.rollups import add_category_stats, rebuild_category_stats
 
 class CategoryReportAPITests(APITestCase):
     def setUp(self):
@@ -91,3 +92,27 @@ class CategoryReportAPITests(APITestCase):
     def test_category_report_access_denied_for_unauthenticated(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_category_report_counts_equal_view_counts(self):
+        # Sum(distinct=True) used to collapse posts with the same view count
+        PostFactory(author=self.user, categories=[self.cat_food], views=5)
+
+        response = self.client.get(self.url, **self.admin_auth_header)
+        food_data = next(c for c in response.data if c["id"] == self.cat_food.id)
+        self.assertEqual(food_data["total_views"], 10)
+
+    def test_category_report_tracks_flushed_views_and_deleted_comments(self):
+        add_category_stats({(self.cat_food.id, timezone.now().date()): (3, 0, 0)})
+        self.post2.comments.first().delete()
+
+        response = self.client.get(self.url, **self.admin_auth_header)
+        food_data = next(c for c in response.data if c["id"] == self.cat_food.id)
+        self.assertEqual(food_data["total_views"], 8)
+        self.assertEqual(food_data["total_comments"], 0)
+
+    def test_category_report_matches_rebuild(self):
+        response = self.client.get(self.url, **self.admin_auth_header)
+
+        rebuild_category_stats()
+
+        self.assertEqual(self.client.get(self.url, **self.admin_auth_header).data, response.data)
@@ -1,8 +1,13 @@
+from unittest.mock import patch
+
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.urls import reverse
 from apps.users.test.factories import UserFactory
 from apps.blog.test.factories import PostFactory, CommentFactory
+from apps.blog.comment_tree import REPLIES_PER_LEVEL, THREAD_DEPTH
+from apps.blog.models import Comment
+from apps.blog.pagination import CommentPathPagination
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.cache import cache
 
@@ -93,3 +98,115 @@ class CommentAPITests(APITestCase):
         self.assertIn("replies", child)
         self.assertEqual(len(child["replies"]), 1)
         self.assertEqual(child["replies"][0]["id"], grandchild_comment.id)
+
+    def test_comment_paths_follow_the_thread(self):
+        child = CommentFactory(post=self.post, parent=self.comment)
+        grandchild = CommentFactory(post=self.post, parent=child)
+
+        self.assertEqual(grandchild.depth, 2)
+        self.assertTrue(grandchild.path.startswith(child.path))
+        self.assertEqual(
+            list(self.comment.subtree().order_by("path")),
+            [self.comment, child, grandchild],
+        )
+
+    def test_moving_a_comment_moves_its_replies(self):
+        other_root = CommentFactory(post=self.post)
+        child = CommentFactory(post=self.post, parent=self.comment)
+        grandchild = CommentFactory(post=self.post, parent=child)
+
+        child.parent = other_root
+        child.save()
+
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.depth, 2)
+        self.assertTrue(grandchild.path.startswith(other_root.path))
+        self.assertEqual(list(self.comment.descendants()), [])
+
+    @patch("apps.blog.serializers.MAX_COMMENT_DEPTH", 2)
+    def test_reply_depth_is_capped(self):
+        child = CommentFactory(post=self.post, parent=self.comment)
+        grandchild = CommentFactory(post=self.post, parent=child)
+
+        response = self.client.post(self.comment_url, {"content": "Too deep", "parent": grandchild.id}, **self.user_auth)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Moving a thread with replies under a reply would push them too deep.
+        other_root = CommentFactory(post=self.post, author=self.user)
+        CommentFactory(post=self.post, parent=other_root)
+        url = reverse('blog:comment-detail', args=[other_root.id])
+        response = self.client.patch(url, {"parent": child.id}, **self.user_auth)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_parent_must_belong_to_the_same_post(self):
+        other_comment = CommentFactory(post=PostFactory())
+
+        response = self.client.post(self.comment_url, {"content": "Reply", "parent": other_comment.id}, **self.user_auth)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("parent", response.data)
+
+        response = self.client.patch(self.comment_detail_url, {"parent": other_comment.id}, **self.user_auth)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.comment.refresh_from_db()
+        self.assertIsNone(self.comment.parent_id)
+
+    def test_bulk_create_fills_in_paths(self):
+        replies = Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, content=f"Reply {n}", parent=self.comment) for n in range(2)
+        ])
+
+        for reply in replies:
+            reply.refresh_from_db()
+            self.assertEqual(reply.depth, 1)
+            self.assertTrue(reply.path.startswith(self.comment.path))
+        self.assertEqual(list(self.comment.subtree().order_by("path")), [self.comment, *replies])
+
+    def test_root_threads_paginated_with_cursor(self):
+        CommentFactory.create_batch(CommentPathPagination.page_size, post=self.post)
+
+        response = self.client.get(self.comment_url)
+        self.assertEqual(len(response.data["results"]), CommentPathPagination.page_size)
+        self.assertEqual(response.data["results"][0]["id"], self.comment.id)
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
+
+    def test_replies_bounded_per_level(self):
+        replies = CommentFactory.create_batch(REPLIES_PER_LEVEL + 2, post=self.post, parent=self.comment)
+
+        response = self.client.get(self.comment_url)
+        root = response.data["results"][0]
+        self.assertEqual([c["id"] for c in root["replies"]], [c.id for c in replies[:REPLIES_PER_LEVEL]])
+        self.assertIsNotNone(root["replies_next"])
+
+        response = self.client.get(root["replies_next"])
+        self.assertEqual([c["id"] for c in response.data["results"]], [c.id for c in replies[REPLIES_PER_LEVEL:]])
+
+    def test_replies_below_thread_depth_are_linked(self):
+        parent = self.comment
+        for _ in range(THREAD_DEPTH + 1):
+            parent = CommentFactory(post=self.post, parent=parent)
+
+        response = self.client.get(self.comment_url)
+        deepest = response.data["results"][0]
+        for _ in range(THREAD_DEPTH):
+            self.assertIsNone(deepest["replies_next"])
+            deepest = deepest["replies"][0]
+        self.assertEqual(deepest["replies"], [])
+
+        response = self.client.get(deepest["replies_next"])
+        self.assertEqual(response.data["results"][0]["id"], parent.id)
+
+    def test_subtree_in_thread_order(self):
+        child = CommentFactory(post=self.post, parent=self.comment)
+        CommentFactory(post=self.post)
+        grandchild = CommentFactory(post=self.post, parent=child)
+        second_child = CommentFactory(post=self.post, parent=self.comment)
+
+        url = reverse('blog:comment-subtree', args=[self.comment.id])
+        response = self.client.get(url)
+        self.assertEqual(
+            [c["id"] for c in response.data["results"]],
+            [self.comment.id, child.id, grandchild.id, second_child.id],
+        )
@@ -1,12 +1,34 @@
+import time
+from unittest.mock import patch
+
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from apps.users.test.factories import UserFactory
 from apps.blog.test.factories import PostFactory, CategoryFactory
+from apps.blog.models import Comment, ModerationStatus, Post
 from apps.blog.serializers import check_toxicity
+from apps.blog.tasks import moderate_content
+from apps.notifications.outbox import drain_outbox
+from apps.core.services.content_moderation import (
+    VERDICT_KEY,
+    CircuitBreaker,
+    ModerationUnavailable,
+    PreFilter,
+    clear_local_cache,
+    get_analyzer,
+    get_breaker,
+    moderation_cache_stats,
+    reset_breaker,
+    reset_moderation_cache_stats,
+    text_digest,
+)
 
 
 class PostModerationAPITests(APITestCase):
@@ -89,3 +111,246 @@ class CommentModerationAPITests(APITestCase):
             response.status_code,
             status.HTTP_201_CREATED if toxicity_result["allowed"] else status.HTTP_400_BAD_REQUEST
         )
+
+
+@override_settings(CONTENT_MODERATION_ANALYZER="fake", CONTENT_MODERATION_PREFILTER=False)
+class ToxicityCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        reset_moderation_cache_stats()
+        self.analyzer = get_analyzer()
+        self.analyzer.calls = 0
+
+    def test_normalized_repeats_use_the_cache(self):
+        first = check_toxicity("You worthless piece of garbage")
+        second = check_toxicity("  you WORTHLESS piece   of garbage ")
+
+        self.assertFalse(first["allowed"])
+        self.assertEqual(second["score"], first["score"])
+        self.assertEqual(self.analyzer.calls, 1)
+        self.assertEqual(moderation_cache_stats()["l1_hits"], 1)
+
+    def test_redis_serves_other_processes(self):
+        check_toxicity("Have a nice day")
+        clear_local_cache()
+
+        self.assertTrue(check_toxicity("Have a nice day")["allowed"])
+        self.assertEqual(self.analyzer.calls, 1)
+        stats = moderation_cache_stats()
+        self.assertEqual((stats["redis_hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_rejected_verdicts_kept_longer(self):
+        check_toxicity("Have a nice day")
+        check_toxicity("stupid idiot")
+
+        redis = get_redis_connection("default")
+        allowed_ttl = redis.ttl(VERDICT_KEY.format(digest=text_digest("Have a nice day")))
+        rejected_ttl = redis.ttl(VERDICT_KEY.format(digest=text_digest("stupid idiot")))
+        self.assertGreater(rejected_ttl, allowed_ttl)
+
+    def test_unchanged_post_edit_skips_moderation(self):
+        user = UserFactory()
+        post = PostFactory(author=user, content="Same content")
+        url = reverse("blog:post-detail", args=[post.id])
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+        response = self.client.patch(url, {"title": "New title", "content": "Same content"}, **auth)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.analyzer.calls, 0)
+
+
+@override_settings(CONTENT_MODERATION_ANALYZER="fake", CONTENT_MODERATION_ASYNC=True, OUTBOX_KICK=False)
+class AsyncModerationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.user = UserFactory()
+        self.category = CategoryFactory()
+        self.post = PostFactory(is_published=True, scheduled_publish_time=timezone.now())
+        self.comment_url = reverse("blog:post-comments", args=[self.post.id])
+        self.auth_header = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    def create_comment(self, content):
+        with patch("apps.blog.views.moderate_content.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.comment_url, {"content": content}, **self.auth_header)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        delay.assert_called_once_with("comment", response.data["id"], "created")
+        return response.data
+
+    def anonymous_comment_ids(self):
+        self.client.credentials()
+        return [c["id"] for c in self.client.get(self.comment_url).data["results"]]
+
+    def test_comment_pending_until_approved(self):
+        comment = self.create_comment("Thanks for sharing")
+        self.assertEqual(comment["moderation_status"], ModerationStatus.PENDING)
+
+        author_view = self.client.get(self.comment_url, **self.auth_header).data["results"]
+        self.assertIn(comment["id"], [c["id"] for c in author_view])
+        self.assertNotIn(comment["id"], self.anonymous_comment_ids())
+
+        moderate_content("comment", comment["id"])
+
+        self.assertIn(comment["id"], self.anonymous_comment_ids())
+
+    def test_toxic_comment_rejected(self):
+        comment = self.create_comment("Go rot, you worthless piece of garbage")
+
+        moderate_content("comment", comment["id"])
+
+        self.assertEqual(Comment.objects.get(id=comment["id"]).moderation_status, ModerationStatus.REJECTED)
+        self.assertNotIn(comment["id"], self.anonymous_comment_ids())
+
+    def test_post_hidden_from_list_until_approved(self):
+        data = {"title": "Pending post", "content": "A friendly post", "category_ids": [self.category.id]}
+        with patch("apps.blog.views.moderate_content.delay"):
+            with self.captureOnCommitCallbacks(execute=True):
+                post_id = self.client.post(reverse("blog:post-list-create"), data, **self.auth_header).data["id"]
+        Post.objects.filter(id=post_id).update(is_published=True)
+
+        self.client.credentials()
+        list_url = reverse("blog:post-list-create")
+        self.assertNotIn(post_id, [p["id"] for p in self.client.get(list_url).data["results"]])
+
+        moderate_content("post", post_id)
+        # The "posts" cache is invalidated by the outbox drain.
+        drain_outbox()
+
+        self.assertIn(post_id, [p["id"] for p in self.client.get(list_url).data["results"]])
+
+
+@override_settings(CONTENT_MODERATION_ANALYZER="fake")
+class PreFilterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        reset_moderation_cache_stats()
+        self.analyzer = get_analyzer()
+        self.analyzer.calls = 0
+        self.prefilter = PreFilter({"idiot": 0.5, "moron": 0.5, "piece of garbage": 1.0})
+
+    def test_wordlist_hits_rejected_locally(self):
+        self.assertEqual(self.prefilter.classify("What a piece of garbage"), (False, 1.0))
+        # Letter substitutions and stretched letters are undone.
+        self.assertEqual(self.prefilter.classify("you 1d10t, you mooooron")[0], False)
+
+    def test_everything_else_left_to_the_analyzer(self):
+        self.assertIsNone(self.prefilter.classify("Great post, thanks!"))
+        # Short abuse the wordlist does not know is never allowed locally.
+        self.assertIsNone(self.prefilter.classify("go to hell you bitch"))
+        self.assertIsNone(self.prefilter.classify("I will find you and hurt you"))
+        self.assertIsNone(self.prefilter.classify("You idiot"))
+        self.assertIsNone(self.prefilter.classify("WHY WOULD ANYONE DO THIS"))
+
+    def test_whole_words_only(self):
+        self.assertIsNone(self.prefilter.classify("Idiotproof setup"))
+
+    def test_short_safe_text_allowed_locally(self):
+        prefilter = PreFilter({"idiot": 0.5}, safe_words={"great", "nice", "post", "thanks", "you"})
+
+        self.assertEqual(prefilter.classify("Great post, thanks!"), (True, 0.0))
+        self.assertEqual(prefilter.classify("nice  POST"), (True, 0.0))
+        # A word outside the vocabulary, a partial match, shouting, other
+        # characters or a long text still go to the analyzer.
+        self.assertIsNone(prefilter.classify("Great post, loser"))
+        self.assertIsNone(prefilter.classify("Nice post, idiot"))
+        self.assertIsNone(prefilter.classify("Great post!!!"))
+        self.assertIsNone(prefilter.classify("Great post \U0001f595"))
+        self.assertIsNone(prefilter.classify("great " * 9))
+
+    @override_settings(CONTENT_MODERATION_PREFILTER_ALLOW=True)
+    def test_check_toxicity_skips_the_analyzer_for_safe_text(self):
+        self.assertTrue(check_toxicity("Nice post!")["allowed"])
+        self.assertEqual(self.analyzer.calls, 0)
+
+        self.assertTrue(check_toxicity("A perfectly normal comment")["allowed"])
+        self.assertEqual(self.analyzer.calls, 1)
+
+        stats = moderation_cache_stats()
+        self.assertEqual((stats["prefilter_allowed"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["remote_avoided"], 0.5)
+
+    def test_check_toxicity_skips_the_analyzer_for_wordlist_hits(self):
+        self.assertFalse(check_toxicity("Go rot in a hole, you worthless piece of garbage.")["allowed"])
+        self.assertEqual(self.analyzer.calls, 0)
+
+        self.assertTrue(check_toxicity("Nice post!")["allowed"])
+        self.assertEqual(self.analyzer.calls, 1)
+
+        stats = moderation_cache_stats()
+        self.assertEqual((stats["prefilter_rejected"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["remote_avoided"], 0.5)
+
+
+@override_settings(
+    CONTENT_MODERATION_ANALYZER="faulty",
+    CONTENT_MODERATION_PREFILTER=False,
+    CONTENT_MODERATION_TIMEOUT=0.2,
+    CONTENT_MODERATION_BREAKER_MIN_CALLS=2,
+    CONTENT_MODERATION_BREAKER_COOLDOWN=0.1,
+    OUTBOX_KICK=False,
+)
+class ModerationFailureTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        reset_moderation_cache_stats()
+        reset_breaker()
+        self.analyzer = get_analyzer()
+        self.analyzer.calls = 0
+        self.analyzer.latency = 0.0
+        self.analyzer.failure_rate = 0.0
+
+    def test_slow_analyzer_hits_the_deadline(self):
+        self.analyzer.latency = 1.0
+
+        with self.assertRaises(ModerationUnavailable):
+            check_toxicity("A perfectly normal comment")
+        self.assertEqual(moderation_cache_stats()["timeouts"], 1)
+
+    @override_settings(CONTENT_MODERATION_FAILURE_POLICY="open")
+    def test_fail_open_policy(self):
+        self.analyzer.failure_rate = 1.0
+
+        result = check_toxicity("A perfectly normal comment")
+
+        self.assertTrue(result["allowed"])
+        self.assertIsNone(result["score"])
+        # One retry inside the budget.
+        self.assertEqual(self.analyzer.calls, 2)
+
+    def test_breaker_opens_and_recovers(self):
+        self.analyzer.failure_rate = 1.0
+        with self.assertRaises(ModerationUnavailable):
+            check_toxicity("A perfectly normal comment")
+        self.assertEqual(get_breaker().state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(ModerationUnavailable):
+            check_toxicity("A perfectly normal comment")
+        self.assertEqual(self.analyzer.calls, 2)
+
+        self.analyzer.failure_rate = 0.0
+        time.sleep(0.15)
+        self.assertTrue(check_toxicity("A perfectly normal comment")["allowed"])
+        self.assertEqual(get_breaker().state, CircuitBreaker.CLOSED)
+
+        stats = moderation_cache_stats()
+        self.assertEqual((stats["errors"], stats["breaker_rejected"], stats["breaker_opened"]), (2, 1, 1))
+
+    def test_comment_saved_pending_when_analyzer_is_down(self):
+        self.analyzer.failure_rate = 1.0
+        user = UserFactory()
+        url = reverse("blog:post-comments", args=[PostFactory().id])
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+        with patch("apps.blog.views.moderate_content.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {"content": "A perfectly normal comment"}, **auth)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["moderation_status"], ModerationStatus.PENDING)
+        delay.assert_called_once_with("comment", response.data["id"], "created")
@@ -1,6 +1,9 @@
 import json
 import hashlib
+import threading
+import time
 from django.core.cache import cache
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -8,6 +11,8 @@ from rest_framework_simplejwt.tokens import RefreshToken
 
 from apps.users.test.factories import UserFactory
 from apps.blog.test.factories import PostFactory, CategoryFactory
+from apps.blog.models import ModerationStatus, Post
+from apps.core.utils import namespaced_key, invalidate_namespace, get_namespace_generation, get_or_set_namespaced
 
 
 class PostCacheTestCase(APITestCase):
@@ -25,12 +30,14 @@ class PostCacheTestCase(APITestCase):
         self.access_token = str(refresh.access_token)
         self.auth_header = {'HTTP_AUTHORIZATION': f'Bearer {self.access_token}'}
 
-        # Cache key format
-        raw_key = f"posts:list:::page:1"
-        self.cache_key = f"posts:{hashlib.md5(raw_key.encode()).hexdigest()}"
-
         cache.clear()
 
+    @property
+    def cache_key(self):
+        # Cache key format (resolved against the current "posts" generation)
+        raw_key = f"posts:list:::page:1:viewer:user:{self.user.id}"
+        return namespaced_key("posts", hashlib.md5(raw_key.encode()).hexdigest())
+
     def test_post_list_cache_create_and_retrieve(self):
         """Cache is created and reused"""
         self.assertIsNone(cache.get(self.cache_key))
@@ -41,7 +48,7 @@ class PostCacheTestCase(APITestCase):
 
         cached_response = cache.get(self.cache_key)
         self.assertIsNotNone(cached_response)
-        self.assertEqual(cached_response["count"], 2)
+        self.assertEqual(cached_response["value"]["data"]["count"], 2)
 
         response2 = self.client.get(self.list_url, **self.auth_header)
         self.assertEqual(response2.status_code, status.HTTP_200_OK)
@@ -89,3 +96,86 @@ class PostCacheTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         self.assertIsNone(cache.get(self.cache_key), "Cache should be cleared after DELETE")
+
+    def test_viewers_do_not_share_pages(self):
+        """An author's own unmoderated post must not reach the anonymous page"""
+        pending = PostFactory(author=self.user, moderation_status=ModerationStatus.PENDING)
+        Post.objects.filter(id__in=[self.post1.id, self.post2.id, pending.id]).update(
+            is_published=True, scheduled_publish_time=timezone.now()
+        )
+
+        author_ids = [p["id"] for p in self.client.get(self.list_url, **self.auth_header).data["results"]]
+        self.assertIn(pending.id, author_ids)
+
+        anonymous_ids = [p["id"] for p in self.client.get(self.list_url).data["results"]]
+        self.assertNotIn(pending.id, anonymous_ids)
+        self.assertIn(self.post1.id, anonymous_ids)
+
+
+class NamespacedCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidate_namespace_bumps_generation(self):
+        key = namespaced_key("things", "a")
+        cache.set(key, "value", timeout=60)
+        generation = get_namespace_generation("things")
+
+        invalidate_namespace("things")
+
+        self.assertEqual(get_namespace_generation("things"), generation + 1)
+        self.assertNotEqual(namespaced_key("things", "a"), key)
+        self.assertIsNone(cache.get(namespaced_key("things", "a")))
+
+    def test_invalidate_namespace_leaves_other_namespaces(self):
+        cache.set(namespaced_key("things", "a"), "value", timeout=60)
+        cache.set(namespaced_key("others", "a"), "other", timeout=60)
+
+        invalidate_namespace("things")
+
+        self.assertIsNone(cache.get(namespaced_key("things", "a")))
+        self.assertEqual(cache.get(namespaced_key("others", "a")), "other")
+
+    def test_invalidate_namespace_without_generation(self):
+        invalidate_namespace("fresh")
+        self.assertIsNotNone(get_namespace_generation("fresh"))
+
+
+class CacheStampedeTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_rebuild_once(self):
+        builds = []
+        barrier = threading.Barrier(20)
+        results = []
+
+        def compute():
+            builds.append(1)
+            time.sleep(0.3)
+            return {"rebuilt": True}
+
+        def worker():
+            barrier.wait()
+            results.append(get_or_set_namespaced("stampede", "page", compute, timeout=60))
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [{"rebuilt": True}] * 20)
+
+    def test_stale_value_served_while_locked(self):
+        get_or_set_namespaced("stampede", "page", lambda: "old", timeout=60)
+        entry_key = namespaced_key("stampede", "page")
+        entry = cache.get(entry_key)
+        entry["expires"] = time.time() - 1
+        cache.set(entry_key, entry, timeout=60)
+        cache.add(f"{entry_key}:lock", 1, timeout=10)
+
+        value = get_or_set_namespaced("stampede", "page", lambda: "new", timeout=60)
+
+        self.assertEqual(value, "old")
@@ -1,5 +1,6 @@
-from rest_framework.test import APITestCase
-from apps.blog.models import Post, Comment, Category
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from apps.blog.models import Post, Comment, Category, ModerationStatus
 from apps.blog.serializers import PostSerializer
 from apps.blog.test.factories import UserFactory, PostFactory, CommentFactory, CategoryFactory
 
@@ -42,3 +43,53 @@ class PostSerializerTests(APITestCase):
         for comment in data["comments"]:
             self.assertEqual(comment["author"]["id"], self.user.id)
             self.assertEqual(comment["author"]["username"], self.user.username)
+
+    def test_comment_tree_shows_own_pending_comments(self):
+        CommentFactory(author=self.user, post=self.post, content="Pending", moderation_status=ModerationStatus.PENDING)
+
+        def comments_for(user):
+            request = Request(APIRequestFactory().get("/"))
+            request.user = user
+            data = PostSerializer(Post.objects.get(pk=self.post.pk), context={"request": request}).data
+            return [comment["content"] for comment in data["comments"]]
+
+        self.assertIn("Pending", comments_for(self.user))
+        self.assertIn("Pending", comments_for(UserFactory(is_staff=True)))
+        self.assertNotIn("Pending", comments_for(UserFactory()))
+        self.assertEqual(len(PostSerializer(instance=self.post).data["comments"]), 2)
+
+
+class PostSerializerQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.posts = PostFactory.create_batch(3, author=self.user)
+
+    def _build_threads(self, depth):
+        for post in self.posts:
+            parent = None
+            for _ in range(depth):
+                parent = CommentFactory(post=post, parent=parent)
+
+    def _serialize_page(self):
+        posts = list(
+            Post.objects.filter(id__in=[post.id for post in self.posts])
+            .select_related("author")
+            .prefetch_related("categories", "medias")
+        )
+        # Only the comment tree query remains once the page itself is loaded.
+        with self.assertNumQueries(1):
+            return PostSerializer(posts, many=True).data
+
+    def test_comment_tree_query_count_is_constant_with_depth(self):
+        self._build_threads(depth=1)
+        self._serialize_page()
+
+        self._build_threads(depth=6)
+        data = self._serialize_page()
+
+        comment = data[0]["comments"][1]
+        depth = 0
+        while comment["replies"]:
+            comment = comment["replies"][0]
+            depth += 1
+        self.assertEqual(depth, 5)
@@ -0,0 +1,75 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from apps.users.test.factories import UserFactory
+from apps.blog.test.factories import PostFactory
+from apps.blog.tasks import flush_post_views
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from apps.blog.view_counts import FLUSH_LOCK_KEY
+
+
+class PostViewCountTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        self.post = PostFactory(author=self.user, is_published=True, scheduled_publish_time=timezone.now())
+        self.detail_url = reverse("blog:post-detail", args=[self.post.id])
+        self.stats_url = reverse("blog:post-stats", args=[self.post.id])
+
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_header = {'HTTP_AUTHORIZATION': f'Bearer {str(refresh.access_token)}'}
+
+    def test_views_are_buffered_and_shown_live(self):
+        self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+        # The second response already includes both buffered views
+        self.assertEqual(response.data["views"], 2)
+
+    def test_flush_writes_buffered_views(self):
+        for _ in range(3):
+            self.client.get(self.detail_url)
+
+        flush_post_views()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 3)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["views"], 4)
+
+    def test_flush_skips_while_another_flush_runs(self):
+        self.client.get(self.detail_url)
+        lock = get_redis_connection("default").lock(FLUSH_LOCK_KEY, timeout=10)
+        self.assertTrue(lock.acquire(blocking=False))
+        try:
+            flush_post_views()
+        finally:
+            lock.release()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+        flush_post_views()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+
+    def test_post_stats(self):
+        self.client.get(self.detail_url)
+        self.client.get(self.detail_url)
+
+        response = self.client.get(self.stats_url, **self.auth_header)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["views"], 2)
+        self.assertEqual(response.data["unique_visitors"], 1)
+        self.assertEqual(response.data["daily_views"][-1]["views"], 2)
+
+    def test_post_stats_forbidden_for_other_users(self):
+        other = UserFactory()
+        token = str(RefreshToken.for_user(other).access_token)
+        response = self.client.get(self.stats_url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -6,6 +6,8 @@ from apps.users.test.factories import UserFactory
 from apps.blog.test.factories import PostFactory, CategoryFactory
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.cache import cache
+from apps.blog.models import RelatedPost
+from apps.blog.tasks import recompute_related_posts
 
 
 class RelatedPostsAPITests(APITestCase):
@@ -50,6 +52,7 @@ class RelatedPostsAPITests(APITestCase):
             is_published=True,
             scheduled_publish_time=self.now
         )
+        recompute_related_posts(self.post_main.id)
 
         response = self.client.get(self.related_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -69,6 +72,7 @@ class RelatedPostsAPITests(APITestCase):
             is_published=True,
             scheduled_publish_time=self.now
         )
+        recompute_related_posts(self.post_main.id)
 
         response = self.client.get(self.related_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -77,3 +81,17 @@ class RelatedPostsAPITests(APITestCase):
     def test_related_posts_unauthenticated(self):
         response = self.client.get(self.related_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_related_posts_hide_unpublished_targets(self):
+        draft = PostFactory(
+            author=UserFactory(),
+            title="Django Tutorial draft",
+            content="Learn Django with examples",
+            is_published=False,
+        )
+        recompute_related_posts(self.post_main.id)
+        self.assertTrue(RelatedPost.objects.filter(source=self.post_main, target=draft).exists())
+
+        response = self.client.get(self.related_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any(p["id"] == draft.id for p in response.data))
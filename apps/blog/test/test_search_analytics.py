@@ -4,9 +4,15 @@ from django.utils import timezone
 from rest_framework import status
 from apps.users.test.factories import UserFactory
 from apps.blog.test.factories import PostFactory, CategoryFactory
-from apps.blog.models import SearchQueryLog
+from apps.blog.models import SearchKeywordRollup, SearchQueryLog
+from apps.blog.tasks import flush_search_logs
+from apps.blog.search_log import BUFFER_KEY, record_search, record_click, drain_search_logs, drain_search_clicks
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.cache import cache
+from django.test import override_settings
+from django.db import DatabaseError
+from django_redis import get_redis_connection
+from unittest.mock import patch
 
 class SearchAnalyticsAPITests(APITestCase):
     def setUp(self):
@@ -37,6 +43,10 @@ class SearchAnalyticsAPITests(APITestCase):
         response = self.client.get(f"{self.search_list_url}?search=Django")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+        # Logs are buffered until the flush task runs
+        self.assertFalse(SearchQueryLog.objects.filter(keyword="Django").exists())
+        flush_search_logs()
+
         # Check the generated log
         logs = SearchQueryLog.objects.filter(keyword="Django")
         self.assertTrue(logs.exists())
@@ -56,13 +66,13 @@ class SearchAnalyticsAPITests(APITestCase):
         self.assertIn("popular_keywords", data)
         self.assertIn("low_results_keywords", data)
 
-        # Check the returned data for the generated keywords
+        # Check the returned data for the generated keywords (normalized to lower case)
         popular_keywords = {item['keyword'] for item in data['popular_keywords']}
-        self.assertIn("Django", popular_keywords)
-        self.assertIn("FastAPI", popular_keywords)
+        self.assertIn("django", popular_keywords)
+        self.assertIn("fastapi", popular_keywords)
 
         low_results_keywords = {item['keyword'] for item in data['low_results_keywords']}
-        self.assertIn("NoResults", low_results_keywords)
+        self.assertIn("noresults", low_results_keywords)
 
     def test_search_analytics_forbidden_for_non_admin(self):
         response = self.client.get(self.search_analytics_url, **self.user_auth_header)
@@ -86,3 +96,107 @@ class SearchAnalyticsAPITests(APITestCase):
     def test_search_click_update_no_keyword(self):
         response = self.client.post(self.search_click_url, {}, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_log_buffer_drained_in_batches(self):
+        for i in range(7):
+            record_search(f"keyword {i}", i)
+
+        written = drain_search_logs(batch_size=3)
+
+        self.assertEqual(written, 7)
+        self.assertEqual(SearchQueryLog.objects.count(), 7)
+        self.assertEqual(drain_search_logs(batch_size=3), 0)
+
+    def test_failed_drain_keeps_the_buffer(self):
+        for i in range(3):
+            record_search(f"keyword {i}", i)
+
+        with patch.object(SearchQueryLog.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                drain_search_logs()
+        self.assertEqual(get_redis_connection("default").llen(BUFFER_KEY), 3)
+
+        self.assertEqual(drain_search_logs(), 3)
+        self.assertEqual(SearchQueryLog.objects.count(), 3)
+
+    @override_settings(SEARCH_LOG_SAMPLE_RATE=0.0)
+    def test_search_log_sampling(self):
+        record_search("Django", 2)
+        self.assertEqual(drain_search_logs(), 0)
+
+    def test_search_analytics_normalizes_keywords(self):
+        SearchQueryLog.objects.create(keyword="Django", results_count=4, clicked=True)
+        SearchQueryLog.objects.create(keyword="  django ", results_count=2, clicked=False)
+
+        response = self.client.get(self.search_analytics_url, **self.admin_auth_header)
+        django = next(item for item in response.data["popular_keywords"] if item["keyword"] == "django")
+        self.assertEqual(django["search_count"], 2)
+        self.assertEqual(django["click_count"], 1)
+        self.assertEqual(django["avg_results"], 3)
+
+    def test_search_analytics_window_uses_rollups(self):
+        SearchQueryLog.objects.create(
+            keyword="Old", results_count=1, timestamp=timezone.now() - timezone.timedelta(days=40)
+        )
+        SearchQueryLog.objects.create(keyword="New", results_count=1)
+
+        response = self.client.get(self.search_analytics_url, **self.admin_auth_header)
+        popular_keywords = {item['keyword'] for item in response.data['popular_keywords']}
+        self.assertEqual(popular_keywords, {"new"})
+
+    def test_search_analytics_reads_first_day_daily_past_hourly_retention(self):
+        # Hourly rows of that day are pruned; only the daily row is left.
+        first_day = (timezone.now() - timezone.timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+        SearchKeywordRollup.objects.create(
+            period=SearchKeywordRollup.DAY, bucket=first_day, keyword="edge", searches=2, results_total=2
+        )
+
+        response = self.client.get(f"{self.search_analytics_url}?days=30", **self.admin_auth_header)
+        edge = next(item for item in response.data["popular_keywords"] if item["keyword"] == "edge")
+        self.assertEqual(edge["search_count"], 2)
+
+    def test_search_analytics_popular_now(self):
+        for keyword in ["Django", "django", "FastAPI"]:
+            record_search(keyword, 1)
+
+        response = self.client.get(self.search_analytics_url, **self.admin_auth_header)
+        self.assertEqual(response.data["popular_now"][0], {"keyword": "django", "search_count": 2})
+
+
+    def test_search_click_by_search_id(self):
+        response = self.client.get(f"{self.search_list_url}?search=Django")
+        search_id = response.data["search_id"]
+
+        response = self.client.post(self.search_click_url, {"search_id": search_id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        flush_search_logs()
+
+        log = SearchQueryLog.objects.get(search_id=search_id)
+        self.assertTrue(log.clicked)
+        response = self.client.get(self.search_analytics_url, **self.admin_auth_header)
+        django = next(item for item in response.data["popular_keywords"] if item["keyword"] == "django")
+        self.assertEqual(django["click_count"], 1)
+
+    def test_search_click_before_log_is_flushed(self):
+        search_id = record_search("Django", 2)
+        record_click(search_id)
+
+        # Unknown until the log is written: the click is kept for the next drain.
+        self.assertEqual(drain_search_clicks(), 0)
+        drain_search_logs()
+        self.assertEqual(drain_search_clicks(), 1)
+        self.assertTrue(SearchQueryLog.objects.get(search_id=search_id).clicked)
+
+    def test_search_click_without_redis_marks_the_log(self):
+        search_id = record_search("Django", 3)
+        drain_search_logs()
+
+        with patch("apps.blog.search_log.get_redis_connection", side_effect=ConnectionError("down")):
+            response = self.client.post(self.search_click_url, {"search_id": str(search_id)}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(SearchQueryLog.objects.get(search_id=search_id).clicked)
+
+    def test_search_click_invalid_search_id(self):
+        response = self.client.post(self.search_click_url, {"search_id": "not-a-uuid"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,57 @@
+import tempfile
+
+from django.test import SimpleTestCase
+
+from apps.blog.similarity import TfidfIndex
+
+
+class TfidfIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = TfidfIndex.build([
+            (1, "Django Tutorial", "Learn Django with examples"),
+            (2, "Advanced Django Guide", "This guide covers advanced Django concepts"),
+            (3, "Cooking Recipes", "Best pasta recipes"),
+        ])
+
+    def test_top_k_ranks_shared_terms(self):
+        results = self.index.top_k([1, 3], k=5)
+        self.assertEqual([target for target, _ in results[1]], [2])
+        self.assertEqual(results[3], [])
+
+    def test_incremental_upsert_and_remove(self):
+        self.index.upsert(4, "Pasta night", "Easy pasta recipes")
+        self.index.remove(2)
+
+        results = self.index.top_k([1, 3], k=5)
+        self.assertEqual(results[1], [])
+        self.assertEqual([target for target, _ in results[3]], [4])
+        self.assertNotIn(2, self.index)
+
+    def test_save_and_load_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.index.save(path)
+            loaded = TfidfIndex.load(path)
+
+            self.assertEqual(len(loaded), 3)
+            self.assertEqual(loaded.top_k([1])[1], self.index.top_k([1])[1])
+
+            loaded.upsert(4, "Django pasta", "Django")
+            self.assertIn(4, loaded)
+
+    def test_save_changes_journals_updates_for_other_processes(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.index.save(path)
+            writer = TfidfIndex.load(path)
+            reader = TfidfIndex.load(path)
+
+            writer.upsert(4, "Pasta night", "Easy pasta recipes")
+            writer.remove(2)
+            writer.save_changes(path)
+
+            self.assertTrue(reader.sync(path))
+            self.assertEqual(reader.top_k([1, 3]), writer.top_k([1, 3]))
+            self.assertEqual(TfidfIndex.load(path).top_k([3])[3], writer.top_k([3])[3])
+
+            # A new snapshot replaces the journal; readers have to reload.
+            writer.save(path)
+            self.assertFalse(reader.sync(path))
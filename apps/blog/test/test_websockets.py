@@ -6,10 +6,14 @@ from asgiref.sync import sync_to_async
 from apps.users.test.factories import UserFactory
 from apps.blog.test.factories import PostFactory
 from django.contrib.auth import get_user_model
+from django.test import override_settings
+from apps.notifications.outbox import drain_outbox
 from rest_framework.test import APIClient
 
 User = get_user_model()
 
+# The events are pushed by the outbox drain, run here in place of the worker.
+@override_settings(OUTBOX_KICK=False)
 class WebSocketCommentNotificationTests(ChannelsLiveServerTestCase):
     def setUp(self):
         self.user = UserFactory()
@@ -43,6 +47,7 @@ class WebSocketCommentNotificationTests(ChannelsLiveServerTestCase):
 
         self.assertEqual(response.status_code, 201)
         comment_id = response.data["id"]
+        await sync_to_async(drain_outbox)()
 
         await asyncio.sleep(0.5)
 
@@ -68,6 +73,7 @@ class WebSocketCommentNotificationTests(ChannelsLiveServerTestCase):
         }, format="json")
 
         self.assertEqual(response.status_code, 200)
+        await sync_to_async(drain_outbox)()
 
         await asyncio.sleep(0.5)
 
@@ -81,6 +87,7 @@ class WebSocketCommentNotificationTests(ChannelsLiveServerTestCase):
         # --- Delete ---
         response = await sync_to_async(self.client.delete)(f"/api/blog/comments/{comment_id}/")
         self.assertEqual(response.status_code, 204)
+        await sync_to_async(drain_outbox)()
 
         await asyncio.sleep(0.5)
 
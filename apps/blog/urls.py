@@ -3,8 +3,11 @@ from .views import (
     PostListCreateAPIView,
     PostRetrieveUpdateDestroyAPIView,
     RelatedPostsAPIView,
+    PostViewStatsAPIView,
     CommentListCreateAPIView,
     CommentRetrieveUpdateDestroyAPIView,
+    CommentRepliesAPIView,
+    CommentSubtreeAPIView,
     CategoryListCreateAPIView,
     MediaListCreateAPIView,
     MediaRetrieveUpdateDestroyAPIView,
@@ -17,9 +20,12 @@ urlpatterns = [
     path("posts/", PostListCreateAPIView.as_view(), name="post-list-create"),
     path("posts/<int:pk>/", PostRetrieveUpdateDestroyAPIView.as_view(), name="post-detail"),
     path("posts/<int:post_id>/related/", RelatedPostsAPIView.as_view(), name="post-related"),
+    path("posts/<int:post_id>/stats/", PostViewStatsAPIView.as_view(), name="post-stats"),
 
     path("posts/<int:post_id>/comments/", CommentListCreateAPIView.as_view(), name="post-comments"),
     path("comments/<int:pk>/", CommentRetrieveUpdateDestroyAPIView.as_view(), name="comment-detail"),
+    path("comments/<int:pk>/replies/", CommentRepliesAPIView.as_view(), name="comment-replies"),
+    path("comments/<int:pk>/subtree/", CommentSubtreeAPIView.as_view(), name="comment-subtree"),
 
     path("categories/", CategoryListCreateAPIView.as_view(), name="category-list"),
     path("categories/<int:pk>/", CategoryListCreateAPIView.as_view(), 
@@ -1,9 +1,11 @@
-from django.core.cache import cache
-from django.db.models import Q, Sum, Count
+from django.db import transaction
+from django.db.models import F, FloatField, Q, Sum, Count
+from django.db.models.functions import Cast
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
+from django.contrib.postgres.search import SearchQuery, SearchRank
 import hashlib
+import uuid
 
 from rest_framework import generics, permissions, parsers
 from rest_framework.pagination import PageNumberPagination
@@ -15,21 +17,104 @@ from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from .models import Post, Comment, Category, Media, SearchQueryLog
-from .serializers import PostSerializer, CommentSerializer, CategorySerializer, MediaSerializer, CategoryReportSerializer
+from .models import Post, Comment, Category, Media, SearchQueryLog, SearchKeywordRollup, ModerationStatus
+from .pagination import PostKeysetPagination, SearchKeysetPagination, CommentPathPagination, CommentSubtreePagination
+from .comment_tree import attach_thread_replies, comment_visibility
+from .moderation import moderation_fields
+from .tasks import moderate_content
+from .search_log import record_search, record_click, popular_now
+from .rollups import HOURLY_KEYWORD_RETENTION, record_keyword_click
+from .view_counts import get_buffered_views, get_daily_views, get_unique_visitors
+from .serializers import PostSerializer, CommentSerializer, CommentNodeSerializer, CategorySerializer, MediaSerializer, CategoryReportSerializer, get_post_fieldset
 from apps.core.permissions import IsOwnerOrReadOnly, ReadOnlyOrAdminCreatePermission, CanViewPost, IsMediaOwnerOrAdmin, CanAddMediaToOwnPost
-from apps.core.utils import delete_cache_by_prefix
+from apps.core.utils import get_or_set_namespaced, invalidate_namespace
 
 class PostPagination(PageNumberPagination):
     page_size = 10
 
-class PostListCreateAPIView(generics.ListCreateAPIView):
+def save_moderated(serializer, **kwargs):
+    """
+    `serializer.save()` for posts and comments. With CONTENT_MODERATION_ASYNC,
+    new or changed content is saved as pending and moderate_content is queued.
+    """
+    action = "created" if serializer.instance is None else "updated"
+    fields = moderation_fields(serializer)
+    instance = serializer.save(**kwargs, **fields)
+    if fields:
+        model_name = instance._meta.model_name
+        transaction.on_commit(lambda: moderate_content.delay(model_name, instance.id, action))
+    return instance
+
+def post_viewer_cache_key(user):
+    """
+    Cache key part for the posts a user can see: staff see every post and
+    authors their own unpublished or unmoderated ones, so only anonymous
+    pages are shared.
+    """
+    if user.is_staff or user.is_superuser:
+        return "staff"
+    if user.is_authenticated:
+        return f"user:{user.id}"
+    return "anon"
+
+# Post columns that can be left out of the SELECT when their field is not requested.
+# is_published and scheduled_publish_time always stay: CanViewPost reads them.
+DEFERRABLE_POST_FIELDS = ("title", "content", "views", "updated_at")
+
+class PostFieldsetMixin:
+    """
+    Push `?fields=` / `?view=summary` down to SQL: defer unrequested columns
+    and skip the prefetches of unrequested relations.
+    """
+
+    def get_post_queryset(self):
+        fieldset = get_post_fieldset(self.request)
+        queryset = Post.objects.defer("search_vector")
+
+        if fieldset is None:
+            return queryset.select_related("author").prefetch_related("categories", "medias")
+
+        queryset = queryset.defer(*[name for name in DEFERRABLE_POST_FIELDS if name not in fieldset])
+        if "author" in fieldset:
+            queryset = queryset.select_related("author")
+            if self.request.query_params.get("view") == "summary":
+                queryset = queryset.defer("author__email", "author__bio")
+        prefetches = [name for name in ("categories", "medias") if name in fieldset]
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+    def get_fieldset_cache_suffix(self):
+        params = self.request.query_params
+        return f"{params.get('fields', '')}:{params.get('view', '')}"
+
+class PostListCreateAPIView(PostFieldsetMixin, generics.ListCreateAPIView):
     serializer_class = PostSerializer
     permission_classes = [CanViewPost, permissions.IsAuthenticatedOrReadOnly]
     pagination_class = PostPagination
+    cursor_pagination_class = PostKeysetPagination
+    search_cursor_pagination_class = SearchKeysetPagination
+
+    @property
+    def paginator(self):
+        # `?cursor=` (or `?pagination=cursor` for the first page) switches to
+        # keyset pagination, which avoids OFFSET scans and the COUNT query.
+        # Search pages are keyed on the rank first, to keep the best matches first.
+        if not hasattr(self, "_paginator"):
+            if self.uses_cursor_pagination() and self.request.query_params.get("search", "").strip():
+                self._paginator = self.search_cursor_pagination_class()
+            elif self.uses_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def uses_cursor_pagination(self):
+        params = self.request.query_params
+        return "cursor" in params or params.get("pagination") == "cursor"
 
     def get_queryset(self):
-        queryset = Post.objects.select_related("author").prefetch_related("comments", "categories")
+        queryset = self.get_post_queryset()
 
         user = self.request.user
         if user.is_staff or user.is_superuser:
@@ -37,33 +122,63 @@ class PostListCreateAPIView(generics.ListCreateAPIView):
 
         if user.is_authenticated:
             return queryset.filter(
-                Q(is_published=True, scheduled_publish_time__lte=timezone.now()) |
+                Q(is_published=True, scheduled_publish_time__lte=timezone.now(), moderation_status=ModerationStatus.APPROVED) |
                 Q(author=user)
             ).order_by("-created_at")
 
         return queryset.filter(
             is_published=True,
-            scheduled_publish_time__lte=timezone.now()
+            scheduled_publish_time__lte=timezone.now(),
+            moderation_status=ModerationStatus.APPROVED,
         ).order_by("-created_at")
 
     def list(self, request, *args, **kwargs):
         search = request.query_params.get("search", "").strip()
         category_ids = request.query_params.get("category", "")
         page = request.query_params.get("page", "1")
+        cursor_mode = self.uses_cursor_pagination()
+        cursor = request.query_params.get("cursor", "")
 
         # Generate consistent cache key
-        raw_key = f"posts:list:{search}:{category_ids}:page:{page}"
-        cache_key = f"posts:{hashlib.md5(raw_key.encode()).hexdigest()}"
-
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        if cursor_mode:
+            raw_key = f"posts:list:{search}:{category_ids}:cursor:{cursor}"
+        else:
+            raw_key = f"posts:list:{search}:{category_ids}:page:{page}"
+        if get_post_fieldset(request) is not None:
+            raw_key = f"{raw_key}:fields:{self.get_fieldset_cache_suffix()}"
+        raw_key = f"{raw_key}:viewer:{post_viewer_cache_key(request.user)}"
+        cache_key = hashlib.md5(raw_key.encode()).hexdigest()
+
+        # Only one worker rebuilds a missing or expiring page; the others get
+        # the stale copy or wait for the rebuild.
+        cached = get_or_set_namespaced(
+            "posts", cache_key,
+            lambda: self.build_list_data(search, category_ids, cursor_mode, cursor),
+            timeout=60,
+        )
+        data = cached["data"]
+
+        # Search Logging, cache hit or not. Clicks on these results are
+        # reported to SearchClickUpdateAPIView with the returned search_id.
+        if search and cached["results_count"] is not None:
+            search_id = record_search(search, cached["results_count"])
+            if search_id is not None and isinstance(data, dict):
+                data = {**data, "search_id": str(search_id)}
+        return Response(data)
 
+    def build_list_data(self, search, category_ids, cursor_mode, cursor):
         # Get queryset and apply filters
         queryset = self.filter_queryset(self.get_queryset())
 
         if search:
-            queryset = queryset.filter(title__icontains=search)
+            # Matches the GIN-indexed search_vector (title A, content B), best first.
+            # The rank is cast to double precision so a cursor can carry it exactly.
+            query = SearchQuery(search, search_type="websearch", config="english")
+            queryset = (
+                queryset.filter(search_vector=query)
+                .annotate(rank=Cast(SearchRank(F("search_vector"), query), FloatField()))
+                .order_by("-rank", "-created_at")
+            )
 
         if category_ids:
             try:
@@ -73,32 +188,29 @@ class PostListCreateAPIView(generics.ListCreateAPIView):
             except ValueError:
                 pass
 
-        # Count the number of returned results (before pagination)
-        total_results = queryset.count()
-
-        # Search Logging
-        if search:
-            SearchQueryLog.objects.create(
-                keyword=search,
-                results_count=total_results,
-                clicked=False  
-            )
+        # Count the number of returned results (before pagination) for the search log.
+        # Cursor pages skip the COUNT; the search is logged once, on its first page.
+        results_count = None
+        if search and cursor_mode and not cursor:
+            results_count = queryset.count()
 
         page_obj = self.paginate_queryset(queryset)
         if page_obj is not None:
+            if search and not cursor_mode:
+                # Already counted by the page number paginator.
+                results_count = self.paginator.page.paginator.count
             serializer = self.get_serializer(page_obj, many=True)
-            response_data = self.get_paginated_response(serializer.data).data
-            cache.set(cache_key, response_data, timeout=60)
-            return Response(response_data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        data = serializer.data
-        cache.set(cache_key, data, timeout=60)
-        return Response(data)
+            data = self.get_paginated_response(serializer.data).data
+        else:
+            serializer = self.get_serializer(queryset, many=True)
+            data = serializer.data
+            if search and not cursor_mode:
+                results_count = len(data)
+        return {"data": data, "results_count": results_count}
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, views=0)
-        delete_cache_by_prefix("posts:")
+        save_moderated(serializer, author=self.request.user, views=0)
+        invalidate_namespace("posts")
 
     @swagger_auto_schema(
         tags=["Post"],
@@ -107,7 +219,7 @@ class PostListCreateAPIView(generics.ListCreateAPIView):
                 name="search",
                 in_=openapi.IN_QUERY,
                 type=openapi.TYPE_STRING,
-                description="Search by title",
+                description="Full-text search over title and content",
             ),
             openapi.Parameter(
                 name="category",
@@ -121,6 +233,32 @@ class PostListCreateAPIView(generics.ListCreateAPIView):
                 type=openapi.TYPE_INTEGER,
                 description="Page number",
             ),
+            openapi.Parameter(
+                name="pagination",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=["page", "cursor"],
+                description="Use `cursor` for keyset pagination (no page count)",
+            ),
+            openapi.Parameter(
+                name="cursor",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Opaque cursor from a previous `next`/`previous` link",
+            ),
+            openapi.Parameter(
+                name="fields",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Comma-separated post fields to return",
+            ),
+            openapi.Parameter(
+                name="view",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=["summary"],
+                description="`summary` drops content, comments, medias and author email/bio",
+            ),
         ]
     )
     def get(self, request, *args, **kwargs):
@@ -130,18 +268,23 @@ class PostListCreateAPIView(generics.ListCreateAPIView):
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
     
-class PostRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class PostRetrieveUpdateDestroyAPIView(PostFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [CanViewPost, IsOwnerOrReadOnly]
 
+    def get_queryset(self):
+        if self.request.method == "GET":
+            return self.get_post_queryset()
+        return super().get_queryset()
+
     def perform_update(self, serializer):
-        serializer.save()
-        delete_cache_by_prefix("posts:")
+        save_moderated(serializer)
+        invalidate_namespace("posts")
 
     def perform_destroy(self, instance):
         instance.delete()
-        delete_cache_by_prefix("posts:")
+        invalidate_namespace("posts")
 
     @swagger_auto_schema(tags=["Post"])
     def get(self, request, *args, **kwargs):
@@ -159,25 +302,28 @@ class PostRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
     
-class RelatedPostsAPIView(generics.GenericAPIView):
+class RelatedPostsAPIView(PostFieldsetMixin, generics.GenericAPIView):
     serializer_class = PostSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None  # Không phân trang
 
     def get_queryset(self):
-        queryset = Post.objects.select_related("author").prefetch_related("comments", "categories")
+        return self.filter_visible(Post.objects.all())
+
+    def filter_visible(self, queryset):
         user = self.request.user
 
         if user.is_staff or user.is_superuser:
             return queryset
         if user.is_authenticated:
             return queryset.filter(
-                Q(is_published=True, scheduled_publish_time__lte=timezone.now()) |
+                Q(is_published=True, scheduled_publish_time__lte=timezone.now(), moderation_status=ModerationStatus.APPROVED) |
                 Q(author=user)
             )
         return queryset.filter(
             is_published=True,
-            scheduled_publish_time__lte=timezone.now()
+            scheduled_publish_time__lte=timezone.now(),
+            moderation_status=ModerationStatus.APPROVED,
         )
 
     @swagger_auto_schema(
@@ -193,39 +339,93 @@ class RelatedPostsAPIView(generics.GenericAPIView):
     )
     def get(self, request, post_id):
         # Cache
-        cache_key = f"related_posts:{post_id}"
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return Response(cached_data)
+        cache_key = f"related:{post_id}"
+        if get_post_fieldset(request) is not None:
+            cache_key = f"{cache_key}:fields:{self.get_fieldset_cache_suffix()}"
+        cache_key = f"{cache_key}:viewer:{post_viewer_cache_key(request.user)}"
+        data = get_or_set_namespaced(
+            "posts", cache_key, lambda: self.build_related_data(post_id), timeout=60
+        )
+        return Response(data)
 
+    def build_related_data(self, post_id):
         # Lấy bài gốc
-        post = get_object_or_404(self.get_queryset(), id=post_id)
+        post = get_object_or_404(self.get_queryset().only("id"), id=post_id)
 
-        # SearchVector + SearchQuery
-        vector = SearchVector('title', weight='A') + SearchVector('content', weight='B')
-        query = SearchQuery(post.title) | SearchQuery(post.content)
-
-        # Lấy bài liên quan
+        # Lấy bài liên quan: precomputed by apps.blog.tasks.recompute_related_posts
         related_posts = (
-            self.get_queryset()
-            .annotate(rank=SearchRank(vector, query))
-            .filter(rank__gte=0.1)
-            .exclude(id=post.id)
-            .order_by('-rank')[:5]
+            self.filter_visible(self.get_post_queryset())
+            .filter(related_sources__source_id=post.id)
+            .annotate(rank=F("related_sources__score"))
+            .order_by("-rank")[:5]
         )
 
         serializer = self.get_serializer(related_posts, many=True)
-        data = serializer.data
-        cache.set(cache_key, data, timeout=60)
-        return Response(data)
+        return serializer.data
 
     
-class CommentListCreateAPIView(generics.ListCreateAPIView):
+class PostViewStatsAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Post"],
+        manual_parameters=[
+            openapi.Parameter(
+                name="days",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_INTEGER,
+                description="Length of the daily series (default 30, max 90)",
+            ),
+        ]
+    )
+    def get(self, request, post_id):
+        post = get_object_or_404(Post.objects.only("id", "author_id", "views"), id=post_id)
+        if not (request.user.is_staff or post.author_id == request.user.id):
+            return Response({"detail": "Only the author can view post stats."}, status=403)
+
+        try:
+            days = min(int(request.query_params.get("days", 30)), 90)
+        except ValueError:
+            days = 30
+
+        return Response({
+            "id": post.id,
+            "views": post.views + get_buffered_views([post.id]).get(post.id, 0),
+            "unique_visitors": get_unique_visitors(post.id),
+            "daily_views": [
+                {"date": day, "views": count} for day, count in get_daily_views(post.id, max(days, 1))
+            ],
+        })
+
+class CommentVisibilityMixin:
+    def visible_comments(self):
+        return comment_visibility(self.request.user)
+
+class CommentListCreateAPIView(CommentVisibilityMixin, generics.ListCreateAPIView):
+    """
+    Root threads of a post, oldest first, a cursor page at a time. Each thread
+    carries a bounded reply tree; deeper or later replies are linked through
+    `replies_next`.
+    """
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CommentPathPagination
 
     def get_queryset(self):
-        return Comment.objects.filter(post_id=self.kwargs["post_id"])
+        return (
+            Comment.objects.filter(post_id=self.kwargs["post_id"], depth=0)
+            .filter(self.visible_comments())
+            .select_related("author")
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        attach_thread_replies(page, visible=self.visible_comments())
+        return page
+
+    def get_serializer_context(self):
+        # The post a new comment goes under, for CommentSerializer.validate_parent.
+        return {**super().get_serializer_context(), "post_id": int(self.kwargs["post_id"])}
 
     @swagger_auto_schema(tags=["Comment"])
     def get(self, request, *args, **kwargs):
@@ -240,13 +440,18 @@ class CommentListCreateAPIView(generics.ListCreateAPIView):
             post = Post.objects.get(id=self.kwargs["post_id"])
         except Post.DoesNotExist:
             raise NotFound("Post not found")
-        serializer.save(author=self.request.user, post=post)
+        save_moderated(serializer, author=self.request.user, post=post)
 
-class CommentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Comment.objects.select_related("author", "post")
+class CommentRetrieveUpdateDestroyAPIView(CommentVisibilityMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
+    def get_queryset(self):
+        return Comment.objects.select_related("author", "post").filter(self.visible_comments())
+
+    def perform_update(self, serializer):
+        save_moderated(serializer)
+
     @swagger_auto_schema(tags=["Comment"])
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
@@ -262,6 +467,50 @@ class CommentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView)
     @swagger_auto_schema(tags=["Comment"])
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
+
+class CommentRepliesAPIView(CommentVisibilityMixin, generics.ListAPIView):
+    """
+    The "load more" page behind `replies_next`: direct replies of a comment,
+    each with its own bounded reply tree.
+    """
+    serializer_class = CommentSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = CommentPathPagination
+
+    def get_queryset(self):
+        parent = get_object_or_404(Comment, pk=self.kwargs["pk"])
+        return (
+            parent.descendants()
+            .filter(self.visible_comments(), depth=parent.depth + 1)
+            .select_related("author")
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        attach_thread_replies(page, visible=self.visible_comments())
+        return page
+
+    @swagger_auto_schema(tags=["Comment"])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+class CommentSubtreeAPIView(CommentVisibilityMixin, generics.ListAPIView):
+    """
+    A comment and all of its replies, flat in thread order (parents before
+    their replies), read as one range of the (post, path) index.
+    """
+    serializer_class = CommentNodeSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = CommentSubtreePagination
+
+    def get_queryset(self):
+        comment = get_object_or_404(Comment.objects.filter(self.visible_comments()), pk=self.kwargs["pk"])
+        return comment.subtree().filter(self.visible_comments()).select_related("author")
+
+    @swagger_auto_schema(tags=["Comment"])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class CategoryListCreateAPIView(generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -303,11 +552,14 @@ class CategoryReportAPIView(APIView):
 
         since_date = timezone.now() - timezone.timedelta(days=days_ago)
 
+        # Sums a few rollup rows per category (CategoryDailyStats) instead of
+        # joining posts x comments; the old Sum('posts__views', distinct=True)
+        # also dropped posts that happened to have equal view counts.
         categories = Category.objects.annotate(
-            total_views=Sum('posts__views', distinct=True),
-            total_comments=Count('posts__comments', distinct=True),
-            new_posts=Count('posts', filter=Q(posts__created_at__gte=since_date)),
-        ).order_by('-total_views')
+            total_views=Sum('daily_stats__views'),
+            total_comments=Sum('daily_stats__comments'),
+            new_posts=Sum('daily_stats__new_posts', filter=Q(daily_stats__date__gte=since_date.date())),
+        ).order_by(F('total_views').desc(nulls_last=True))
 
         # Chuẩn bị data dạng dict cho serializer
         data = []
@@ -391,37 +643,64 @@ class SearchAnalyticsAPIView(APIView):
 
         since_date = timezone.now() - timezone.timedelta(days=days_ago)
 
-        logs = SearchQueryLog.objects.filter(timestamp__gte=since_date)
+        # Whole days come from the daily rollup, the partial first day from the
+        # hourly one, so the window is exact to the hour. Past the hourly
+        # retention the first day is read whole from the daily rollup instead.
+        since_hour = since_date.replace(minute=0, second=0, microsecond=0)
+        first_midnight = since_hour.replace(hour=0) + timezone.timedelta(days=1)
+        if since_hour < timezone.now() - HOURLY_KEYWORD_RETENTION:
+            rollups = SearchKeywordRollup.objects.filter(
+                period=SearchKeywordRollup.DAY, bucket__gte=since_hour.replace(hour=0)
+            )
+        else:
+            rollups = SearchKeywordRollup.objects.filter(
+                Q(period=SearchKeywordRollup.DAY, bucket__gte=first_midnight) |
+                Q(period=SearchKeywordRollup.HOUR, bucket__gte=since_hour, bucket__lt=first_midnight)
+            )
 
-        popular_keywords = logs.values('keyword').annotate(
-            search_count=Count('id'),
-            click_count=Count('id', filter=Q(clicked=True)),
-            avg_results=Sum('results_count') / Count('id'),
-        ).order_by('-search_count')[:10]
+        popular_keywords = rollups.values('keyword').annotate(
+            search_count=Sum('searches'),
+            click_count=Sum('clicks'),
+            avg_results=Sum('results_total') / Sum('searches'),
+        ).filter(search_count__gt=0).order_by('-search_count')[:10]
 
         # Keywords with few or no results (e.g. results_count <= 3)
-        low_results_keywords = logs.values('keyword').annotate(
-            search_count=Count('id'),
-            avg_results=Sum('results_count') / Count('id'),
-        ).filter(avg_results__lte=3).order_by('avg_results')[:10]
+        low_results_keywords = rollups.values('keyword').annotate(
+            search_count=Sum('searches'),
+            avg_results=Sum('results_total') / Sum('searches'),
+        ).filter(search_count__gt=0, avg_results__lte=3).order_by('avg_results')[:10]
 
         return Response({
             "popular_keywords": list(popular_keywords),
             "low_results_keywords": list(low_results_keywords),
+            "popular_now": popular_now(),
         })
     
 class SearchClickUpdateAPIView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
+        search_id = request.data.get("search_id", "")
+        if search_id:
+            try:
+                search_id = uuid.UUID(str(search_id))
+            except ValueError:
+                return Response({"detail": "Invalid search_id"}, status=400)
+            # Queued in Redis; flush_search_logs marks the log by search_id
+            # (or record_click marks it directly when Redis is down).
+            record_click(search_id)
+            return Response({"detail": "Click recorded"}, status=202)
+
+        # Legacy clients: attribute the click to the latest search of the keyword.
         keyword = request.data.get("keyword", "").strip()
         if not keyword:
-            return Response({"detail": "Keyword required"}, status=400)
+            return Response({"detail": "search_id or keyword required"}, status=400)
 
         # Update the most recent search log for this keyword (assuming new user click)
         log = SearchQueryLog.objects.filter(keyword=keyword, clicked=False).order_by('-timestamp').first()
         if log:
             log.clicked = True
             log.save()
+            record_keyword_click(log.timestamp, log.keyword)
             return Response({"detail": "Click updated"})
         return Response({"detail": "No log entry found to update"}, status=404)
@@ -5,7 +5,6 @@ from django.shortcuts import get_object_or_404
 from django.contrib import messages
 
 from .models import Post, Comment, Category
-from apps.notifications.tasks import send_notification_email
 
 class PostListView(ListView):
     model = Post
@@ -67,12 +66,6 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
         form.instance.post = post
         form.instance.author = self.request.user
 
-        # Send notification
-        post_author_email = post.author.email
-        subject = f"New Comment on Your Post '{post.title}'"
-        message = f"{self.request.user.username} commented: {form.cleaned_data['content']}"
-        send_notification_email.delay(subject, message, post_author_email)
-
         messages.success(self.request, "Comment added successfully.")
         return super().form_valid(form)
 
@@ -0,0 +1,56 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from apps.core.utils import namespaced_key, invalidate_namespace
+
+NAMESPACE = "bench_invalidation"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare namespace invalidation (one INCR) with the old KEYS prefix scan "
+        "as the number of cached keys grows. Writes to the configured cache Redis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keys", type=int, default=1_000_000, help="Largest number of cached keys")
+        parser.add_argument("--runs", type=int, default=5, help="Timed runs per size")
+        parser.add_argument("--batch", type=int, default=10_000, help="Pipeline batch size when filling")
+
+    def handle(self, *args, **options):
+        redis = get_redis_connection("default")
+        sizes = [size for size in (1_000, 10_000, 100_000, 1_000_000) if size < options["keys"]]
+        sizes.append(options["keys"])
+
+        self.stdout.write(f"{'keys':>10} {'INCR (ms)':>12} {'KEYS scan (ms)':>16}")
+        filled = 0
+        try:
+            for size in sizes:
+                filled = self._fill(redis, filled, size, options["batch"])
+                incr_ms = self._time(lambda: invalidate_namespace(NAMESPACE), options["runs"])
+                scan_ms = self._time(lambda: cache.keys(f"{NAMESPACE}:*"), options["runs"])
+                self.stdout.write(f"{size:>10} {incr_ms:>12.3f} {scan_ms:>16.1f}")
+        finally:
+            cache.delete_pattern(f"{NAMESPACE}:*")
+
+    def _fill(self, redis, start, end, batch):
+        # Keys are written under a generation that is then left behind,
+        # exactly like real entries after an invalidation.
+        prefix = cache.make_key(namespaced_key(NAMESPACE, ""))
+        for offset in range(start, end, batch):
+            pipe = redis.pipeline(transaction=False)
+            for i in range(offset, min(offset + batch, end)):
+                pipe.set(f"{prefix}item:{i}", b"1", ex=3600)
+            pipe.execute()
+        return end
+
+    def _time(self, func, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
@@ -0,0 +1,57 @@
+import time
+
+from django.core.mail import get_connection, send_mail
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.services.smtp_sink import SMTPSink
+from apps.notifications.mail import FROM_EMAIL, drain_email_queue
+from apps.notifications.models import QueuedEmail
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+
+
+class Command(BaseCommand):
+    help = (
+        "Send emails to a local SMTP sink, once with a connection per email (the "
+        "old send_mail task) and once through the email queue, and compare "
+        "throughput and connections opened."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=1000, help="Emails per run")
+        parser.add_argument("--batch-size", type=int, default=100, help="Queue batch size")
+        parser.add_argument("--rate", type=float, default=0, help="Queue rate limit in emails/s (0: none)")
+        parser.add_argument("--body-size", type=int, default=2000, help="Characters per email body")
+
+    def handle(self, *args, **options):
+        if QueuedEmail.objects.exists():
+            raise CommandError("The email queue is not empty; drain it before benchmarking.")
+
+        count = options["count"]
+        body = "x" * options["body_size"]
+        with SMTPSink() as sink:
+            def connection():
+                return get_connection(SMTP_BACKEND, host=sink.host, port=sink.port, fail_silently=False)
+
+            started = time.perf_counter()
+            for n in range(count):
+                send_mail(f"Bench {n}", body, FROM_EMAIL, [f"user{n}@example.com"], connection=connection())
+            per_message = time.perf_counter() - started
+            per_message_connections, sink.connections = sink.connections, 0
+
+            QueuedEmail.objects.bulk_create(
+                QueuedEmail(subject=f"Bench {n}", body=body, recipient=f"user{n}@example.com")
+                for n in range(count)
+            )
+            started = time.perf_counter()
+            sent = drain_email_queue(
+                batch_size=options["batch_size"], connection=connection(), rate_limit=options["rate"]
+            )
+            queued = time.perf_counter() - started
+            queued_connections = sink.connections
+
+        if sent != count:
+            raise CommandError(f"The queue sent {sent} of {count} emails.")
+        self.stdout.write(f"{'':<20}{'emails/s':>12}{'connections':>14}")
+        self.stdout.write(f"{'send_mail each':<20}{count / per_message:>12.0f}{per_message_connections:>14}")
+        self.stdout.write(f"{'queue, batched':<20}{count / queued:>12.0f}{queued_connections:>14}")
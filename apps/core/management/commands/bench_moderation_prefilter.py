@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.blog.models import Comment, Post
+from apps.core.services.content_moderation import get_prefilter
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the local moderation pre-filter over stored comments and posts (or "
+        "a file with one text per line) on one core. Reports throughput and "
+        "the share of texts allowed or rejected without the remote analyzer "
+        "(allowing needs CONTENT_MODERATION_PREFILTER_ALLOW)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20_000, help="Texts to read from the database")
+        parser.add_argument("--file", help="Read texts from this file instead, one per line")
+        parser.add_argument("--runs", type=int, default=3, help="Timed passes over the texts")
+
+    def handle(self, *args, **options):
+        prefilter = get_prefilter()
+        if prefilter is None:
+            raise CommandError("CONTENT_MODERATION_PREFILTER is off.")
+
+        texts = self._load(options)
+        if not texts:
+            raise CommandError("No texts to classify.")
+
+        decisions = [prefilter.classify(text) for text in texts]
+        timings = []
+        for _ in range(options["runs"]):
+            started = time.perf_counter()
+            for text in texts:
+                prefilter.classify(text)
+            timings.append(time.perf_counter() - started)
+        elapsed = sorted(timings)[len(timings) // 2]
+
+        allowed = sum(1 for decision in decisions if decision is not None and decision[0])
+        rejected = sum(1 for decision in decisions if decision is not None and not decision[0])
+        chars = sum(len(text) for text in texts)
+        self.stdout.write(f"texts             {len(texts):>12}")
+        self.stdout.write(f"automaton states  {len(prefilter.automaton):>12}")
+        self.stdout.write(f"texts/s per core  {len(texts) / elapsed:>12.0f}")
+        self.stdout.write(f"MB/s per core     {chars / elapsed / 1e6:>12.2f}")
+        self.stdout.write(f"allowed locally   {allowed / len(texts):>12.1%}")
+        self.stdout.write(f"rejected locally  {rejected / len(texts):>12.1%}")
+        self.stdout.write(f"remote avoided    {(allowed + rejected) / len(texts):>12.1%}")
+
+    def _load(self, options):
+        if options["file"]:
+            with open(options["file"]) as f:
+                return [line.rstrip("\n") for line in f if line.strip()]
+        limit = options["limit"]
+        texts = list(Comment.objects.order_by("-id").values_list("content", flat=True)[:limit])
+        if len(texts) < limit:
+            texts += Post.objects.order_by("-id").values_list("content", flat=True)[:limit - len(texts)]
+        return texts
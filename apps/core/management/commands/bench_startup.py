@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Each snippet runs in a fresh interpreter, like a new gunicorn or Celery worker.
+SNIPPETS = {
+    "import config.wsgi": "import config.wsgi",
+    "config.wsgi + URLconf": (
+        "import config.wsgi\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns"
+    ),
+    "first moderation client": (
+        "import config.wsgi\n"
+        "from apps.core.services.content_moderation import get_client\n"
+        "get_client()"
+    ),
+}
+# Needs get_client(), which a baseline checkout may not have.
+CLIENT_SNIPPET = "first moderation client"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time worker startup in fresh interpreters: importing config.wsgi, loading "
+        "the URLconf (which imports the serializers) and building the moderation "
+        "client. With --baseline, the same snippets also run on a git worktree of "
+        "that revision, for before and after columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Timed runs per snippet")
+        parser.add_argument(
+            "--skip-client", action="store_true",
+            help="Leave out the moderation client (it needs the discovery document or network)",
+        )
+        parser.add_argument("--baseline", help="Git revision to compare against, e.g. HEAD~1")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings")}
+        snippets = {
+            name: code for name, code in SNIPPETS.items()
+            if not (options["skip_client"] and name == CLIENT_SNIPPET)
+        }
+        current = self._bench(snippets, settings.BASE_DIR, env, options["runs"])
+
+        if not options["baseline"]:
+            self.stdout.write(f"{'snippet':<26} {'median (ms)':>12} {'min (ms)':>10}")
+            for name, (median, fastest) in current.items():
+                self.stdout.write(f"{name:<26} {median:>12.1f} {fastest:>10.1f}")
+            return
+
+        with tempfile.TemporaryDirectory() as path:
+            worktree = os.path.join(path, "baseline")
+            self._git("worktree", "add", "--detach", worktree, options["baseline"])
+            try:
+                baseline = self._bench(
+                    {name: code for name, code in snippets.items() if name != CLIENT_SNIPPET},
+                    worktree, env, options["runs"],
+                )
+            finally:
+                self._git("worktree", "remove", "--force", worktree)
+
+        self.stdout.write(f"{'snippet':<26} {'before (ms)':>12} {'after (ms)':>11}")
+        for name, (median, _) in current.items():
+            before = f"{baseline[name][0]:>12.1f}" if name in baseline else f"{'-':>12}"
+            self.stdout.write(f"{name:<26} {before} {median:>11.1f}")
+
+    def _bench(self, snippets, cwd, env, runs):
+        # {name: (median, min)} in milliseconds.
+        results = {}
+        for name, code in snippets.items():
+            timings = sorted(self._time(code, cwd, env) for _ in range(runs))
+            results[name] = (timings[len(timings) // 2], timings[0])
+        return results
+
+    def _time(self, code, cwd, env):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, check=True)
+        return (time.perf_counter() - started) * 1000
+
+    def _git(self, *args):
+        subprocess.run(["git", *args], cwd=settings.BASE_DIR, check=True, capture_output=True)
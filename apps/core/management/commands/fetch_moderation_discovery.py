@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.services.content_moderation import load_discovery_document
+
+
+class Command(BaseCommand):
+    help = (
+        "Download the Perspective API discovery document to "
+        "CONTENT_MODERATION_DISCOVERY_PATH, so workers never fetch it themselves."
+    )
+
+    def handle(self, *args, **options):
+        document = load_discovery_document(refresh=True)
+        self.stdout.write(f"Wrote {len(document)} bytes to {settings.CONTENT_MODERATION_DISCOVERY_PATH}")
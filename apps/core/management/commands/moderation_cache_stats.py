@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from apps.core.services.content_moderation import moderation_cache_stats, reset_moderation_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show how toxicity checks were decided across all processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them")
+
+    def handle(self, *args, **options):
+        stats = moderation_cache_stats()
+        self.stdout.write(f"prefilter allowed   {stats['prefilter_allowed']:>10}")
+        self.stdout.write(f"prefilter rejected  {stats['prefilter_rejected']:>10}")
+        self.stdout.write(f"l1 hits             {stats['l1_hits']:>10}")
+        self.stdout.write(f"redis hits          {stats['redis_hits']:>10}")
+        self.stdout.write(f"misses              {stats['misses']:>10}")
+        self.stdout.write(f"cache hit rate      {stats['hit_rate']:>10.1%}")
+        self.stdout.write(f"remote avoided      {stats['remote_avoided']:>10.1%}")
+        self.stdout.write(f"timeouts            {stats['timeouts']:>10}")
+        self.stdout.write(f"errors              {stats['errors']:>10}")
+        self.stdout.write(f"breaker rejected    {stats['breaker_rejected']:>10}")
+        self.stdout.write(f"breaker opened      {stats['breaker_opened']:>10}")
+        self.stdout.write(f"failed open         {stats['failed_open']:>10}")
+        for process, state in sorted(stats["breakers"].items()):
+            state, _, since = state.partition(":")
+            self.stdout.write(f"breaker {process}: {state} since {datetime.fromtimestamp(int(since)).isoformat()}")
+        if options["reset"]:
+            reset_moderation_cache_stats()
@@ -1,6 +1,5 @@
-from apps.blog.models import Post
+from apps.blog.view_counts import record_view
 from django.utils.deprecation import MiddlewareMixin
-from django.db import models
 
 class PostViewCountMiddleware(MiddlewareMixin):
     def process_view(self, request, view_func, view_args, view_kwargs):
@@ -10,7 +9,14 @@ class PostViewCountMiddleware(MiddlewareMixin):
                 # Extract post_id from the view kwargs
                 post_id = view_kwargs.get("pk")
                 if post_id:
-                    Post.objects.filter(pk=post_id).update(views=models.F("views") + 1)
+                    # Buffered in Redis; flush_view_counts writes it to Post.views
+                    record_view(post_id, self.get_visitor(request))
             except Exception as e:
                 print("Error counting views:", e)
         return None
+
+    def get_visitor(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{request.META.get('REMOTE_ADDR', '')}:{request.META.get('HTTP_USER_AGENT', '')}"
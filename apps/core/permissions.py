@@ -1,7 +1,7 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework.exceptions import NotFound
 from django.utils import timezone
-from apps.blog.models import Post
+from apps.blog.models import ModerationStatus, Post
 
 class IsOwnerOrReadOnly(BasePermission):
     """
@@ -24,7 +24,8 @@ class CanViewPost(BasePermission):
     Allow viewing of posts if:
         - Admin/staff
         - Author
-        - Post has been published and has reached scheduled_publish_time
+        - Post has been published, has reached scheduled_publish_time and
+          passed moderation
     """
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff or request.user.is_superuser:
@@ -34,7 +35,11 @@ class CanViewPost(BasePermission):
             return True
 
         if request.method in SAFE_METHODS:
-            return obj.is_published and obj.scheduled_publish_time <= timezone.now()
+            return (
+                obj.is_published
+                and obj.scheduled_publish_time <= timezone.now()
+                and obj.moderation_status == ModerationStatus.APPROVED
+            )
 
         return False 
 class IsMediaOwnerOrAdmin(BasePermission):
@@ -0,0 +1,67 @@
+from collections import deque
+
+
+class Automaton:
+    """
+    Aho-Corasick automaton over a fixed set of patterns.
+
+    `find` reports every occurrence of every pattern in a single pass over the
+    text, so the cost grows with the text length, not with the number of
+    patterns.
+    """
+
+    def __init__(self, patterns):
+        # State 0 is the root. Per state: transitions, failure link and the
+        # patterns that end there (including those reached by failure links).
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._link()
+
+    def __len__(self):
+        return len(self._goto)
+
+    def find(self, text):
+        """
+        Yield (start, end, pattern) for each match, `end` exclusive, in order
+        of `end`.
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern in output[state]:
+                yield index + 1 - len(pattern), index + 1, pattern
+
+    def _add(self, pattern):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        if pattern not in self._output[state]:
+            self._output[state] += (pattern,)
+
+    def _link(self):
+        # Breadth-first, so every failure target is finished before it is used.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target
+                self._output[next_state] += self._output[target]
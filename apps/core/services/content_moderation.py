@@ -1,29 +1,622 @@
+import hashlib
 import os
-from googleapiclient import discovery
+import random
+import re
+import socket
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .aho_corasick import Automaton
 
 API_KEY = os.getenv("GOOGLE_PERSPECTIVE_API_KEY", None)
 
-client = discovery.build(
-    "commentanalyzer",
-    "v1alpha1",
-    developerKey=API_KEY,
-    discoveryServiceUrl="https://commentanalyzer.googleapis.com/$discovery/rest?version=v1alpha1",
-    static_discovery=False,
+DISCOVERY_URL = "https://commentanalyzer.googleapis.com/$discovery/rest?version=v1alpha1"
+DISCOVERY_TIMEOUT = 10
+
+_discovery_document = None
+_client_lock = threading.Lock()
+# httplib2 connections are not thread-safe: one client per calling thread.
+_local = threading.local()
+
+
+def get_client():
+    """
+    The Perspective API client of the current thread, built on first use from
+    the discovery document cached at CONTENT_MODERATION_DISCOVERY_PATH
+    (downloaded once if missing), so importing this module makes no network
+    call. Sockets time out after CONTENT_MODERATION_TIMEOUT.
+    """
+    global _discovery_document
+    client = getattr(_local, "client", None)
+    if client is None:
+        with _client_lock:
+            if _discovery_document is None:
+                _discovery_document = load_discovery_document()
+        # Deferred with the client: only it needs googleapiclient.
+        import httplib2
+        from googleapiclient import discovery
+
+        client = discovery.build_from_document(
+            _discovery_document,
+            developerKey=API_KEY,
+            http=httplib2.Http(timeout=settings.CONTENT_MODERATION_TIMEOUT),
+        )
+        _local.client = client
+    return client
+
+
+def load_discovery_document(refresh=False):
+    path = settings.CONTENT_MODERATION_DISCOVERY_PATH
+    if refresh or not os.path.exists(path):
+        response = requests.get(DISCOVERY_URL, timeout=DISCOVERY_TIMEOUT)
+        response.raise_for_status()
+        # Written next to the cached copy and renamed, so concurrent workers
+        # never read a partial file.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(response.text)
+        os.replace(tmp, path)
+        return response.text
+    with open(path) as f:
+        return f.read()
+
+
+DEFAULT_THRESHOLD = 0.7
+
+# Toxicity score of a text, keyed by the hash of its normalized form.
+VERDICT_KEY = "moderation:verdict:{digest}"
+# Outcome counters shared by all processes: prefilter_rejected, l1_hits, redis_hits and misses (analyzer calls), then
+# the analyzer failures: timeouts, errors, short-circuited calls, breaker
+# openings and checks allowed by the fail-open policy.
+STATS_KEY = "moderation:cache:stats"
+STATS_FIELDS = (
+    "prefilter_allowed", "prefilter_rejected", "l1_hits", "redis_hits", "misses",
+    "timeouts", "errors", "breaker_rejected", "breaker_opened", "failed_open",
 )
+# Circuit breaker state of each process: "host:pid" -> "state:since".
+BREAKER_KEY = "moderation:breaker"
+
+
+class ModerationUnavailable(Exception):
+    """
+    The analyzer timed out, failed, or its circuit breaker is open.
+    """
+
+
+def normalize_text(text):
+    """
+    NFKC, casefolded, whitespace collapsed: spacing and case variants of the
+    same text share one cache entry.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def text_digest(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class PerspectiveAnalyzer:
+    def score(self, text):
+        analyze_request = {
+            'comment': {'text': text},
+            'requestedAttributes': {'TOXICITY': {}}
+        }
+        response = get_client().comments().analyze(body=analyze_request).execute()
+        return response['attributeScores']['TOXICITY']['summaryScore']['value']
+
+
+class FakeAnalyzer:
+    """
+    Local stand-in for Perspective in tests and development: each insult from
+    a short word list adds 0.4 to the score. Counts its calls.
+    """
+    TOXIC_WORDS = frozenset({
+        "dumb", "garbage", "hate", "idiot", "loser", "moron", "rot", "stupid", "useless", "worthless",
+    })
+
+    def __init__(self):
+        self.calls = 0
+
+    def score(self, text):
+        self.calls += 1
+        words = re.findall(r"[^\W\d_]+", text.lower())
+        return min(1.0, 0.4 * sum(word in self.TOXIC_WORDS for word in words))
+
+
+class FaultInjectingAnalyzer(FakeAnalyzer):
+    """
+    FakeAnalyzer that can be slowed down or made to fail, to exercise the
+    deadlines and the circuit breaker. Starts from
+    CONTENT_MODERATION_STUB_LATENCY and CONTENT_MODERATION_STUB_FAILURE_RATE;
+    tests change `latency` and `failure_rate` directly.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.latency = settings.CONTENT_MODERATION_STUB_LATENCY
+        self.failure_rate = settings.CONTENT_MODERATION_STUB_FAILURE_RATE
+
+    def score(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.calls += 1
+            raise ConnectionError("Injected analyzer failure")
+        return super().score(text)
+
+
+ANALYZERS = {
+    "perspective": PerspectiveAnalyzer,
+    "fake": FakeAnalyzer,
+    "faulty": FaultInjectingAnalyzer,
+}
+_analyzers = {}
+
+
+def get_analyzer():
+    """
+    The analyzer named by CONTENT_MODERATION_ANALYZER, one instance per process.
+    """
+    name = settings.CONTENT_MODERATION_ANALYZER
+    if name not in _analyzers:
+        _analyzers[name] = ANALYZERS[name]()
+    return _analyzers[name]
+
+
+class PreFilter:
+    """
+    Local pre-classifier that rejects clearly toxic text without the analyzer.
+
+    Wordlist terms are found with one Aho-Corasick pass over the normalized
+    text, and text whose matched weights reach REJECT_SCORE is rejected.
+
+    A wordlist cannot tell clean text from abuse it does not list, so text is
+    only allowed locally when `safe_words` is given and the text is short
+    (ALLOW_MAX_WORDS), not shouted, matches no term and is made only of those
+    words and plain punctuation ("Great post, thanks!"). Everything else
+    returns None and goes to the analyzer (or its cached verdict).
+    """
+    REJECT_SCORE = 1.0
+    ALLOW_MAX_WORDS = 8
+    # Added once when a text with matches is also shouted.
+    SHOUTING_WEIGHT = 0.25
+    # Undo common letter substitutions before matching.
+    SUBSTITUTIONS = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"})
+    REPEATED = re.compile(r"(\w)\1{2,}")
+    EMPHASIS = re.compile(r"[!?]{3,}")
+    # Normalized text that may be allowed locally: letters and plain punctuation.
+    PLAIN = re.compile(r"[a-z' .,!?-]+")
+    WORD = re.compile(r"[a-z']+")
+
+    def __init__(self, weights, safe_words=None):
+        self.weights = {self.normalize(term): weight for term, weight in weights.items()}
+        self.automaton = Automaton(self.weights)
+        self.safe_words = {self.normalize(word) for word in safe_words or ()}
+
+    @classmethod
+    def from_file(cls, path, safe_path=None):
+        weights = {}
+        for line in _read_wordlist(path):
+            term, _, weight = line.rpartition(" ")
+            try:
+                weights[term] = float(weight)
+            except ValueError:
+                weights[line] = 1.0
+        safe_words = _read_wordlist(safe_path) if safe_path else None
+        return cls(weights, safe_words)
+
+    def normalize(self, text):
+        text = normalize_text(text).translate(self.SUBSTITUTIONS)
+        return self.REPEATED.sub(r"\1", text)
+
+    def classify(self, text):
+        """
+        Return (False, score) when the text is rejected locally, (True, 0.0)
+        when it is allowed locally, else None.
+        """
+        normalized = self.normalize(text)
+        score = 0.0
+        for start, end, term in self.automaton.find(normalized):
+            # Whole words only, so "class" does not match "ass".
+            if start > 0 and normalized[start - 1].isalnum():
+                continue
+            if end < len(normalized) and normalized[end].isalnum():
+                continue
+            score += self.weights[term]
+
+        shouting = self._is_shouting(text)
+        if score and shouting:
+            score += self.SHOUTING_WEIGHT
+        if score >= self.REJECT_SCORE:
+            return False, min(score, 1.0)
+        if not score and not shouting and self._is_safe(normalized):
+            return True, 0.0
+        return None
+
+    def _is_safe(self, normalized):
+        if not self.safe_words or not self.PLAIN.fullmatch(normalized):
+            return False
+        words = self.WORD.findall(normalized)
+        return 0 < len(words) <= self.ALLOW_MAX_WORDS and all(word in self.safe_words for word in words)
+
+    def _is_shouting(self, text):
+        if self.EMPHASIS.search(text):
+            return True
+        letters = [char for char in text if char.isalpha()]
+        return len(letters) >= 12 and sum(char.isupper() for char in letters) > 0.7 * len(letters)
+
+
+def _read_wordlist(path):
+    # Non-empty lines, without "#" comments.
+    with open(path) as f:
+        return [line for line in (raw.split("#", 1)[0].strip() for raw in f) if line]
+
+
+_prefilters = {}
+_prefilter_lock = threading.Lock()
+
+
+def get_prefilter():
+    """
+    The PreFilter for CONTENT_MODERATION_WORDLIST, loaded on first use, or
+    None when CONTENT_MODERATION_PREFILTER is off. With
+    CONTENT_MODERATION_PREFILTER_ALLOW it also allows short text made of
+    CONTENT_MODERATION_SAFE_WORDLIST words.
+    """
+    if not settings.CONTENT_MODERATION_PREFILTER:
+        return None
+    key = (
+        settings.CONTENT_MODERATION_WORDLIST,
+        settings.CONTENT_MODERATION_SAFE_WORDLIST if settings.CONTENT_MODERATION_PREFILTER_ALLOW else None,
+    )
+    if key not in _prefilters:
+        with _prefilter_lock:
+            if key not in _prefilters:
+                _prefilters[key] = PreFilter.from_file(*key)
+    return _prefilters[key]
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for analyzer calls.
+
+    Opens when, over the last `window` seconds, at least `min_calls` calls
+    finished and `failure_rate` of them failed. While open every call is
+    refused; after `cooldown` seconds one trial call goes through (half-open)
+    and its outcome closes or reopens the breaker.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window, min_calls, failure_rate, cooldown, on_change=None):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.on_change = on_change
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        # (finished at, failed) per call inside the window.
+        self._outcomes = deque()
+        self._failures = 0
+        self._lock = threading.Lock()
 
-def check_toxicity(text: str, threshold: float = 0.7) -> dict:
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._set_state(self.HALF_OPEN)
+                return True
+            # Open, or half-open with the trial call still running.
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN:
+                self._reset()
+                if ok:
+                    self._set_state(self.CLOSED)
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, not ok))
+            self._failures += not ok
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._failures -= self._outcomes.popleft()[1]
+            if (
+                self.state == self.CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and self._failures >= self.failure_rate * len(self._outcomes)
+            ):
+                self._reset()
+                self._open(now)
+
+    def _open(self, now):
+        self._opened_at = now
+        self._set_state(self.OPEN)
+
+    def _reset(self):
+        self._outcomes.clear()
+        self._failures = 0
+
+    def _set_state(self, state):
+        self.state = state
+        if self.on_change is not None:
+            self.on_change(state)
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+_executor = None
+
+
+def get_breaker():
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    window=settings.CONTENT_MODERATION_BREAKER_WINDOW,
+                    min_calls=settings.CONTENT_MODERATION_BREAKER_MIN_CALLS,
+                    failure_rate=settings.CONTENT_MODERATION_BREAKER_FAILURE_RATE,
+                    cooldown=settings.CONTENT_MODERATION_BREAKER_COOLDOWN,
+                    on_change=_publish_breaker_state,
+                )
+    return _breaker
+
+
+def reset_breaker():
+    """
+    Forget this process's breaker; the next call builds a closed one from
+    the current settings.
+    """
+    global _breaker
+    with _breaker_lock:
+        _breaker = None
+
+
+def _publish_breaker_state(state):
+    if state == CircuitBreaker.OPEN:
+        _count("breaker_opened")
+    try:
+        get_redis_connection("default").hset(
+            BREAKER_KEY, f"{socket.gethostname()}:{os.getpid()}", f"{state}:{int(time.time())}"
+        )
+    except Exception as e:
+        print(f"Error publishing moderation breaker state: {e}")
+
+
+def _get_executor():
+    # Analyzer calls run here so the request thread can give up at the
+    # deadline; a call that overruns keeps its thread until the socket
+    # timeout ends it.
+    global _executor
+    if _executor is None:
+        with _breaker_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.CONTENT_MODERATION_MAX_CONCURRENCY,
+                    thread_name_prefix="moderation",
+                )
+    return _executor
+
+
+def call_analyzer(text):
+    """
+    Score `text` with the analyzer within CONTENT_MODERATION_TIMEOUT, retrying
+    failed calls up to CONTENT_MODERATION_RETRIES times inside that budget.
+    Raises ModerationUnavailable on timeout, on the last failure, or when the
+    circuit breaker refuses the call.
+    """
+    breaker = get_breaker()
+    analyzer = get_analyzer()
+    deadline = time.monotonic() + settings.CONTENT_MODERATION_TIMEOUT
+    attempts = settings.CONTENT_MODERATION_RETRIES + 1
+
+    for attempt in range(attempts):
+        if not breaker.allow():
+            _count("breaker_rejected")
+            raise ModerationUnavailable("Moderation circuit breaker is open")
+
+        future = _get_executor().submit(analyzer.score, text)
+        try:
+            score = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            _count("timeouts")
+            breaker.record(False)
+            raise ModerationUnavailable("Moderation call timed out")
+        except Exception as e:
+            _count("errors")
+            breaker.record(False)
+            if attempt + 1 == attempts or time.monotonic() >= deadline:
+                raise ModerationUnavailable(f"Moderation call failed: {e}") from e
+            continue
+
+        breaker.record(True)
+        return score
+
+
+class ScoreLRU:
+    """
+    Bounded in-process LRU of scores with per-entry expiry, in front of Redis.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            score, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return score
+
+    def set(self, key, score, ttl):
+        with self._lock:
+            self._entries[key] = (score, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_l1 = ScoreLRU(settings.CONTENT_MODERATION_L1_SIZE)
+
+# Outcomes counted since the last push to STATS_KEY. They ride along with the
+# next Redis lookup, so L1 hits cost no round trip.
+_pending_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def check_toxicity(text: str, threshold: float = DEFAULT_THRESHOLD) -> dict:
     if not text.strip():
         return {"allowed": True, "score": 0.0}
 
-    analyze_request = {
-        'comment': {'text': text},
-        'requestedAttributes': {'TOXICITY': {}}
-    }
-    response = client.comments().analyze(body=analyze_request).execute()
-    score = response['attributeScores']['TOXICITY']['summaryScore']['value']
-    
+    prefilter = get_prefilter()
+    decision = prefilter.classify(text) if prefilter is not None else None
+    if decision is not None:
+        allowed, score = decision
+        _count("prefilter_allowed" if allowed else "prefilter_rejected")
+        return {"allowed": allowed, "score": score, "content": text}
+
+    try:
+        score = get_toxicity_score(text)
+    except ModerationUnavailable:
+        # "pending" leaves the decision to the caller (see
+        # apps.blog.moderation); "open" lets the text through unscored.
+        if settings.CONTENT_MODERATION_FAILURE_POLICY != "open":
+            raise
+        _count("failed_open")
+        return {"allowed": True, "score": None, "content": text}
+
     return {
         "allowed": score < threshold,
         "score": score,
         "content":  text
     }
+
+
+def get_toxicity_score(text):
+    """
+    Toxicity score of `text` from the in-process L1, then Redis, then the
+    analyzer. Fresh scores are cached for CONTENT_MODERATION_ALLOWED_TTL or
+    CONTENT_MODERATION_REJECTED_TTL depending on the default-threshold verdict.
+    Raises ModerationUnavailable when the analyzer cannot answer.
+    """
+    digest = text_digest(text)
+    score = _l1.get(digest)
+    if score is not None:
+        _count("l1_hits")
+        return score
+
+    key = VERDICT_KEY.format(digest=digest)
+    redis = None
+    cached = None
+    try:
+        redis = get_redis_connection("default")
+        pipe = redis.pipeline(transaction=False)
+        pipe.get(key)
+        _push_stats(pipe)
+        cached = pipe.execute()[0]
+    except Exception as e:
+        # Redis unavailable: fall back to the analyzer.
+        print(f"Error reading moderation cache: {e}")
+        redis = None
+
+    if cached is not None:
+        score = float(cached)
+        _count("redis_hits")
+        _l1.set(digest, score, settings.CONTENT_MODERATION_L1_TTL)
+        return score
+
+    _count("misses")
+    score = call_analyzer(text)
+    ttl = (
+        settings.CONTENT_MODERATION_ALLOWED_TTL
+        if score < DEFAULT_THRESHOLD
+        else settings.CONTENT_MODERATION_REJECTED_TTL
+    )
+    _l1.set(digest, score, min(ttl, settings.CONTENT_MODERATION_L1_TTL))
+    if redis is not None:
+        try:
+            redis.set(key, score, ex=ttl)
+        except Exception as e:
+            print(f"Error writing moderation cache: {e}")
+    return score
+
+
+def moderation_cache_stats():
+    """
+    Outcomes counted by every process: the STATS_KEY counters, plus
+    "hit_rate" (over cache lookups) and "remote_avoided" (share of checks that
+    did not call the analyzer). This process's unpushed counts are included.
+    "breakers" maps each process to its last published breaker state.
+    """
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    _push_stats(pipe)
+    pipe.hgetall(STATS_KEY)
+    pipe.hgetall(BREAKER_KEY)
+    raw, breakers = pipe.execute()[-2:]
+
+    stats = {field: 0 for field in STATS_FIELDS}
+    for field, value in raw.items():
+        stats[field.decode() if isinstance(field, bytes) else field] = int(value)
+    lookups = stats["l1_hits"] + stats["redis_hits"] + stats["misses"]
+    checks = lookups + stats["prefilter_allowed"] + stats["prefilter_rejected"]
+    stats["hit_rate"] = (stats["l1_hits"] + stats["redis_hits"]) / lookups if lookups else 0.0
+    stats["remote_avoided"] = 1 - stats["misses"] / checks if checks else 0.0
+    stats["breakers"] = {
+        process.decode() if isinstance(process, bytes) else process:
+            state.decode() if isinstance(state, bytes) else state
+        for process, state in breakers.items()
+    }
+    return stats
+
+
+def reset_moderation_cache_stats():
+    with _stats_lock:
+        _pending_stats.clear()
+    get_redis_connection("default").delete(STATS_KEY)
+
+
+def clear_local_cache():
+    """
+    Empty this process's L1 (Redis entries are kept).
+    """
+    _l1.clear()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _pending_stats[outcome] += 1
+
+
+def _push_stats(pipe):
+    with _stats_lock:
+        pending = dict(_pending_stats)
+        _pending_stats.clear()
+    for field, count in pending.items():
+        pipe.hincrby(STATS_KEY, field, count)
@@ -0,0 +1,73 @@
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for smtplib: every command succeeds, and DATA is read
+    # up to the terminating "." line and discarded.
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self._reply(f"220 {server.hostname} SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b"DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self._reply("250 OK")
+            elif command == b"EHLO":
+                self._reply(f"250-{server.hostname}\r\n250 8BITMIME")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+    def _reply(self, text):
+        self.wfile.write(text.encode() + b"\r\n")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Local SMTP server that accepts and drops every message, counting
+    connections and messages. For mail throughput benchmarks:
+
+        with SMTPSink() as sink:
+            connection = get_connection(
+                "django.core.mail.backends.smtp.EmailBackend", host=sink.host, port=sink.port
+            )
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.host, self.port = self.server_address[:2]
+        self.hostname = "smtp-sink.local"
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,15 +1,114 @@
+import math
+import random
+import time
 from django.core.cache import cache
 
-def delete_cache_by_prefix(prefix: str):
+# Generation counters never expire; entries stored under an old generation
+# simply stop being read and age out with their own TTL.
+GENERATION_KEY = "cache_ns:{namespace}:generation"
+
+
+def _new_generation():
+    # Seed with a timestamp so a counter lost to eviction or a flush never
+    # comes back at a value that was already used for live entries.
+    return int(time.time() * 1000)
+
+
+def get_namespace_generation(namespace: str) -> int:
+    """
+    Return the current generation of a cache namespace, creating it if needed.
+    """
+    key = GENERATION_KEY.format(namespace=namespace)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _new_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def namespaced_key(namespace: str, key: str) -> str:
     """
-    Delete all cache keys that start with a specific prefix.
-    Only works with Redis + django-redis backend.
+    Build the cache key for `key` inside `namespace` at its current generation.
+    """
+    return f"{namespace}:{get_namespace_generation(namespace)}:{key}"
+
+
+def get_namespaced(namespace: str, key: str, default=None):
+    return cache.get(namespaced_key(namespace, key), default)
+
+
+def set_namespaced(namespace: str, key: str, value, timeout=60):
+    cache.set(namespaced_key(namespace, key), value, timeout=timeout)
+
+
+def invalidate_namespace(namespace: str):
     """
+    Invalidate every key of a namespace with a single atomic INCR.
+
+    Unlike scanning for a key prefix, the cost does not depend on how many
+    keys are cached.
+    """
+    key = GENERATION_KEY.format(namespace=namespace)
     try:
-        keys = cache.keys(f"{prefix}*")
-        if keys:
-            cache.delete_many(keys)
+        cache.incr(key)
+    except ValueError:
+        # Counter missing: start a fresh generation.
+        cache.add(key, _new_generation(), timeout=None)
     except Exception as e:
         # Log nếu dùng production logger
-        print(f"Error deleting cache with prefix {prefix}: {e}")
+        print(f"Error invalidating cache namespace {namespace}: {e}")
+
+
+def get_or_set_namespaced(namespace: str, key: str, compute, timeout=60, stale_timeout=None,
+                          lock_timeout=10, wait_timeout=2.0, beta=1.0):
+    """
+    Read-through cache for `key` in `namespace` with single-flight recompute.
+
+    Entries remember how long they took to build and are refreshed a little
+    before they expire, with a probability that grows as expiry approaches
+    (probabilistic early refresh). Only the worker holding a short Redis lock
+    rebuilds; the others serve the stale entry, or wait up to `wait_timeout`
+    seconds for the rebuild when there is nothing to serve.
+    """
+    full_key = namespaced_key(namespace, key)
+    entry = cache.get(full_key)
+    if entry is not None and not _should_refresh(entry, beta):
+        return entry["value"]
+
+    lock_key = f"{full_key}:lock"
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            return _recompute(full_key, compute, timeout, stale_timeout)
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return entry["value"]
+
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(full_key)
+        if entry is not None:
+            return entry["value"]
+
+    # The lock holder is too slow: answer this request without caching it.
+    return compute()
+
+
+def _should_refresh(entry, beta):
+    # XFetch: expiry - delta * beta * -log(rand) is the point at which this
+    # reader volunteers to rebuild the entry.
+    early = entry["delta"] * beta * -math.log(1.0 - random.random())
+    return time.time() + early >= entry["expires"]
+
 
+def _recompute(full_key, compute, timeout, stale_timeout):
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    entry = {"value": value, "delta": finished - started, "expires": finished + timeout}
+    # Keep the entry past its logical expiry so readers have a stale copy to
+    # serve while one worker rebuilds it.
+    cache.set(full_key, entry, timeout=timeout + (stale_timeout if stale_timeout is not None else timeout))
+    return value
@@ -0,0 +1,153 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .models import Notification
+from .signals import NOTIFICATION_UPDATED, enqueue_push
+
+# Actor names kept on an aggregated row, newest first.
+RECENT_ACTORS = 3
+PUSH_THROTTLE_KEY = "notifications:pushed:{notification_id}"
+# Set while a trailing push of a throttled row is scheduled.
+TRAILING_PUSH_KEY = "notifications:push_scheduled:{notification_id}"
+
+
+def notify_aggregated(recipient, group_key, actor, action, target):
+    """
+    Tell `recipient` that `actor` did `action` ("commented on your post:
+    ...") on `target`. Within NOTIFICATION_AGGREGATION_WINDOW the event is
+    folded into the recipient's unread `group_key` notification instead of
+    adding a row, and that row is pushed again at most once per
+    NOTIFICATION_AGGREGATION_PUSH_INTERVAL; updates inside the interval are
+    sent by one trailing push when it ends. Returns (notification, created).
+
+    `actor_count` counts an actor again once it has left the recent actors,
+    so it is exact for small groups and an upper bound for busy ones.
+
+    Each update moves the row's created_at to now, back to the top of the
+    inbox; a client paging with an older cursor skips it and learns about it
+    from the push instead.
+    """
+    window = settings.NOTIFICATION_AGGREGATION_WINDOW
+    content_type = ContentType.objects.get_for_model(target)
+    now = timezone.now()
+
+    with transaction.atomic():
+        notification = None
+        if window:
+            # Two first events of a group would both find no row and insert
+            # one each; the lock makes the second one find the first's.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))",
+                    [f"notifications:{recipient.pk}:{group_key}"],
+                )
+            notification = (
+                Notification.objects.select_for_update()
+                .filter(
+                    recipient=recipient,
+                    group_key=group_key,
+                    is_read=False,
+                    created_at__gte=now - timedelta(seconds=window),
+                )
+                .order_by("-created_at")
+                .first()
+            )
+
+        if notification is None:
+            notification = Notification.objects.create(
+                recipient=recipient,
+                message=f"{actor} {action}",
+                content_type=content_type,
+                object_id=target.pk,
+                group_key=group_key,
+                recent_actors=[actor],
+            )
+            return notification, True
+
+        if actor not in notification.recent_actors:
+            notification.actor_count += 1
+        notification.recent_actors = [actor] + [
+            name for name in notification.recent_actors if name != actor
+        ][:RECENT_ACTORS - 1]
+        notification.message = f"{describe_actors(notification.recent_actors, notification.actor_count)} {action}"
+        notification.content_type = content_type
+        notification.object_id = target.pk
+        notification.created_at = now
+        notification.save(update_fields=[
+            "actor_count", "recent_actors", "message", "content_type", "object_id", "created_at",
+        ])
+        if _claim_push(notification.id):
+            enqueue_push(NOTIFICATION_UPDATED, notification)
+        else:
+            _schedule_trailing_push(notification.id)
+    return notification, False
+
+
+def send_trailing_push(notification_id):
+    """
+    Push the current state of a notification whose updates were throttled,
+    and start a new interval. Returns False when it is gone.
+    """
+    notification = Notification.objects.filter(pk=notification_id).first()
+    if notification is None:
+        return False
+    interval = settings.NOTIFICATION_AGGREGATION_PUSH_INTERVAL
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=True)
+        pipe.delete(TRAILING_PUSH_KEY.format(notification_id=notification_id))
+        if interval:
+            pipe.set(PUSH_THROTTLE_KEY.format(notification_id=notification_id), 1, ex=interval)
+        pipe.execute()
+    except Exception as e:
+        print(f"Error throttling notification push: {e}")
+    enqueue_push(NOTIFICATION_UPDATED, notification)
+    return True
+
+
+def describe_actors(recent_actors, actor_count):
+    """
+    "Alice", "Alice and Bob" or "Alice and 41 others".
+    """
+    first = recent_actors[0]
+    if actor_count == 1:
+        return first
+    if actor_count == 2 and len(recent_actors) > 1:
+        return f"{first} and {recent_actors[1]}"
+    others = actor_count - 1
+    return f"{first} and {others} other{'s' if others != 1 else ''}"
+
+
+def _claim_push(notification_id):
+    interval = settings.NOTIFICATION_AGGREGATION_PUSH_INTERVAL
+    if not interval:
+        return True
+    try:
+        key = PUSH_THROTTLE_KEY.format(notification_id=notification_id)
+        return bool(get_redis_connection("default").set(key, 1, nx=True, ex=interval))
+    except Exception as e:
+        print(f"Error throttling notification push: {e}")
+        return True
+
+
+def _schedule_trailing_push(notification_id):
+    # Once per interval: the task pushes whatever the row holds by then.
+    from .tasks import push_aggregated_notification
+
+    interval = settings.NOTIFICATION_AGGREGATION_PUSH_INTERVAL
+    try:
+        redis = get_redis_connection("default")
+        if not redis.set(TRAILING_PUSH_KEY.format(notification_id=notification_id), 1, nx=True, ex=interval * 2):
+            return
+        countdown = max(redis.ttl(PUSH_THROTTLE_KEY.format(notification_id=notification_id)), 1)
+    except Exception as e:
+        print(f"Error scheduling notification push: {e}")
+        return
+    transaction.on_commit(
+        lambda: push_aggregated_notification.apply_async((notification_id,), countdown=countdown),
+        robust=True,
+    )
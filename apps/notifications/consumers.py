@@ -21,3 +21,6 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     async def notification_event(self, event):
         print(f"[NotificationConsumer] Sending notification event to user_id={self.user_id}: {event['data']}")
         await self.send(text_data=json.dumps(event["data"]))
+
+    async def unread_count_event(self, event):
+        await self.send(text_data=json.dumps(event["data"]))
@@ -0,0 +1,102 @@
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from apps.users.models import EmailDigest
+from .mail import queue_email
+from .models import QueuedEmail
+
+# One list of one-line summaries per recipient, and the recipients with
+# something pending per window.
+BUFFER_KEY = "email_digest:{recipient}"
+PENDING_KEY = "email_digest:pending:{window}"
+SUMMARY_LENGTH = 200
+# Summaries listed in one digest; the rest are only counted.
+DIGEST_LINES = 50
+# Recipients drained per round trip.
+DRAIN_CHUNK = 500
+
+# Drop the summaries a digest was built from (ARGV: count, recipient per
+# buffer key), keeping any added since, and unmark the recipients left with
+# nothing pending. KEYS[1] is the pending set.
+ACK_LUA = """
+for i = 2, #KEYS do
+    redis.call('LTRIM', KEYS[i], ARGV[2 * i - 3], -1)
+    if redis.call('LLEN', KEYS[i]) == 0 then
+        redis.call('SREM', KEYS[1], ARGV[2 * i - 2])
+    end
+end
+"""
+
+
+def send_or_digest(recipient_email, window, subject, message, summary):
+    """
+    Queue the email now for the "immediate" window; otherwise buffer a short
+    `summary` line for the recipient's next `window` digest, sent by
+    `flush_email_digests`.
+    """
+    if window == EmailDigest.IMMEDIATE:
+        return queue_email(subject, message, recipient_email)
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=True)
+        pipe.rpush(BUFFER_KEY.format(recipient=recipient_email), summary[:SUMMARY_LENGTH])
+        pipe.sadd(PENDING_KEY.format(window=window), recipient_email)
+        pipe.execute()
+    except Exception as e:
+        # Redis unavailable: send it on its own rather than lose it.
+        print(f"Error buffering digest entry: {e}")
+        return queue_email(subject, message, recipient_email)
+    return None
+
+
+def send_email_digests(window):
+    """
+    Render the buffered summaries of every recipient pending in `window`
+    into one queued email each. Returns the number of digests queued.
+
+    Summaries are removed from Redis only once their digests are inserted,
+    so a failed insert leaves them for the next run; a failure between the
+    two sends them twice.
+    """
+    redis = get_redis_connection("default")
+    pending_key = PENDING_KEY.format(window=window)
+    recipients = [_decode(raw) for raw in redis.smembers(pending_key)]
+    queued = 0
+
+    for start in range(0, len(recipients), DRAIN_CHUNK):
+        chunk = recipients[start:start + DRAIN_CHUNK]
+        buffer_keys = [BUFFER_KEY.format(recipient=recipient) for recipient in chunk]
+        pipe = redis.pipeline(transaction=False)
+        for buffer_key in buffer_keys:
+            pipe.lrange(buffer_key, 0, -1)
+        replies = pipe.execute()
+
+        emails = []
+        for recipient, summaries in zip(chunk, replies):
+            if summaries:
+                emails.append(render_digest(recipient, window, [_decode(raw) for raw in summaries]))
+        with transaction.atomic():
+            QueuedEmail.objects.bulk_create(emails, batch_size=1000)
+        queued += len(emails)
+
+        acknowledged = []
+        for recipient, summaries in zip(chunk, replies):
+            acknowledged.extend([len(summaries), recipient])
+        redis.eval(ACK_LUA, 1 + len(buffer_keys), pending_key, *buffer_keys, *acknowledged)
+
+    return queued
+
+
+def render_digest(recipient_email, window, summaries):
+    count = len(summaries)
+    lines = [f"- {summary}" for summary in summaries[:DIGEST_LINES]]
+    if count > DIGEST_LINES:
+        lines.append(f"... and {count - DIGEST_LINES} more.")
+    return QueuedEmail(
+        subject=f"Your {window} digest: {count} new notification{'s' if count != 1 else ''}",
+        body="\n".join(lines),
+        recipient=recipient_email,
+    )
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,118 @@
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+
+from .models import QueuedEmail
+
+FROM_EMAIL = "noreply@example.com"
+
+
+def queue_email(subject, message, recipient_email, urgent=False):
+    """
+    Queue an email for `flush_email_queue`: one INSERT, committed (or rolled
+    back) with the current transaction. An `urgent` email is also sent on
+    its own as soon as the transaction commits, ahead of the queue. Returns
+    the QueuedEmail.
+    """
+    email = QueuedEmail.objects.create(
+        subject=subject[:QueuedEmail._meta.get_field("subject").max_length],
+        body=message,
+        recipient=recipient_email,
+    )
+    if urgent:
+        transaction.on_commit(lambda: _kick(email.id), robust=True)
+    return email
+
+
+def _kick(email_id):
+    from .tasks import send_queued_email
+    send_queued_email.delay(email_id)
+
+
+def drain_email_queue(batch_size=None, max_batches=None, connection=None, rate_limit=None, ids=None):
+    """
+    Send queued emails in id order over one reused connection, a batch per
+    `send_messages` call, and delete them once sent. Returns the number sent.
+
+    Batches hold at most EMAIL_QUEUE_BATCH_SIZE emails and are claimed with
+    SKIP LOCKED, so concurrent drains never share emails. With
+    EMAIL_QUEUE_RATE_LIMIT (emails per second) the drain sleeps between
+    batches to stay under it. `ids` limits the drain to those emails.
+
+    When a batch fails its emails are sent one by one, so one bad address
+    does not hold back the rest. Emails that still fail are retried by later
+    drains and dropped after EMAIL_QUEUE_MAX_ATTEMPTS. Delivery is at least
+    once, as the server may have accepted part of the batch.
+    """
+    batch_size = batch_size or settings.EMAIL_QUEUE_BATCH_SIZE
+    if rate_limit is None:
+        rate_limit = settings.EMAIL_QUEUE_RATE_LIMIT
+    connection = connection or get_connection(fail_silently=False)
+    sent = 0
+    batches = 0
+    # Failed emails stay queued; move past them within this drain.
+    last_id = 0
+    started = time.monotonic()
+
+    try:
+        while max_batches is None or batches < max_batches:
+            with transaction.atomic():
+                queued = QueuedEmail.objects.select_for_update(skip_locked=True).filter(id__gt=last_id)
+                if ids is not None:
+                    queued = queued.filter(id__in=ids)
+                emails = list(queued.order_by("id")[:batch_size])
+                if not emails:
+                    break
+                last_id = emails[-1].id
+
+                messages = [
+                    EmailMessage(email.subject, email.body, FROM_EMAIL, [email.recipient])
+                    for email in emails
+                ]
+                try:
+                    # Opens the connection on the first batch and keeps it
+                    # open for the next ones.
+                    connection.open()
+                    sent += connection.send_messages(messages) or 0
+                    failed = []
+                except Exception as e:
+                    print(f"Error sending {len(emails)} queued emails: {e}")
+                    connection.close()
+                    failed = _send_one_by_one(connection, emails, messages)
+                    sent += len(emails) - len(failed)
+
+                QueuedEmail.objects.filter(
+                    id__in=[email.id for email in emails if email.id not in failed]
+                ).delete()
+                if failed:
+                    QueuedEmail.objects.filter(
+                        id__in=failed, attempts__gte=settings.EMAIL_QUEUE_MAX_ATTEMPTS - 1
+                    ).delete()
+                    QueuedEmail.objects.filter(id__in=failed).update(attempts=F("attempts") + 1)
+            batches += 1
+
+            if rate_limit:
+                wait = sent / rate_limit - (time.monotonic() - started)
+                if wait > 0:
+                    time.sleep(wait)
+    finally:
+        connection.close()
+
+    return sent
+
+
+def _send_one_by_one(connection, emails, messages):
+    # Returns the ids of the emails that could not be sent.
+    failed = []
+    for email, message in zip(emails, messages):
+        try:
+            connection.open()
+            connection.send_messages([message])
+        except Exception as e:
+            print(f"Error sending queued email {email.id}: {e}")
+            connection.close()
+            failed.append(email.id)
+    return failed
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -16,5 +17,65 @@ class Notification(models.Model):
     object_id = models.PositiveIntegerField(null=True, blank=True)
     content_object = GenericForeignKey("content_type", "object_id")
 
+    # Aggregated notifications (apps.notifications.aggregation): events on the
+    # same target share one unread row per window, e.g. "Alice and 41 others
+    # commented on your post". Null for notifications that never aggregate.
+    group_key = models.CharField(max_length=100, null=True, blank=True)
+    actor_count = models.PositiveIntegerField(default=1)
+    recent_actors = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset reads of the inbox (apps.notifications.pagination), newest
+            # first; the partial index serves `unread_only` and stays small
+            # as notifications are read.
+            models.Index(fields=["recipient", "-created_at", "-id"], name="notifications_inbox_idx"),
+            models.Index(
+                fields=["recipient", "-created_at", "-id"],
+                condition=Q(is_read=False),
+                name="notifications_unread_idx",
+            ),
+            models.Index(
+                fields=["recipient", "group_key", "-created_at"],
+                condition=Q(is_read=False, group_key__isnull=False),
+                name="notifications_group_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Notification to {self.recipient.username}: {self.message[:50]}"
+
+
+class OutboxEvent(models.Model):
+    """
+    A side effect recorded in the transaction that caused it and performed
+    by apps.notifications.outbox.drain_outbox once that transaction commits.
+    """
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id}"
+
+
+class QueuedEmail(models.Model):
+    """
+    An email waiting for apps.notifications.mail.drain_email_queue, which
+    sends queued emails in batches over one SMTP connection.
+    """
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    recipient = models.EmailField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient}"
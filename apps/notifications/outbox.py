@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import OutboxEvent
+
+# kind -> handler(payload); filled by the @handles decorators of the modules
+# that enqueue the events (imported through their apps' signals).
+HANDLERS = {}
+
+
+def handles(kind):
+    def register(handler):
+        HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+def enqueue(kind, **payload):
+    """
+    Record a side effect in the current transaction: one INSERT, and nothing
+    is sent if the transaction rolls back. `payload` must be JSON
+    serializable. With OUTBOX_KICK the drain is queued as soon as the
+    transaction commits; flush_outbox picks up whatever a kick missed.
+    """
+    OutboxEvent.objects.create(kind=kind, payload=payload)
+    if settings.OUTBOX_KICK:
+        transaction.on_commit(_kick, robust=True)
+
+
+def _kick():
+    from .tasks import flush_outbox
+    flush_outbox.delay()
+
+
+def drain_outbox(batch_size=None, max_batches=None):
+    """
+    Run the handlers of pending events in id order, a batch per transaction,
+    and delete the events that succeeded. Returns the number handled.
+
+    Batches are claimed with SKIP LOCKED, so concurrent drains never share
+    events. Delivery is at least once: a handler can run again when its batch
+    fails to commit. A failing event is retried by later drains and dropped
+    after OUTBOX_MAX_ATTEMPTS.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    handled = 0
+    batches = 0
+    # Failed events stay in the table; move past them within this drain.
+    last_id = 0
+
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(id__gt=last_id)
+                .order_by("id")[:batch_size]
+            )
+            if not events:
+                break
+
+            done, failed, dropped = [], [], []
+            for event in events:
+                try:
+                    # A savepoint per event, so a failed query does not
+                    # abort the rest of the batch.
+                    with transaction.atomic():
+                        HANDLERS[event.kind](event.payload)
+                except Exception as e:
+                    print(f"Error handling outbox event {event.id} ({event.kind}): {e}")
+                    if event.attempts + 1 >= settings.OUTBOX_MAX_ATTEMPTS:
+                        dropped.append(event.id)
+                    else:
+                        failed.append(event.id)
+                else:
+                    done.append(event.id)
+
+            OutboxEvent.objects.filter(id__in=done + dropped).delete()
+            if failed:
+                OutboxEvent.objects.filter(id__in=failed).update(attempts=F("attempts") + 1)
+
+        handled += len(done)
+        batches += 1
+        last_id = events[-1].id
+
+    return handled
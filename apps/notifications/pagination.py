@@ -0,0 +1,11 @@
+from apps.blog.pagination import PostKeysetPagination
+
+
+class NotificationInboxPagination(PostKeysetPagination):
+    """
+    Keyset pagination of the inbox on (created_at, id), newest first, read
+    from notifications_inbox_idx (notifications_unread_idx with
+    `unread_only`). Aggregated rows move to the top when they take another
+    event, so a page read with an older cursor can miss them.
+    """
+    page_size = 20
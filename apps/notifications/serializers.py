@@ -1,7 +1,33 @@
 from rest_framework import serializers
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from .models import Notification
 
+User = get_user_model()
+
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'message', 'is_read', 'created_at', 'object_id', 'content_type']
+
+class NotificationInboxSerializer(serializers.ModelSerializer):
+    # {"type": "comment", "id": 42} instead of the GenericForeignKey: the
+    # model name comes from the ContentType cache, with no query per row.
+    target = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'message', 'is_read', 'created_at', 'actor_count', 'recent_actors', 'target']
+
+    def get_target(self, obj):
+        if obj.content_type_id is None:
+            return None
+        return {
+            "type": ContentType.objects.get_for_id(obj.content_type_id).model,
+            "id": obj.object_id,
+        }
+
+class EmailPreferencesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['email_digest']
@@ -1,8 +1,15 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Notification
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from .outbox import enqueue, handles
+from .unread import adjust_unread_count, get_unread_count, push_unread_count
+
+NOTIFICATION_CREATED = "notification_created"
+# An aggregated notification took another event (apps.notifications.aggregation).
+NOTIFICATION_UPDATED = "notification_updated"
 
 @receiver(post_save, sender=Notification)
 def send_realtime_notification(sender, instance, created, **kwargs):
@@ -10,24 +17,53 @@ def send_realtime_notification(sender, instance, created, **kwargs):
     if not created:
         return
 
-    channel_layer = get_channel_layer()
-    group_name = f"notify_{instance.recipient.id}"
+    # Counted when the row commits, next to the INSERT: by the drain, the row
+    # may already be read, deleted or in a counter rebuilt from Postgres.
+    if not instance.is_read:
+        recipient_id = instance.recipient_id
+        transaction.on_commit(lambda: adjust_unread_count(recipient_id, 1, push=False), robust=True)
+    # Pushed by the outbox drain once the notification is committed.
+    enqueue_push(NOTIFICATION_CREATED, instance)
 
+def enqueue_push(kind, instance):
     # If content_object exists, get more information
     target_type = instance.content_type.model if instance.content_type else None
     object_id = instance.object_id if instance.object_id else None
 
+    enqueue(
+        kind,
+        recipient_id=instance.recipient_id,
+        data={
+            "id": instance.id,
+            "message": instance.message,
+            "timestamp": instance.created_at.isoformat(),
+            "is_read": instance.is_read,
+            "target_type": target_type,
+            "object_id": object_id,
+            "actor_count": instance.actor_count,
+        },
+    )
+
+@handles(NOTIFICATION_CREATED)
+def push_notification(payload):
+    _send_to_recipient(payload)
+    if not payload["data"]["is_read"]:
+        # Already counted on commit; only the current value is pushed.
+        push_unread_count(payload["recipient_id"], get_unread_count(payload["recipient_id"]))
+
+@handles(NOTIFICATION_UPDATED)
+def push_notification_update(payload):
+    # Still the same unread row: the unread count does not change.
+    _send_to_recipient(payload)
+
+def _send_to_recipient(payload):
+    channel_layer = get_channel_layer()
+    group_name = f"notify_{payload['recipient_id']}"
+
     async_to_sync(channel_layer.group_send)(
         group_name,
         {
             "type": "notification_event",
-            "data": {
-                "id": instance.id,
-                "message": instance.message,
-                "timestamp": instance.created_at.isoformat(),
-                "is_read": instance.is_read,
-                "target_type": target_type,
-                "object_id": object_id,
-            }
+            "data": payload["data"],
         }
     )
@@ -1,12 +1,43 @@
 from celery import shared_task
-from django.core.mail import send_mail
+
+from .aggregation import send_trailing_push
+from .digest import send_email_digests
+from .mail import drain_email_queue, queue_email
+from .outbox import drain_outbox
+from .unread import reconcile_unread_counts
 
 @shared_task
 def send_notification_email(subject, message, recipient_email):
-    send_mail(
-        subject,
-        message,
-        "noreply@example.com", 
-        [recipient_email],
-        fail_silently=False,
-    )
+    # Kept for messages already in the broker: new code calls queue_email,
+    # so the body is not carried by a task of its own.
+    queue_email(subject, message, recipient_email)
+
+@shared_task
+def flush_email_queue():
+    sent = drain_email_queue()
+    return f"{sent} emails sent."
+
+@shared_task
+def send_queued_email(email_id):
+    sent = drain_email_queue(ids=[email_id])
+    return f"{sent} emails sent."
+
+@shared_task
+def flush_email_digests(window):
+    queued = send_email_digests(window)
+    return f"{queued} {window} digests queued."
+
+@shared_task
+def push_aggregated_notification(notification_id):
+    pushed = send_trailing_push(notification_id)
+    return f"Notification {notification_id} {'pushed' if pushed else 'is gone'}."
+
+@shared_task
+def flush_outbox():
+    handled = drain_outbox()
+    return f"{handled} outbox events handled."
+
+@shared_task
+def reconcile_unread_notification_counts():
+    drifted = reconcile_unread_counts()
+    return f"{drifted} unread counters corrected."
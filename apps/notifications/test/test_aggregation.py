@@ -0,0 +1,105 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django_redis import get_redis_connection
+
+from apps.blog.test.factories import CommentFactory, PostFactory
+from apps.notifications.aggregation import (
+    PUSH_THROTTLE_KEY,
+    TRAILING_PUSH_KEY,
+    describe_actors,
+    notify_aggregated,
+    send_trailing_push,
+)
+from apps.notifications.models import Notification, OutboxEvent
+from apps.notifications.signals import NOTIFICATION_UPDATED
+from apps.notifications.test.factories import UserFactory
+
+
+@override_settings(
+    OUTBOX_KICK=False,
+    NOTIFICATION_AGGREGATION_WINDOW=3600,
+    NOTIFICATION_AGGREGATION_PUSH_INTERVAL=0,
+)
+class NotificationAggregationTests(TestCase):
+    def setUp(self):
+        self.author = UserFactory()
+        self.post = PostFactory(author=self.author, title="X")
+        self.comment = CommentFactory(post=self.post)
+
+    def notify(self, actor, recipient=None, group_key="comments:1"):
+        return notify_aggregated(
+            recipient=recipient or self.author,
+            group_key=group_key,
+            actor=actor,
+            action="commented on your post: X",
+            target=self.comment,
+        )
+
+    def test_events_on_the_same_target_share_one_row(self):
+        first, created = self.notify("alice")
+        self.assertTrue(created)
+        self.assertEqual(first.message, "alice commented on your post: X")
+
+        self.notify("bob")
+        for n in range(40):
+            self.notify(f"user{n}")
+
+        notification = Notification.objects.get(group_key="comments:1")
+        self.assertEqual(notification.id, first.id)
+        self.assertEqual(notification.actor_count, 42)
+        self.assertEqual(notification.recent_actors, ["user39", "user38", "user37"])
+        self.assertEqual(notification.message, "user39 and 41 others commented on your post: X")
+
+    def test_repeated_actor_is_counted_once(self):
+        self.notify("alice")
+        self.notify("bob")
+        notification, created = self.notify("alice")
+
+        self.assertFalse(created)
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.message, "alice and bob commented on your post: X")
+
+    def test_read_or_other_groups_start_new_rows(self):
+        first, _ = self.notify("alice")
+        self.notify("bob", group_key="comments:2")
+        self.notify("carol", recipient=UserFactory())
+        Notification.objects.filter(id=first.id).update(is_read=True)
+        _, created = self.notify("dave")
+
+        self.assertTrue(created)
+        self.assertEqual(Notification.objects.filter(group_key__isnull=False).count(), 4)
+
+    @override_settings(NOTIFICATION_AGGREGATION_WINDOW=0)
+    def test_window_zero_disables_aggregation(self):
+        self.notify("alice")
+        _, created = self.notify("bob")
+        self.assertTrue(created)
+
+    @override_settings(NOTIFICATION_AGGREGATION_PUSH_INTERVAL=60)
+    def test_updates_are_pushed_at_most_once_per_interval(self):
+        notification, _ = self.notify("alice")
+        redis = get_redis_connection("default")
+        redis.delete(PUSH_THROTTLE_KEY.format(notification_id=notification.id))
+        redis.delete(TRAILING_PUSH_KEY.format(notification_id=notification.id))
+
+        with patch("apps.notifications.tasks.push_aggregated_notification.apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                for actor in ("bob", "carol", "dave"):
+                    self.notify(actor)
+
+        self.assertEqual(OutboxEvent.objects.filter(kind=NOTIFICATION_UPDATED).count(), 1)
+        # One trailing push for carol and dave, once the interval ends.
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.args[0], (notification.id,))
+        self.assertLessEqual(apply_async.call_args.kwargs["countdown"], 60)
+
+        self.assertTrue(send_trailing_push(notification.id))
+        pushed = OutboxEvent.objects.filter(kind=NOTIFICATION_UPDATED).latest("id")
+        self.assertEqual(pushed.payload["data"]["actor_count"], 4)
+
+    def test_describe_actors(self):
+        self.assertEqual(describe_actors(["alice"], 1), "alice")
+        self.assertEqual(describe_actors(["alice", "bob"], 2), "alice and bob")
+        self.assertEqual(describe_actors(["alice"], 2), "alice and 1 other")
+        self.assertEqual(describe_actors(["alice", "bob", "carol"], 42), "alice and 41 others")
@@ -0,0 +1,99 @@
+from unittest.mock import patch
+
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.notifications.digest import (
+    BUFFER_KEY,
+    DIGEST_LINES,
+    PENDING_KEY,
+    send_email_digests,
+    send_or_digest,
+)
+from apps.notifications.models import QueuedEmail
+from apps.notifications.test.factories import UserFactory
+from apps.users.models import EmailDigest
+
+
+class EmailDigestTests(TestCase):
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.recipients = ["alice@example.com", "bob@example.com"]
+        self.redis.delete(
+            *[BUFFER_KEY.format(recipient=recipient) for recipient in self.recipients],
+            *[PENDING_KEY.format(window=window) for window in EmailDigest.values],
+        )
+
+    def test_immediate_window_queues_the_email(self):
+        send_or_digest("alice@example.com", EmailDigest.IMMEDIATE, "Subject", "Body", "Summary")
+
+        email = QueuedEmail.objects.get()
+        self.assertEqual((email.subject, email.body, email.recipient), ("Subject", "Body", "alice@example.com"))
+
+    def test_one_digest_per_recipient_and_window(self):
+        for n in range(3):
+            send_or_digest("alice@example.com", EmailDigest.HOURLY, "Subject", "Body", f"Alice event {n}")
+        send_or_digest("bob@example.com", EmailDigest.DAILY, "Subject", "Body", "Bob event")
+        self.assertFalse(QueuedEmail.objects.exists())
+
+        self.assertEqual(send_email_digests(EmailDigest.HOURLY), 1)
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.recipient, "alice@example.com")
+        self.assertEqual(email.subject, "Your hourly digest: 3 new notifications")
+        self.assertEqual(email.body.splitlines(), [f"- Alice event {n}" for n in range(3)])
+
+        # Drained: the next hourly run has nothing, the daily one sends Bob's.
+        self.assertEqual(send_email_digests(EmailDigest.HOURLY), 0)
+        self.assertEqual(send_email_digests(EmailDigest.DAILY), 1)
+        self.assertEqual(QueuedEmail.objects.count(), 2)
+
+    def test_failed_insert_keeps_the_buffer(self):
+        for n in range(2):
+            send_or_digest("alice@example.com", EmailDigest.DAILY, "Subject", "Body", f"Event {n}")
+
+        with patch.object(QueuedEmail.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                send_email_digests(EmailDigest.DAILY)
+        self.assertEqual(self.redis.llen(BUFFER_KEY.format(recipient="alice@example.com")), 2)
+
+        self.assertEqual(send_email_digests(EmailDigest.DAILY), 1)
+        self.assertEqual(QueuedEmail.objects.get().subject, "Your daily digest: 2 new notifications")
+        self.assertFalse(self.redis.exists(BUFFER_KEY.format(recipient="alice@example.com")))
+        self.assertFalse(self.redis.sismember(PENDING_KEY.format(window=EmailDigest.DAILY), "alice@example.com"))
+
+    def test_long_digest_is_truncated(self):
+        for n in range(DIGEST_LINES + 5):
+            send_or_digest("alice@example.com", EmailDigest.DAILY, "Subject", "Body", f"Event {n}")
+
+        send_email_digests(EmailDigest.DAILY)
+        body = QueuedEmail.objects.get().body.splitlines()
+        self.assertEqual(len(body), DIGEST_LINES + 1)
+        self.assertEqual(body[-1], "... and 5 more.")
+
+
+class EmailPreferencesAPITests(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.url = reverse("notifications:notification-preferences")
+        self.auth_header = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    def test_get_and_update_digest_window(self):
+        response = self.client.get(self.url, **self.auth_header)
+        self.assertEqual(response.data, {"email_digest": EmailDigest.IMMEDIATE})
+
+        response = self.client.patch(self.url, {"email_digest": "daily"}, **self.auth_header)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email_digest, EmailDigest.DAILY)
+
+    def test_invalid_window(self):
+        response = self.client.patch(self.url, {"email_digest": "weekly"}, **self.auth_header)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
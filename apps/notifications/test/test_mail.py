@@ -0,0 +1,102 @@
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.test import TestCase, override_settings
+
+from apps.core.services.smtp_sink import SMTPSink
+from apps.notifications.mail import drain_email_queue, queue_email
+from apps.notifications.models import QueuedEmail
+
+
+class CountingConnection:
+    def __init__(self, fail=False, reject=()):
+        self.fail = fail
+        self.reject = set(reject)
+        self.batches = []
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if self.fail:
+            raise OSError("connection refused")
+        if self.reject.intersection(message.to[0] for message in messages):
+            raise OSError("recipient refused")
+        self.batches.append([message.to[0] for message in messages])
+        return len(messages)
+
+
+@override_settings(EMAIL_QUEUE_RATE_LIMIT=0, EMAIL_QUEUE_MAX_ATTEMPTS=2)
+class EmailQueueTests(TestCase):
+    def queue(self, count):
+        for n in range(count):
+            queue_email(f"Subject {n}", "Body", f"user{n}@example.com")
+
+    def test_drain_sends_batches_and_deletes_them(self):
+        self.queue(5)
+        connection = CountingConnection()
+
+        self.assertEqual(drain_email_queue(batch_size=2, connection=connection), 5)
+        self.assertEqual([len(batch) for batch in connection.batches], [2, 2, 1])
+        self.assertEqual(connection.batches[0], ["user0@example.com", "user1@example.com"])
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_failed_batch_is_retried_then_dropped(self):
+        self.queue(2)
+
+        self.assertEqual(drain_email_queue(connection=CountingConnection(fail=True)), 0)
+        self.assertEqual(list(QueuedEmail.objects.values_list("attempts", flat=True)), [1, 1])
+
+        self.assertEqual(drain_email_queue(connection=CountingConnection(fail=True)), 0)
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_failed_batch_is_sent_one_by_one(self):
+        self.queue(3)
+        connection = CountingConnection(reject={"user1@example.com"})
+
+        self.assertEqual(drain_email_queue(connection=connection), 2)
+        self.assertEqual(connection.batches, [["user0@example.com"], ["user2@example.com"]])
+        email = QueuedEmail.objects.get()
+        self.assertEqual((email.recipient, email.attempts), ("user1@example.com", 1))
+
+    def test_urgent_email_is_sent_on_commit(self):
+        self.queue(2)
+        with patch("apps.notifications.tasks.send_queued_email.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                email = queue_email("Reset your password", "Body", "user@example.com", urgent=True)
+        delay.assert_called_once_with(email.id)
+
+        self.assertEqual(drain_email_queue(ids=[email.id]), 1)
+        self.assertEqual([message.to for message in mail.outbox], [["user@example.com"]])
+        self.assertEqual(QueuedEmail.objects.count(), 2)
+
+    def test_rate_limit_sleeps_between_batches(self):
+        self.queue(4)
+        with patch("apps.notifications.mail.time.sleep") as sleep:
+            drain_email_queue(batch_size=2, connection=CountingConnection(), rate_limit=2)
+        # 2 emails at 2/s need a second, then 4 need two.
+        self.assertEqual(sleep.call_count, 2)
+        self.assertAlmostEqual(sleep.call_args_list[-1].args[0], 2, delta=0.5)
+
+    def test_default_connection(self):
+        self.queue(3)
+        self.assertEqual(drain_email_queue(), 3)
+        self.assertEqual([message.to for message in mail.outbox], [[f"user{n}@example.com"] for n in range(3)])
+
+    def test_smtp_connection_is_reused(self):
+        self.queue(10)
+        with SMTPSink() as sink:
+            connection = get_connection(
+                "django.core.mail.backends.smtp.EmailBackend", host=sink.host, port=sink.port
+            )
+            self.assertEqual(drain_email_queue(batch_size=3, connection=connection), 10)
+        self.assertEqual((sink.connections, sink.messages), (1, 10))
+
+    def test_subject_is_truncated(self):
+        email = queue_email("x" * 300, "Body", "user@example.com")
+        self.assertEqual(len(email.subject), 255)
@@ -2,7 +2,9 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.contrib.contenttypes.models import ContentType
 from django.db.models.signals import post_save
+from apps.blog.models import Comment
 from apps.notifications.signals import send_realtime_notification
 from apps.notifications.models import Notification
 from apps.notifications.test.factories import UserFactory, NotificationFactory
@@ -74,3 +76,50 @@ class NotificationAPITestCase(APITestCase):
         url = reverse('notifications:notification-mark-read', kwargs={'pk': other_notification.pk})
         response = self.client.post(url, **self.auth_header)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class NotificationInboxAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.auth_header = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.url = reverse('notifications:notification-inbox')
+
+        comment_type = ContentType.objects.get_for_model(Comment)
+        self.notifications = [
+            NotificationFactory(recipient=self.user, is_read=n % 2 == 0, content_type=comment_type, object_id=n)
+            for n in range(25)
+        ]
+        NotificationFactory()  # someone else's
+
+    def ids(self, response):
+        return [item["id"] for item in response.data["results"]]
+
+    def test_inbox_pages_newest_first(self):
+        expected = [n.id for n in reversed(self.notifications)]
+
+        first = self.client.get(self.url, **self.auth_header)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(first), expected[:20])
+        self.assertIsNone(first.data["previous"])
+
+        second = self.client.get(first.data["next"], **self.auth_header)
+        self.assertEqual(self.ids(second), expected[20:])
+        self.assertIsNone(second.data["next"])
+
+    def test_unread_only(self):
+        response = self.client.get(self.url, {"unread_only": "true"}, **self.auth_header)
+        expected = [n.id for n in reversed(self.notifications) if not n.is_read]
+        self.assertEqual(self.ids(response), expected)
+
+    def test_compact_target_without_content_type_queries(self):
+        ContentType.objects.get_for_model(Comment)  # warm the ContentType cache
+        # The token user, then the page.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, **self.auth_header)
+        item = response.data["results"][0]
+        self.assertEqual(item["target"], {"type": "comment", "id": 24})
+        self.assertEqual(set(item), {"id", "message", "is_read", "created_at", "actor_count", "recent_actors", "target"})
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"}, **self.auth_header)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
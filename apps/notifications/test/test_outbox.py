@@ -0,0 +1,110 @@
+from unittest.mock import patch
+
+from django.core import mail
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from apps.blog.events import COMMENT_APPROVED, COMMENT_SAVED
+from apps.blog.models import Comment, ModerationStatus
+from apps.blog.test.factories import CommentFactory, PostFactory
+from apps.notifications.mail import drain_email_queue
+from apps.notifications.models import Notification, OutboxEvent, QueuedEmail
+from apps.notifications.outbox import HANDLERS, drain_outbox, enqueue
+from apps.notifications.test.factories import UserFactory
+
+
+@override_settings(OUTBOX_KICK=False, OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.handled = []
+        HANDLERS["test_event"] = lambda payload: self.handled.append(payload["n"])
+
+    def tearDown(self):
+        HANDLERS.pop("test_event", None)
+        HANDLERS.pop("test_failure", None)
+
+    def test_rolled_back_event_is_never_handled(self):
+        try:
+            with transaction.atomic():
+                enqueue("test_event", n=1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(drain_outbox(), 0)
+        self.assertEqual(self.handled, [])
+
+    def test_drain_handles_events_in_order_and_deletes_them(self):
+        for n in range(5):
+            enqueue("test_event", n=n)
+
+        self.assertEqual(drain_outbox(batch_size=2), 5)
+        self.assertEqual(self.handled, [0, 1, 2, 3, 4])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failing_event_is_retried_then_dropped(self):
+        def fail(payload):
+            raise RuntimeError("down")
+        HANDLERS["test_failure"] = fail
+        enqueue("test_failure")
+        enqueue("test_event", n=1)
+
+        self.assertEqual(drain_outbox(), 1)
+        self.assertEqual(self.handled, [1])
+        self.assertEqual(OutboxEvent.objects.get().attempts, 1)
+
+        self.assertEqual(drain_outbox(), 0)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_kick_queued_on_commit(self):
+        with override_settings(OUTBOX_KICK=True), patch("apps.notifications.tasks.flush_outbox.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue("test_event", n=1)
+        delay.assert_called_once_with()
+
+
+@override_settings(OUTBOX_KICK=False)
+class CommentOutboxTests(TestCase):
+    def test_comment_side_effects_wait_for_the_drain(self):
+        post = PostFactory(author=UserFactory())
+        drain_outbox()
+        QueuedEmail.objects.all().delete()
+
+        comment = CommentFactory(post=post, author=UserFactory())
+
+        # One outbox row instead of the email, notification and pushes.
+        self.assertEqual(list(OutboxEvent.objects.values_list("kind", flat=True)), [COMMENT_SAVED])
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+        with patch("apps.blog.events._send_to_post_viewers") as push:
+            drain_outbox()
+
+        push.assert_called_once()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(drain_email_queue(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [post.author.email])
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.object_id), (post.author, comment.id))
+        # The notification's own push was queued and handled in the same drain.
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_pending_comment_is_emailed_once_approved(self):
+        post = PostFactory(author=UserFactory())
+        drain_outbox()
+        QueuedEmail.objects.all().delete()
+
+        comment = CommentFactory(post=post, author=UserFactory(), moderation_status=ModerationStatus.PENDING)
+        with patch("apps.blog.events._send_to_post_viewers"):
+            drain_outbox()
+        self.assertFalse(QueuedEmail.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+        # What moderate() does for an approved verdict.
+        Comment.objects.filter(pk=comment.pk).update(moderation_status=ModerationStatus.APPROVED)
+        enqueue(COMMENT_APPROVED, comment_id=comment.id, action="created")
+        with patch("apps.blog.events._send_to_post_viewers"):
+            drain_outbox()
+        self.assertEqual(QueuedEmail.objects.get().recipient, post.author.email)
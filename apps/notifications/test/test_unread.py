@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.notifications.models import Notification
+from apps.notifications.outbox import drain_outbox
+from apps.notifications.signals import send_realtime_notification
+from apps.notifications.test.factories import NotificationFactory, UserFactory
+from apps.notifications.unread import (
+    UNREAD_KEY,
+    adjust_unread_count,
+    get_unread_count,
+    reconcile_unread_counts,
+    recount_unread_count,
+)
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.user = UserFactory()
+        self.key = UNREAD_KEY.format(user_id=self.user.id)
+        self.redis.delete(self.key)
+
+    def test_counter_is_built_from_postgres(self):
+        post_save.disconnect(send_realtime_notification, sender=Notification)
+        try:
+            NotificationFactory.create_batch(3, recipient=self.user)
+            NotificationFactory(recipient=self.user, is_read=True)
+        finally:
+            post_save.connect(send_realtime_notification, sender=Notification)
+
+        self.assertEqual(get_unread_count(self.user.id), 3)
+        self.assertEqual(int(self.redis.get(self.key)), 3)
+
+    def test_missing_counter_is_not_started_from_a_delta(self):
+        with patch("apps.notifications.unread.push_unread_count") as push:
+            adjust_unread_count(self.user.id, 1)
+        # Rebuilt from Postgres (no notifications) rather than set to 1.
+        push.assert_called_once_with(self.user.id, 0)
+
+    def test_counter_never_goes_negative(self):
+        self.redis.set(self.key, 0)
+        with patch("apps.notifications.unread.push_unread_count"):
+            adjust_unread_count(self.user.id, -1)
+        self.assertEqual(int(self.redis.get(self.key)), 0)
+
+    @override_settings(OUTBOX_KICK=False)
+    def test_created_notification_increments_on_commit_and_pushes(self):
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationFactory(recipient=self.user)
+        self.assertEqual(int(self.redis.get(self.key)), 1)
+
+        with patch("apps.notifications.signals.push_unread_count") as push:
+            drain_outbox()
+
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        push.assert_called_once_with(self.user.id, 1)
+
+    @override_settings(OUTBOX_KICK=False)
+    def test_notification_read_before_the_drain_is_not_counted(self):
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = NotificationFactory(recipient=self.user)
+        with patch("apps.notifications.unread.push_unread_count"):
+            adjust_unread_count(self.user.id, -1)
+        Notification.objects.filter(pk=notification.pk).update(is_read=True)
+
+        with patch("apps.notifications.signals.push_unread_count") as push:
+            drain_outbox()
+            drain_outbox()
+
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        push.assert_called_once_with(self.user.id, 0)
+
+    def test_recount_keeps_notifications_left_unread(self):
+        post_save.disconnect(send_realtime_notification, sender=Notification)
+        try:
+            # Arrived after a "read all": still unread, and counted.
+            NotificationFactory(recipient=self.user)
+        finally:
+            post_save.connect(send_realtime_notification, sender=Notification)
+        self.redis.set(self.key, 7)
+
+        with patch("apps.notifications.unread.push_unread_count") as push:
+            recount_unread_count(self.user.id)
+
+        self.assertEqual(int(self.redis.get(self.key)), 1)
+        push.assert_called_once_with(self.user.id, 1)
+
+    def test_reconcile_corrects_drift(self):
+        self.redis.set(self.key, 7)
+        with patch("apps.notifications.unread.push_unread_count") as push:
+            self.assertGreaterEqual(reconcile_unread_counts(), 1)
+        self.assertEqual(int(self.redis.get(self.key)), 0)
+        push.assert_any_call(self.user.id, 0)
+
+
+@patch("apps.notifications.unread.push_unread_count")
+class UnreadCountAPITests(APITestCase):
+    def setUp(self):
+        post_save.disconnect(send_realtime_notification, sender=Notification)
+        self.user = UserFactory()
+        get_redis_connection("default").delete(UNREAD_KEY.format(user_id=self.user.id))
+        self.auth_header = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        self.unread = NotificationFactory.create_batch(3, recipient=self.user)
+        self.read = NotificationFactory(recipient=self.user, is_read=True)
+
+    def tearDown(self):
+        post_save.connect(send_realtime_notification, sender=Notification)
+
+    def unread_count(self):
+        response = self.client.get(reverse("notifications:notification-unread-count"), **self.auth_header)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["unread_count"]
+
+    def test_mark_read_decrements_once(self, push):
+        self.assertEqual(self.unread_count(), 3)
+        url = reverse("notifications:notification-mark-read", kwargs={"pk": self.unread[0].pk})
+
+        self.client.post(url, **self.auth_header)
+        self.client.post(url, **self.auth_header)
+
+        self.assertEqual(self.unread_count(), 2)
+        push.assert_called_once_with(self.user.id, 2)
+
+    def test_mark_all_read_recounts(self, push):
+        self.assertEqual(self.unread_count(), 3)
+        self.client.post(reverse("notifications:notification-read-all"), **self.auth_header)
+        self.assertEqual(self.unread_count(), 0)
+        push.assert_called_once_with(self.user.id, 0)
+
+    def test_delete_only_counts_unread(self, push):
+        self.assertEqual(self.unread_count(), 3)
+        for notification in (self.read, self.unread[0]):
+            url = reverse("notifications:notification-delete", kwargs={"pk": notification.pk})
+            self.client.delete(url, **self.auth_header)
+        self.assertEqual(self.unread_count(), 2)
+
+        self.client.delete(reverse("notifications:notification-delete-all"), **self.auth_header)
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_requires_authentication(self, push):
+        response = self.client.get(reverse("notifications:notification-unread-count"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
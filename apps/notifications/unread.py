@@ -0,0 +1,125 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import Count
+from django_redis import get_redis_connection
+
+from .models import Notification
+
+UNREAD_KEY = "notifications:unread:{user_id}"
+RECONCILE_CHUNK = 500
+
+# Only adjust a counter that exists: a missing one is rebuilt from Postgres
+# by the next read, so starting it from the delta would undercount.
+# Never goes below zero.
+ADJUST_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if value < 0 then
+    redis.call('SET', KEYS[1], 0)
+    value = 0
+end
+return value
+"""
+
+
+def get_unread_count(user_id):
+    """
+    The user's unread notification count from Redis, rebuilt from Postgres
+    (notifications_unread_idx) when the counter is missing or Redis is down.
+    """
+    key = UNREAD_KEY.format(user_id=user_id)
+    try:
+        redis = get_redis_connection("default")
+        value = redis.get(key)
+        if value is not None:
+            return int(value)
+        count = _count_unread(user_id)
+        # NX: a counter created meanwhile has already seen the newer changes.
+        redis.set(key, count, nx=True)
+        return count
+    except Exception as e:
+        print(f"Error reading unread count: {e}")
+        return _count_unread(user_id)
+
+
+def adjust_unread_count(user_id, delta, push=True):
+    """
+    Add `delta` to the user's counter and, unless `push` is False, push the
+    new value to notify_<user_id>. Errors are only logged:
+    reconcile_unread_counts corrects the drift.
+    """
+    try:
+        value = get_redis_connection("default").eval(ADJUST_LUA, 1, UNREAD_KEY.format(user_id=user_id), delta)
+    except Exception as e:
+        print(f"Error updating unread count: {e}")
+        return
+    if not push:
+        return
+    if value is None:
+        value = get_unread_count(user_id)
+    push_unread_count(user_id, int(value))
+
+
+def recount_unread_count(user_id):
+    """
+    Set the counter from Postgres and push it, after a bulk change (read or
+    delete all) has committed. A notification created after that change
+    keeps its count, where setting zero would drop it until the next
+    reconcile_unread_counts.
+    """
+    count = _count_unread(user_id)
+    try:
+        get_redis_connection("default").set(UNREAD_KEY.format(user_id=user_id), count)
+    except Exception as e:
+        print(f"Error recounting unread count: {e}")
+        return
+    push_unread_count(user_id, count)
+
+
+def push_unread_count(user_id, count):
+    async_to_sync(get_channel_layer().group_send)(
+        f"notify_{user_id}",
+        {"type": "unread_count_event", "data": {"unread_count": count}},
+    )
+
+
+def reconcile_unread_counts():
+    """
+    Overwrite every existing counter with the count from Postgres, a chunk
+    of users per GROUP BY. Drifted counters are pushed to their
+    users. Returns how many had drifted.
+    """
+    redis = get_redis_connection("default")
+    prefix = UNREAD_KEY.format(user_id="")
+    keys = [key.decode() if isinstance(key, bytes) else key for key in redis.scan_iter(f"{prefix}*", count=1000)]
+    drifted = 0
+
+    for start in range(0, len(keys), RECONCILE_CHUNK):
+        chunk = keys[start:start + RECONCILE_CHUNK]
+        user_ids = [int(key[len(prefix):]) for key in chunk]
+        counts = dict(
+            Notification.objects.filter(recipient_id__in=user_ids, is_read=False)
+            .values("recipient_id")
+            .annotate(count=Count("id"))
+            .values_list("recipient_id", "count")
+        )
+        cached = redis.mget(chunk)
+        pipe = redis.pipeline(transaction=False)
+        changed = []
+        for key, user_id, value in zip(chunk, user_ids, cached):
+            count = counts.get(user_id, 0)
+            if value is None or int(value) != count:
+                pipe.set(key, count)
+                changed.append((user_id, count))
+        pipe.execute()
+        for user_id, count in changed:
+            push_unread_count(user_id, count)
+        drifted += len(changed)
+
+    return drifted
+
+
+def _count_unread(user_id):
+    return Notification.objects.filter(recipient_id=user_id, is_read=False).count()
@@ -1,16 +1,22 @@
 from django.urls import path
 from .views import (
     NotificationListAPIView,
+    NotificationInboxAPIView,
     MarkNotificationAsReadAPIView,
     MarkAllNotificationsAsReadAPIView,
     DeleteNotificationAPIView,
     DeleteAllNotificationsAPIView,
+    EmailPreferencesAPIView,
+    UnreadCountAPIView,
 )
 
 urlpatterns = [
     path("", NotificationListAPIView.as_view(), name="notification-list"),
+    path("inbox/", NotificationInboxAPIView.as_view(), name="notification-inbox"),
+    path("unread-count/", UnreadCountAPIView.as_view(), name="notification-unread-count"),
     path("<int:pk>/read/", MarkNotificationAsReadAPIView.as_view(), name="notification-mark-read"),
     path("read-all/", MarkAllNotificationsAsReadAPIView.as_view(), name="notification-read-all"),
     path("<int:pk>/delete/", DeleteNotificationAPIView.as_view(), name="notification-delete"),
     path("delete-all/", DeleteAllNotificationsAPIView.as_view(), name="notification-delete-all"),
+    path("preferences/", EmailPreferencesAPIView.as_view(), name="notification-preferences"),
 ]
@@ -1,8 +1,12 @@
 from rest_framework import generics, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
 from .models import Notification
-from .serializers import NotificationSerializer
+from .pagination import NotificationInboxPagination
+from .serializers import EmailPreferencesSerializer, NotificationInboxSerializer, NotificationSerializer
+from .unread import adjust_unread_count, get_unread_count, recount_unread_count
 
 # List notifications
 class NotificationListAPIView(generics.ListAPIView):
@@ -13,18 +17,60 @@ class NotificationListAPIView(generics.ListAPIView):
         return Notification.objects.filter(recipient=self.request.user).order_by("-created_at")
 
 
+# Inbox: keyset pages, newest first, optionally unread only
+class NotificationInboxAPIView(generics.ListAPIView):
+    serializer_class = NotificationInboxSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationInboxPagination
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(recipient=self.request.user).only(
+            "id", "message", "is_read", "created_at", "actor_count", "recent_actors", "content_type_id", "object_id"
+        )
+        if self.request.query_params.get("unread_only", "").lower() in ("1", "true"):
+            queryset = queryset.filter(is_read=False)
+        return queryset
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="unread_only",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_BOOLEAN,
+                description="Only unread notifications",
+            ),
+            openapi.Parameter(
+                name="cursor",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Opaque cursor from a previous `next`/`previous` link",
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+# Unread badge count, without loading the inbox
+class UnreadCountAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": get_unread_count(request.user.id)})
+
+
 # Mark a single notification as read
 class MarkNotificationAsReadAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            notification = Notification.objects.get(pk=pk, recipient=request.user)
-            notification.is_read = True
-            notification.save()
-            return Response({"detail": "Notification marked as read."})
-        except Notification.DoesNotExist:
+        notifications = Notification.objects.filter(pk=pk, recipient=request.user)
+        # Conditional UPDATE: only a notification that was unread counts.
+        if notifications.filter(is_read=False).update(is_read=True):
+            adjust_unread_count(request.user.id, -1)
+        elif not notifications.exists():
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"detail": "Notification marked as read."})
 
 
 # Mark all notifications as read
@@ -33,6 +79,7 @@ class MarkAllNotificationsAsReadAPIView(APIView):
 
     def post(self, request):
         Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+        recount_unread_count(request.user.id)
         return Response({"detail": "All notifications marked as read."})
 
 
@@ -44,6 +91,8 @@ class DeleteNotificationAPIView(APIView):
         try:
             notification = Notification.objects.get(pk=pk, recipient=request.user)
             notification.delete()
+            if not notification.is_read:
+                adjust_unread_count(request.user.id, -1)
             return Response({"detail": "Notification deleted."}, status=status.HTTP_204_NO_CONTENT)
         except Notification.DoesNotExist:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -55,4 +104,14 @@ class DeleteAllNotificationsAPIView(APIView):
 
     def delete(self, request):
         Notification.objects.filter(recipient=request.user).delete()
+        recount_unread_count(request.user.id)
         return Response({"detail": "All notifications deleted."}, status=status.HTTP_204_NO_CONTENT)
+
+
+# Notification email window: immediate, hourly or daily digest
+class EmailPreferencesAPIView(generics.RetrieveUpdateAPIView):
+    serializer_class = EmailPreferencesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self):
+        return self.request.user
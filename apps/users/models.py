@@ -1,10 +1,17 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+class EmailDigest(models.TextChoices):
+    # How often notification emails are sent (apps.notifications.digest).
+    IMMEDIATE = "immediate", "Immediate"
+    HOURLY = "hourly", "Hourly"
+    DAILY = "daily", "Daily"
+
 class User(AbstractUser):
     failed_login_attempts = models.IntegerField(default=0)
     is_locked = models.BooleanField(default=False)
     bio = models.TextField(blank=True, null=True)
+    email_digest = models.CharField(max_length=10, choices=EmailDigest.choices, default=EmailDigest.IMMEDIATE)
 
     def __str__(self):
         return self.username
@@ -81,7 +81,7 @@ class AuthTests(APITestCase):
         response = self.client.post(self.blacklist_url, {"refresh": str(refresh)})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-    @patch("apps.notifications.tasks.send_notification_email.delay")
+    @patch("apps.users.views.queue_email")
     def test_forgot_password(self, mock_send_email):
         response = self.client.post(self.forgot_password_url, {"email": self.email})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -97,7 +97,7 @@ class AuthTests(APITestCase):
         self.user.refresh_from_db()
         self.assertTrue(self.user.check_password(new_password))
 
-    @patch("apps.notifications.tasks.send_notification_email.delay")
+    @patch("apps.users.views.queue_email")
     @patch("apps.users.views.LoginRateThrottle.allow_request", return_value=True)
     def test_account_locked_after_failed_attempts(self, mock_throttle, mock_send_email):
         user = UserFactory(password=self.password)
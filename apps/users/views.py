@@ -18,7 +18,7 @@ from dj_rest_auth.registration.views import SocialLoginView
 from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
 from allauth.socialaccount.providers.github.views import GitHubOAuth2Adapter
 
-from apps.notifications.tasks import send_notification_email
+from apps.notifications.mail import queue_email
 from .serializers import RegisterSerializer
 from .throttles import LoginRateThrottle
 
@@ -52,10 +52,11 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                 if user_obj.failed_login_attempts >= MAX_FAILED_ATTEMPTS:
                     user_obj.is_locked = True
                     
-                    send_notification_email.delay(
+                    queue_email(
                         subject="Your account has been locked",
                         message="You have entered the wrong password too many times. Please contact admin.",
-                        recipient_email=user_obj.email
+                        recipient_email=user_obj.email,
+                        urgent=True,
                     )
                 user_obj.save()
             raise AuthenticationFailed(_("No active account found with the given credentials"))
@@ -128,10 +129,11 @@ class ForgotPasswordView(APIView):
 
             reset_link = f"https://your-frontend.com/reset-password/:{uid}/:{token}"
 
-            send_notification_email.delay(
+            queue_email(
                 subject="Reset your password",
                 message=f"Click the link to reset your password: {reset_link}",
-                recipient_email=user.email
+                recipient_email=user.email,
+                urgent=True,
             )
         # Always return success to prevent email enumeration
         return Response({"message": "If the email is registered, a reset link will be sent."}, status=status.HTTP_200_OK)
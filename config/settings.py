@@ -206,6 +206,18 @@ CELERY_TASK_SERIALIZER = 'json'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Emails are queued in the database (apps.notifications.mail) and sent by
+# flush_email_queue over one connection, EMAIL_QUEUE_BATCH_SIZE per
+# send_messages call, at most EMAIL_QUEUE_RATE_LIMIT per second (0: no limit).
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv("EMAIL_QUEUE_BATCH_SIZE", "100"))
+EMAIL_QUEUE_RATE_LIMIT = float(os.getenv("EMAIL_QUEUE_RATE_LIMIT", "0"))
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv("EMAIL_QUEUE_MAX_ATTEMPTS", "5"))
+
+# New post emails to the admin; users choose their own window
+# (User.email_digest): "immediate", "hourly" or "daily".
+ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "admin@example.com")
+ADMIN_EMAIL_DIGEST = os.getenv("ADMIN_EMAIL_DIGEST", "hourly")
+
 LOGIN_URL = "/login/"
 
 SWAGGER_SETTINGS = {
@@ -272,8 +284,122 @@ CELERY_BEAT_SCHEDULE = {
         "task": "apps.blog.tasks.publish_scheduled_posts",
         "schedule": crontab(minute="*/1"),
     },
+    "flush_search_logs_every_10_seconds": {
+        "task": "apps.blog.tasks.flush_search_logs",
+        "schedule": 10.0,
+    },
+    "flush_outbox_every_5_seconds": {
+        "task": "apps.notifications.tasks.flush_outbox",
+        "schedule": 5.0,
+    },
+    "flush_email_queue_every_10_seconds": {
+        "task": "apps.notifications.tasks.flush_email_queue",
+        "schedule": 10.0,
+    },
+    "send_hourly_email_digests": {
+        "task": "apps.notifications.tasks.flush_email_digests",
+        "schedule": crontab(minute=0),
+        "args": ("hourly",),
+    },
+    "send_daily_email_digests": {
+        "task": "apps.notifications.tasks.flush_email_digests",
+        "schedule": crontab(hour=7, minute=0),
+        "args": ("daily",),
+    },
+    "reconcile_unread_notification_counts_every_10_minutes": {
+        "task": "apps.notifications.tasks.reconcile_unread_notification_counts",
+        "schedule": crontab(minute="*/10"),
+    },
+    "flush_post_views_every_30_seconds": {
+        "task": "apps.blog.tasks.flush_post_views",
+        "schedule": 30.0,
+    },
+    "recompute_all_related_posts_nightly": {
+        "task": "apps.blog.tasks.recompute_all_related_posts",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "reconcile_category_stats_nightly": {
+        "task": "apps.blog.tasks.reconcile_category_stats",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "prune_search_keyword_rollups_nightly": {
+        "task": "apps.blog.tasks.prune_search_keyword_rollups",
+        "schedule": crontab(hour=4, minute=30),
+    },
 }
 
+# Search events are buffered in Redis and written by flush_search_logs.
+SEARCH_LOG_SAMPLE_RATE = float(os.getenv("SEARCH_LOG_SAMPLE_RATE", "1.0"))
+SEARCH_LOG_OVERLOAD_THRESHOLD = int(os.getenv("SEARCH_LOG_OVERLOAD_THRESHOLD", "50000"))
+SEARCH_LOG_OVERLOAD_SAMPLE_RATE = float(os.getenv("SEARCH_LOG_OVERLOAD_SAMPLE_RATE", "0.1"))
+SEARCH_LOG_FLUSH_BATCH_SIZE = 5000
+
+# "sql" ranks with Postgres SearchRank; "tfidf" uses the in-process engine in
+# apps.blog.similarity, whose index is memory-mapped from RELATED_POSTS_INDEX_DIR.
+RELATED_POSTS_ENGINE = os.getenv("RELATED_POSTS_ENGINE", "sql")
+RELATED_POSTS_INDEX_DIR = os.getenv("RELATED_POSTS_INDEX_DIR", str(BASE_DIR / "var" / "related_index"))
+
+# Toxicity checks (apps.core.services.content_moderation). "fake" scores text
+# locally from a word list instead of calling Perspective. Scores are cached
+# by normalized-text hash; rejected text is mostly repeated spam, so it is
+# kept longer than allowed text.
+CONTENT_MODERATION_ANALYZER = os.getenv("CONTENT_MODERATION_ANALYZER", "perspective")
+# Save posts and comments as pending and score them in apps.blog.tasks.moderate_content
+# instead of blocking the request on the analyzer.
+CONTENT_MODERATION_ASYNC = os.getenv("CONTENT_MODERATION_ASYNC", "False") == "True"
+CONTENT_MODERATION_ALLOWED_TTL = 24 * 60 * 60
+CONTENT_MODERATION_REJECTED_TTL = 7 * 24 * 60 * 60
+CONTENT_MODERATION_L1_SIZE = 4096
+CONTENT_MODERATION_L1_TTL = 5 * 60
+# Local pre-filter: wordlist matches are rejected without the analyzer (see
+# PreFilter in apps.core.services.content_moderation). With PREFILTER_ALLOW,
+# short text made only of SAFE_WORDLIST words is allowed without it too.
+CONTENT_MODERATION_PREFILTER = os.getenv("CONTENT_MODERATION_PREFILTER", "True") == "True"
+CONTENT_MODERATION_WORDLIST = os.getenv(
+    "CONTENT_MODERATION_WORDLIST", str(BASE_DIR / "apps" / "core" / "services" / "wordlists" / "toxic.txt")
+)
+CONTENT_MODERATION_PREFILTER_ALLOW = os.getenv("CONTENT_MODERATION_PREFILTER_ALLOW", "False") == "True"
+CONTENT_MODERATION_SAFE_WORDLIST = os.getenv(
+    "CONTENT_MODERATION_SAFE_WORDLIST", str(BASE_DIR / "apps" / "core" / "services" / "wordlists" / "safe.txt")
+)
+# Analyzer calls: total time budget per check (seconds), retries inside it,
+# and the threads that run them. Over BREAKER_WINDOW seconds, once
+# BREAKER_MIN_CALLS calls finished with BREAKER_FAILURE_RATE failures, calls
+# are refused for BREAKER_COOLDOWN seconds.
+CONTENT_MODERATION_TIMEOUT = float(os.getenv("CONTENT_MODERATION_TIMEOUT", "2.0"))
+CONTENT_MODERATION_RETRIES = 1
+CONTENT_MODERATION_MAX_CONCURRENCY = 8
+CONTENT_MODERATION_BREAKER_WINDOW = 30
+CONTENT_MODERATION_BREAKER_MIN_CALLS = 10
+CONTENT_MODERATION_BREAKER_FAILURE_RATE = 0.5
+CONTENT_MODERATION_BREAKER_COOLDOWN = 15
+# When the analyzer is unavailable: "pending" saves the content as pending
+# and lets moderate_content retry every RETRY_DELAY seconds; "open" lets it
+# through unscored.
+CONTENT_MODERATION_FAILURE_POLICY = os.getenv("CONTENT_MODERATION_FAILURE_POLICY", "pending")
+CONTENT_MODERATION_RETRY_DELAY = 60
+# Initial behaviour of the "faulty" analyzer (FaultInjectingAnalyzer).
+CONTENT_MODERATION_STUB_LATENCY = float(os.getenv("CONTENT_MODERATION_STUB_LATENCY", "0"))
+CONTENT_MODERATION_STUB_FAILURE_RATE = float(os.getenv("CONTENT_MODERATION_STUB_FAILURE_RATE", "0"))
+# Perspective discovery document, downloaded on first use when missing
+# (`manage.py fetch_moderation_discovery` bakes it into images ahead of time).
+CONTENT_MODERATION_DISCOVERY_PATH = os.getenv(
+    "CONTENT_MODERATION_DISCOVERY_PATH", str(BASE_DIR / "var" / "perspective_discovery.json")
+)
+
+# Post and comment side effects are written to the outbox
+# (apps.notifications.outbox) and sent by flush_outbox. OUTBOX_KICK queues a
+# drain right after each commit; otherwise they wait for the beat schedule.
+OUTBOX_KICK = os.getenv("OUTBOX_KICK", "True") == "True"
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+# Comment notifications on the same target collapse into one unread row per
+# window (seconds, 0: one row per event); updates of that row are pushed at
+# most once per NOTIFICATION_AGGREGATION_PUSH_INTERVAL seconds.
+NOTIFICATION_AGGREGATION_WINDOW = int(os.getenv("NOTIFICATION_AGGREGATION_WINDOW", "3600"))
+NOTIFICATION_AGGREGATION_PUSH_INTERVAL = int(os.getenv("NOTIFICATION_AGGREGATION_PUSH_INTERVAL", "10"))
+
 ASGI_APPLICATION = "config.asgi.application"
 CHANNEL_LAYERS = {
     "default": {